@@ -2,14 +2,47 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity, create_access_token
 from backend.models import User, Trajet, Message
-from backend.matching import find_matches
-from backend.extensions import db
+from backend.matching import CANDIDATE_CHUNK_SIZE, find_matches, match_result_cache
+from backend.matching_index import matching_index, GEO_MATCH_RADIUS_KM
+from backend.passenger_index import passenger_index
+from backend.jobs import job_metrics
+from backend.passwords import PasswordHashingBusy, password_metrics
+from backend.revocation import revocation_metrics
+from backend.cache import cache_metrics, cached_response
+from backend.conditional import add_validators, collection_version, make_etag, not_modified, request_args_key
+from backend.pagination import InvalidCursor, estimate_count, keyset_page, keyset_page_positions, offset_page_positions
+from backend.serializers import MATCH_FIELDS, MESSAGE_LIST_FIELDS, TRAJET_LIST_FIELDS, serialize_messages, serialize_trajets
+from backend.trajet_filters import DEFAULT_SORT, InvalidFilter, apply_sort, apply_trajet_filters, has_filters, parse_sort
+from backend.extensions import admin_required, db
+from backend.identity import current_identity
 from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 bp = Blueprint('api', __name__)
 
+# Rayon maximal accepté par la recherche géographique des trajets
+MAX_RADIUS_KM = 100.0
+
+def load_positions(query, column, trajet_ids):
+    """
+    Positions (valeur de column, id) des trajets de query dont l'id est
+    donné, en une requête IN par lot de CANDIDATE_CHUNK_SIZE.
+    """
+    positions = []
+    for start in range(0, len(trajet_ids), CANDIDATE_CHUNK_SIZE):
+        chunk = trajet_ids[start:start + CANDIDATE_CHUNK_SIZE]
+        positions.extend(
+            (value, trajet_id)
+            for value, trajet_id in query.filter(Trajet.id.in_(chunk)).with_entities(column, Trajet.id)
+        )
+    return positions
+
+def load_trajets_in_order(trajet_ids):
+    """Trajets dont l'id est donné (une page au plus), dans le même ordre"""
+    trajets_by_id = {trajet.id: trajet for trajet in Trajet.query.filter(Trajet.id.in_(trajet_ids))}
+    return [trajets_by_id[trajet_id] for trajet_id in trajet_ids if trajet_id in trajets_by_id]
+
 @bp.route('/auth/login', methods=['POST'])
 def api_login():
     """API de connexion"""
@@ -20,6 +53,8 @@ def api_login():
         
         user = User.query.filter_by(email=data.get('email')).first()
         if user and user.check_password(data.get('password')):
+            # Enregistre un éventuel rehachage du mot de passe
+            db.session.commit()
             access_token = create_access_token(identity=user.id)
             return jsonify({
                 "message": "Connexion réussie",
@@ -34,6 +69,8 @@ def api_login():
             }), 200
         else:
             return jsonify({"error": "Identifiants incorrects"}), 401
+    except PasswordHashingBusy:
+        raise
     except Exception as e:
         logger.error(f"Erreur login API: {str(e)}")
         return jsonify({"error": "Erreur serveur"}), 500
@@ -69,6 +106,7 @@ def api_register():
         
         db.session.add(new_user)
         db.session.commit()
+        passenger_index.add(new_user)
         
         access_token = create_access_token(identity=new_user.id)
         
@@ -84,6 +122,8 @@ def api_register():
             }
         }), 201
         
+    except PasswordHashingBusy:
+        raise
     except Exception as e:
         logger.error(f"Erreur inscription API: {str(e)}")
         db.session.rollback()
@@ -94,13 +134,17 @@ def api_register():
 def get_profile():
     """Récupérer le profil utilisateur"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = current_identity()
         
         if not user:
             return jsonify({"error": "Utilisateur non trouvé"}), 404
         
-        return jsonify({
+        etag = make_etag('user', user.id, user.updated_at)
+        cached = not_modified(etag, user.updated_at, private=True)
+        if cached is not None:
+            return cached
+        
+        response = jsonify({
             "user": {
                 "id": user.id,
                 "nom": user.nom,
@@ -113,7 +157,8 @@ def get_profile():
                 "photo": user.photo,
                 "created_at": user.created_at.isoformat()
             }
-        }), 200
+        })
+        return add_validators(response, etag, user.updated_at, private=True), 200
         
     except Exception as e:
         logger.error(f"Erreur récupération profil: {str(e)}")
@@ -124,8 +169,7 @@ def get_profile():
 def update_profile():
     """Mettre à jour le profil utilisateur"""
     try:
-        current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = current_identity()
         
         if not user:
             return jsonify({"error": "Utilisateur non trouvé"}), 404
@@ -144,12 +188,15 @@ def update_profile():
                 return jsonify({"error": "Ce numéro de téléphone est déjà utilisé"}), 409
         
         # Mettre à jour les champs
-        updatable_fields = ['nom', 'prenom', 'telephone', 'email', 'point_depart', 'horaires', 'photo']
+        updatable_fields = ['nom', 'prenom', 'telephone', 'email', 'point_depart', 'horaires', 'photo',
+                            'latitude', 'longitude']
         for field in updatable_fields:
             if field in data:
                 setattr(user, field, data[field])
         
         db.session.commit()
+        match_result_cache.invalidate(user.id)
+        passenger_index.add(user)
         
         return jsonify({
             "message": "Profil mis à jour avec succès",
@@ -161,6 +208,8 @@ def update_profile():
                 "email": user.email,
                 "role": user.role,
                 "point_depart": user.point_depart,
+                "latitude": user.latitude,
+                "longitude": user.longitude,
                 "horaires": user.horaires,
                 "photo": user.photo
             }
@@ -172,32 +221,118 @@ def update_profile():
         return jsonify({"error": "Erreur serveur"}), 500
 
 @bp.route('/trajets', methods=['GET'])
+@cached_response(tags=('trajets',))
 def get_trajets():
-    """Récupérer tous les trajets"""
+    """
+    Récupérer tous les trajets.
+    Avec lat et lon (et radius_km, 10 km par défaut), seuls les trajets
+    disponibles partant dans ce rayon sont retournés, via l'index spatial:
+    les filtres sont appliqués par lots d'ids, puis le tri et la pagination
+    sur les positions chargées.
+    
+    Avec pagination=cursor (ou un paramètre cursor), les trajets sont
+    paginés par curseur du plus récent au plus ancien, sans COUNT ni
+    OFFSET, les trajets sans valeur de tri en dernier; estimate=1 ajoute
+    une estimation du total, sauf si des filtres sont appliqués.
+    
+    Filtres: destination, depart, date_min, date_max, heure_min, heure_max,
+    places_min, prix_max et statut; tri: sort (created_at, date, heure,
+    prix ou places, préfixé de '-' pour inverser l'ordre). Voir
+    backend.trajet_filters.
+    
+    La réponse porte un ETag dérivé de la version de la collection et des
+    paramètres: une requête conditionnelle à jour reçoit un 304 sans
+    requête sur les trajets.
+    """
     try:
+        version, last_modified = collection_version('trajets')
+        etag = make_etag('trajets', version, request_args_key())
+        cached = not_modified(etag, last_modified)
+        if cached is not None:
+            return cached
+        
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
+        cursor = request.args.get('cursor')
+        use_cursor = cursor is not None or request.args.get('pagination') == 'cursor'
+        latitude = request.args.get('lat', type=float)
+        longitude = request.args.get('lon', type=float)
+        radius_km = request.args.get('radius_km', GEO_MATCH_RADIUS_KM, type=float)
         
         if per_page > 100:
             per_page = 100
         
-        trajets = Trajet.query.paginate(
-            page=page, 
-            per_page=per_page, 
-            error_out=False
-        )
-        
-        return jsonify({
-            "trajets": [{
-                "id": trajet.id,
-                "conducteur_id": trajet.conducteur_id,
-                "point_depart": trajet.point_depart,
-                "destination": trajet.destination,
-                "horaire_depart": trajet.horaire_depart,
-                "places_disponibles": trajet.places_disponibles,
-                "created_at": trajet.created_at.isoformat()
-            } for trajet in trajets.items],
-            "pagination": {
+        try:
+            sort = parse_sort(request.args.get('sort'))
+            query = apply_trajet_filters(Trajet.query, request.args)
+        except InvalidFilter as e:
+            return jsonify({"error": str(e)}), 400
+        
+        distances = None
+        if latitude is not None and longitude is not None:
+            if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or radius_km <= 0:
+                return jsonify({"error": "Paramètres de recherche géographique invalides"}), 400
+            if radius_km > MAX_RADIUS_KM:
+                radius_km = MAX_RADIUS_KM
+            distances = dict(matching_index.within_radius(latitude, longitude, radius_km))
+        
+        if distances is not None:
+            sorted_by_id = not use_cursor and not request.args.get('sort')
+            positions = load_positions(query, Trajet.id if sorted_by_id else sort.column, list(distances))
+            if use_cursor:
+                try:
+                    page_ids, next_cursor = keyset_page_positions(
+                        positions, per_page, cursor,
+                        descending=sort.descending,
+                        key=None if sort.name == DEFAULT_SORT else sort.name
+                    )
+                except InvalidCursor:
+                    return jsonify({"error": "Curseur de pagination invalide"}), 400
+                
+                pagination = {
+                    "mode": "cursor",
+                    "per_page": per_page,
+                    "has_next": next_cursor is not None,
+                    "next_cursor": next_cursor
+                }
+                if request.args.get('estimate', type=int):
+                    pagination["total_estimate"] = len(positions)
+            else:
+                page_ids, pagination = offset_page_positions(
+                    positions, page, per_page,
+                    descending=not sorted_by_id and sort.descending
+                )
+            items = load_trajets_in_order(page_ids)
+        elif use_cursor:
+            try:
+                items, next_cursor = keyset_page(
+                    query, Trajet, per_page, cursor,
+                    column=sort.column,
+                    descending=sort.descending,
+                    key=None if sort.name == DEFAULT_SORT else sort.name
+                )
+            except InvalidCursor:
+                return jsonify({"error": "Curseur de pagination invalide"}), 400
+            
+            pagination = {
+                "mode": "cursor",
+                "per_page": per_page,
+                "has_next": next_cursor is not None,
+                "next_cursor": next_cursor
+            }
+            # Estimation de la table entière: sans objet pour une liste filtrée
+            if request.args.get('estimate', type=int) and not has_filters(request.args):
+                pagination["total_estimate"] = estimate_count(Trajet)
+        else:
+            if request.args.get('sort'):
+                query = apply_sort(query, sort)
+            trajets = query.paginate(
+                page=page, 
+                per_page=per_page, 
+                error_out=False
+            )
+            items = trajets.items
+            pagination = {
                 "page": trajets.page,
                 "pages": trajets.pages,
                 "per_page": trajets.per_page,
@@ -205,7 +340,18 @@ def get_trajets():
                 "has_next": trajets.has_next,
                 "has_prev": trajets.has_prev
             }
-        }), 200
+        
+        response = jsonify({
+            "trajets": serialize_trajets(
+                items,
+                fields=TRAJET_LIST_FIELDS,
+                extra=lambda trajet: (
+                    {"distance_km": round(distances[trajet.id], 2)} if distances and trajet.id in distances else {}
+                )
+            ),
+            "pagination": pagination
+        })
+        return add_validators(response, etag, last_modified), 200
         
     except Exception as e:
         logger.error(f"Erreur récupération trajets: {str(e)}")
@@ -228,7 +374,9 @@ def create_trajet():
             point_depart=data.get('point_depart'),
             destination=data.get('destination'),
             horaire_depart=data.get('horaire_depart'),
-            places_disponibles=data.get('places_disponibles', 1)
+            places_disponibles=data.get('places_disponibles', 1),
+            depart_latitude=data.get('depart_latitude'),
+            depart_longitude=data.get('depart_longitude')
         )
         
         db.session.add(new_trajet)
@@ -271,7 +419,8 @@ def update_trajet(trajet_id):
             return jsonify({"error": "Données invalides"}), 400
         
         # Mettre à jour les champs
-        updatable_fields = ['point_depart', 'destination', 'horaire_depart', 'places_disponibles']
+        updatable_fields = ['point_depart', 'destination', 'horaire_depart', 'places_disponibles',
+                            'depart_latitude', 'depart_longitude']
         for field in updatable_fields:
             if field in data:
                 setattr(trajet, field, data[field])
@@ -322,6 +471,7 @@ def delete_trajet(trajet_id):
 
 @bp.route('/match', methods=['GET'])
 @jwt_required()
+@cached_response(tags=lambda: ('trajets', f'user:{get_jwt_identity()}'), vary=get_jwt_identity)
 def api_match():
     """API de matching"""
     try:
@@ -329,15 +479,7 @@ def api_match():
         matches = find_matches(current_user_id)
         
         return jsonify({
-            "matches": [{
-                "id": match.id,
-                "conducteur_id": match.conducteur_id,
-                "point_depart": match.point_depart,
-                "destination": match.destination,
-                "horaire_depart": match.horaire_depart,
-                "places_disponibles": match.places_disponibles,
-                "created_at": match.created_at.isoformat()
-            } for match in matches]
+            "matches": serialize_trajets(matches, fields=MATCH_FIELDS)
         }), 200
         
     except Exception as e:
@@ -346,6 +488,7 @@ def api_match():
 
 @bp.route('/messages', methods=['GET'])
 @jwt_required()
+@cached_response(tags=lambda: (f"messages:{request.args.get('room')}",))
 def get_messages():
     """Récupérer les messages d'une room"""
     try:
@@ -356,13 +499,7 @@ def get_messages():
         messages = Message.query.filter_by(room=room).order_by(Message.timestamp.desc()).limit(50).all()
         
         return jsonify({
-            "messages": [{
-                "id": msg.id,
-                "sender_id": msg.sender_id,
-                "content": msg.content,
-                "room": msg.room,
-                "timestamp": msg.timestamp.isoformat()
-            } for msg in messages]
+            "messages": serialize_messages(messages, fields=MESSAGE_LIST_FIELDS)
         }), 200
         
     except Exception as e:
@@ -373,3 +510,30 @@ def get_messages():
 def health_check():
     """Health check endpoint"""
     return jsonify({"status": "OK", "timestamp": datetime.utcnow().isoformat()}), 200
+
+@bp.route('/metrics/jobs', methods=['GET'])
+@admin_required
+def jobs_metrics():
+    """Métriques du précalcul des matches (débit, file, occupation des workers)"""
+    metrics = job_metrics()
+    if metrics is None:
+        return jsonify({"enabled": False}), 200
+    return jsonify({"enabled": True, **metrics}), 200
+
+@bp.route('/metrics/cache', methods=['GET'])
+@admin_required
+def cache_metrics_view():
+    """Compteurs du cache des réponses par endpoint (hits, misses, stores, evictions)"""
+    return jsonify(cache_metrics()), 200
+
+@bp.route('/metrics/revocation', methods=['GET'])
+@admin_required
+def revocation_metrics_view():
+    """Révocation des tokens: entrées du backend, vérifications, mémoire du filtre de Bloom"""
+    return jsonify(revocation_metrics()), 200
+
+@bp.route('/metrics/passwords', methods=['GET'])
+@admin_required
+def password_metrics_view():
+    """Hachage des mots de passe: paramètres, file d'attente, refus et rehachages"""
+    return jsonify(password_metrics()), 200
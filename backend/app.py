@@ -1,13 +1,14 @@
 # backend/app.py
 from flask import Flask, g, request
 from flask_socketio import SocketIO
-from flask_jwt_extended import JWTManager, get_jwt_identity, verify_jwt_in_request
+from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 import os
 import logging
 from datetime import datetime
-from backend.extensions import db
-from backend.models import User
+from backend.extensions import db, limiter
+from backend.identity import current_identity, init_identity
+from backend.json_provider import FastJSONProvider
 
 # Configuration du logging
 logging.basicConfig(
@@ -29,12 +30,30 @@ def create_app():
     # Charger la configuration
     app.config.from_object('backend.config.Config')
 
+    # Encodage JSON des réponses (orjson si disponible)
+    app.json = FastJSONProvider(app)
+
     # Initialisation des extensions
     db.init_app(app)
     
+    # Hachage des mots de passe (pool borné)
+    from backend.passwords import init_passwords
+    init_passwords(app)
+    
+    # Limites de taux (stockage partagé entre workers)
+    from backend.rate_limit import init_rate_limit
+    init_rate_limit(app, limiter)
+    
     # JWT Manager
     jwt = JWTManager(app)
     
+    # Utilisateur courant chargé une fois par requête
+    init_identity(jwt)
+    
+    # Révocation des tokens (déconnexion)
+    from backend.revocation import init_revocation
+    init_revocation(app, jwt)
+    
     # SocketIO - Initialisation sans import circulaire
     socketio = SocketIO(app, 
                        cors_allowed_origins=["http://localhost:3000", "http://127.0.0.1:5000"],
@@ -78,11 +97,7 @@ def create_app():
     @app.context_processor
     def inject_user():
         try:
-            verify_jwt_in_request(optional=True)
-            user_id = get_jwt_identity()
-            if user_id:
-                user = User.query.get(user_id)
-                return dict(user=user)
+            return dict(user=current_identity(optional=True))
         except Exception as e:
             logger.debug(f"Context processor error: {str(e)}")
         return dict(user=None)
@@ -98,6 +113,18 @@ def create_app():
     from backend.sockets import init_socketio
     init_socketio(socketio)
 
+    # Commandes CLI de maintenance
+    from backend.commands import init_commands
+    init_commands(app)
+
+    # Cache des réponses des endpoints de lecture
+    from backend.cache import init_cache
+    init_cache(app)
+
+    # Précalcul des matches en arrière-plan
+    from backend.jobs import init_jobs
+    init_jobs(app)
+
     # Diagnostic des routes
     logger.info("=== ROUTES ENREGISTRÉES ===")
     for rule in app.url_map.iter_rules():
@@ -110,10 +137,11 @@ def create_app():
 app, socketio = create_app()
 
 if __name__ == '__main__':
-    # Création des tables
+    # Création des tables et migrations du schéma
     with app.app_context():
         try:
-            db.create_all()
+            from backend.migrations import run_migrations
+            run_migrations()
             logger.info("Base de données initialisée avec succès")
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation de la base: {str(e)}")
@@ -0,0 +1,385 @@
+# backend/cache.py
+"""
+Cache des réponses des endpoints de lecture.
+
+Les réponses JSON réussies sont conservées (corps et en-têtes de
+validation) dans un backend clé/valeur: LocalCache, LRU avec expiration
+propre au processus, ou RedisCache, partagé entre processus (REDIS_URL).
+
+Chaque entrée est associée à des tags ('trajets', 'user:12', ...). Un tag
+est invalidé en lui attribuant un nouveau jeton: une entrée n'est servie
+que si les jetons enregistrés à son calcul sont toujours ceux de ses
+tags. Les listeners de commit invalident les tags des lignes modifiées;
+un tag sans jeton en reçoit un à la première lecture. Le backend n'a
+ainsi besoin que de get / set / add, et un jeton expulsé ne peut jamais
+faire servir une entrée périmée. Avec LocalCache, les
+invalidations ne touchent que le processus courant: les autres servent
+leurs entrées jusqu'à l'expiration du TTL.
+"""
+from collections import OrderedDict, defaultdict
+from functools import wraps
+import json
+import logging
+import threading
+import time
+import uuid
+
+from flask import current_app, has_app_context, make_response, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from backend.models import Evaluation, Message, Reservation, Trajet, User
+
+try:
+    import redis
+except ImportError:  # redis est optionnel: seul le cache local est alors disponible
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 30
+DEFAULT_MAX_ENTRIES = 2048
+
+# Capacité du LRU des jetons de tags, par entrée de réponse
+TAGS_PER_ENTRY = 4
+
+# En-têtes conservés avec le corps d'une réponse
+CACHED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+# Clé de session.info des tags à invalider au commit
+PENDING_TAGS_KEY = 'cache_pending_tags'
+
+
+class LocalCache:
+    """
+    Backend en mémoire: LRU borné à max_entries, entrées expirant après
+    leur TTL. Les jetons de tags sont rangés dans un LRU séparé, plus
+    grand, pour qu'un afflux de réponses ne les expulse pas.
+    on_evict(clé) est appelé pour chaque entrée expulsée par la limite.
+    """
+
+    reports_evictions = True
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, on_evict=None):
+        self.max_entries = max_entries
+        self.max_tags = max_entries * TAGS_PER_ENTRY
+        self.on_evict = on_evict
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # clé -> (expire_at ou None, valeur)
+        self._tags = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        values = []
+        with self._lock:
+            for key in keys:
+                if key.startswith('tag:'):
+                    values.append(self._tags.get(key))
+                    if key in self._tags:
+                        self._tags.move_to_end(key)
+                    continue
+                item = self._entries.get(key)
+                if item is None or (item[0] is not None and item[0] <= now):
+                    self._entries.pop(key, None)
+                    values.append(None)
+                    continue
+                self._entries.move_to_end(key)
+                values.append(item[1])
+        return values
+
+    def _set_tag(self, key, value):
+        self._tags[key] = value
+        self._tags.move_to_end(key)
+        while len(self._tags) > self.max_tags:
+            self._tags.popitem(last=False)
+
+    def add(self, key, value):
+        """Enregistre value si key est absente; retourne la valeur en place"""
+        with self._lock:
+            if key in self._tags:
+                return self._tags[key]
+            self._set_tag(key, value)
+            return value
+
+    def set(self, key, value, ttl=None):
+        if key.startswith('tag:'):
+            with self._lock:
+                self._set_tag(key, value)
+            return
+
+        evicted = []
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+        if self.on_evict is not None:
+            for evicted_key in evicted:
+                self.on_evict(evicted_key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+
+class RedisCache:
+    """
+    Backend Redis (ou compatible): partagé entre processus, expiration par
+    Redis. Redis expulse les clés lui-même (maxmemory-policy), sans
+    signaler lesquelles: les expulsions par endpoint ne sont pas connues.
+    """
+
+    reports_evictions = False
+
+    def __init__(self, client, prefix='roadonifri:cache:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get_many(self, keys):
+        return self.client.mget([self.prefix + key for key in keys])
+
+    def add(self, key, value):
+        """Enregistre value si key est absente; retourne la valeur en place"""
+        if self.client.set(self.prefix + key, value, nx=True):
+            return value
+        return self.client.get(self.prefix + key) or value
+
+    def set(self, key, value, ttl=None):
+        if ttl:
+            self.client.set(self.prefix + key, value, ex=int(ttl))
+        else:
+            self.client.set(self.prefix + key, value)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+def _pack(tokens, status, headers, body):
+    meta = json.dumps({'t': tokens, 's': status, 'h': headers}, separators=(',', ':'))
+    return meta.encode('utf-8') + b'\n' + body
+
+
+def _unpack(value):
+    meta, body = value.split(b'\n', 1)
+    meta = json.loads(meta)
+    return meta['t'], meta['s'], meta['h'], body
+
+
+def _token(value):
+    if isinstance(value, bytes):
+        return value.decode('ascii')
+    return value
+
+
+class CacheStats:
+    """
+    Compteurs par endpoint: hits, misses, stores, evictions. evictions vaut
+    None si le backend ne signale pas ses expulsions (voir RedisCache).
+    """
+
+    FIELDS = ('hits', 'misses', 'stores', 'evictions')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+        self.invalidations = 0
+        self.evictions_reported = True
+
+    def incr(self, endpoint, field):
+        with self._lock:
+            self._counts[endpoint][field] += 1
+
+    def invalidated(self, count):
+        with self._lock:
+            self.invalidations += count
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, counts in self._counts.items():
+                lookups = counts['hits'] + counts['misses']
+                endpoints[endpoint] = {
+                    **counts,
+                    'evictions': counts['evictions'] if self.evictions_reported else None,
+                    'hit_ratio': round(counts['hits'] / lookups, 3) if lookups else 0.0
+                }
+            return {'endpoints': endpoints, 'tag_invalidations': self.invalidations}
+
+
+class ResponseCache:
+    """Cache des réponses, configuré par init_cache (local par défaut)"""
+
+    def __init__(self):
+        self.stats = CacheStats()
+        self.backend = LocalCache(on_evict=self._evicted)
+        self.enabled = True
+
+    def configure(self, backend, enabled=True):
+        self.backend = backend
+        self.enabled = enabled
+        self.stats.evictions_reported = backend.reports_evictions
+
+    def _evicted(self, key):
+        # Clés d'entrées: 'resp:<endpoint>:<...>'
+        self.stats.incr(key.split(':', 2)[1], 'evictions')
+
+    def invalidate(self, tags):
+        """Invalide les entrées portant l'un des tags"""
+        for tag in tags:
+            self.backend.set(f'tag:{tag}', uuid.uuid4().hex)
+        self.stats.invalidated(len(tags))
+
+    def lookup(self, endpoint, key, tags):
+        """
+        Retourne (réponse ou None, jetons courants des tags). Les jetons
+        sont lus avant le calcul de la réponse: une invalidation survenue
+        pendant ce calcul rend l'entrée stockée aussitôt périmée.
+        """
+        values = self.backend.get_many([key] + [f'tag:{tag}' for tag in tags])
+        tokens = [
+            _token(value) if value is not None else _token(self.backend.add(f'tag:{tag}', uuid.uuid4().hex))
+            for tag, value in zip(tags, values[1:])
+        ]
+        if values[0] is not None:
+            stored_tokens, status, headers, body = _unpack(values[0])
+            if stored_tokens == tokens:
+                self.stats.incr(endpoint, 'hits')
+                response = current_app.response_class(body, status=status, mimetype='application/json')
+                response.headers.update(headers)
+                return response, tokens
+        self.stats.incr(endpoint, 'misses')
+        return None, tokens
+
+    def store(self, endpoint, key, tokens, response, ttl):
+        headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+        self.backend.set(key, _pack(tokens, response.status_code, headers, response.get_data()), ttl)
+        self.stats.incr(endpoint, 'stores')
+
+
+# Cache partagé par les blueprints du processus courant
+response_cache = ResponseCache()
+
+
+def cache_ttl():
+    if has_app_context():
+        return current_app.config.get('CACHE_DEFAULT_TTL', DEFAULT_TTL_SECONDS)
+    return DEFAULT_TTL_SECONDS
+
+
+def cached_response(tags, ttl=None, vary=None):
+    """
+    Décorateur de vue GET: sert la réponse en cache si ses tags n'ont pas
+    été invalidés depuis, sinon l'exécute et conserve une réponse 200 JSON.
+
+    tags est une liste de tags ou une fonction des arguments de la vue qui
+    la retourne; vary() retourne une partie de clé propre à la requête
+    (l'utilisateur courant par exemple). La clé inclut les paramètres de
+    la requête. Les requêtes conditionnelles sont résolues sur l'entrée.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not response_cache.enabled:
+                return view(*args, **kwargs)
+
+            endpoint = request.endpoint
+            entry_tags = list(tags(*args, **kwargs) if callable(tags) else tags)
+            parts = [endpoint, json.dumps(kwargs, sort_keys=True, default=str)]
+            if vary is not None:
+                parts.append(str(vary()))
+            parts.append('&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True))))
+            key = 'resp:' + ':'.join(parts)
+
+            try:
+                response, tokens = response_cache.lookup(endpoint, key, entry_tags)
+            except Exception as e:
+                logger.warning(f"Cache indisponible ({endpoint}): {str(e)}")
+                return view(*args, **kwargs)
+            if response is not None:
+                return response.make_conditional(request)
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and response.mimetype == 'application/json':
+                try:
+                    response_cache.store(endpoint, key, tokens, response, ttl or cache_ttl())
+                except Exception as e:
+                    logger.warning(f"Réponse non mise en cache ({endpoint}): {str(e)}")
+            return response
+        return wrapper
+    return decorator
+
+
+def init_cache(app):
+    """
+    Configure le backend selon CACHE_BACKEND: 'redis' (REDIS_URL), 'local'
+    ou 'none'. Sans valeur explicite, Redis est utilisé si REDIS_URL est
+    défini et le client redis installé.
+    """
+    backend_name = app.config.get('CACHE_BACKEND')
+    redis_url = app.config.get('CACHE_REDIS_URL')
+    if not backend_name:
+        backend_name = 'redis' if redis_url and redis is not None else 'local'
+
+    if backend_name == 'none':
+        response_cache.configure(response_cache.backend, enabled=False)
+    elif backend_name == 'redis':
+        if redis is None or not redis_url:
+            raise RuntimeError("CACHE_BACKEND=redis requiert le paquet redis et REDIS_URL")
+        response_cache.configure(RedisCache(redis.Redis.from_url(redis_url)))
+    else:
+        response_cache.configure(LocalCache(
+            max_entries=app.config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            on_evict=response_cache._evicted
+        ))
+    logger.info(f"Cache des réponses: {backend_name}")
+    return response_cache
+
+
+def cache_metrics():
+    """Compteurs du cache des réponses"""
+    return response_cache.stats.snapshot()
+
+
+# Tags invalidés par la modification d'une ligne, par modèle
+MODEL_TAGS = {
+    Trajet: lambda trajet: ('trajets', f'trajet:{trajet.id}', f'user:{trajet.conducteur_id}'),
+    User: lambda user: (f'user:{user.id}',),
+    Reservation: lambda reservation: (
+        f'trajet:{reservation.trajet_id}', f'user:{reservation.passager_id}'
+    ),
+    Evaluation: lambda evaluation: (f'user:{evaluation.evalue_id}',),
+    Message: lambda message: (f'messages:{message.room}',),
+}
+
+
+def record_tags(mapper, connection, target):
+    """Ligne modifiée: ses tags seront invalidés au commit"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(PENDING_TAGS_KEY, set()).update(MODEL_TAGS[mapper.class_](target))
+
+
+for _model in MODEL_TAGS:
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, record_tags)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_committed_tags(session):
+    tags = session.info.pop(PENDING_TAGS_KEY, None)
+    if tags:
+        try:
+            response_cache.invalidate(sorted(tags))
+        except Exception as e:
+            logger.error(f"Invalidation du cache impossible: {str(e)}")
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_pending_tags(session):
+    session.info.pop(PENDING_TAGS_KEY, None)
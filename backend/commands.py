@@ -0,0 +1,25 @@
+# backend/commands.py
+"""
+Commandes CLI de maintenance (flask <commande>).
+"""
+import click
+
+from backend.counters import reconcile_counters
+from backend.migrations import run_migrations
+
+
+def init_commands(app):
+    """Enregistre les commandes de maintenance sur l'application"""
+
+    @app.cli.command('upgrade-schema')
+    def upgrade_schema():
+        """Crée les tables manquantes et applique les migrations"""
+        run_migrations()
+        click.echo("Schéma de base de données à jour")
+
+    @app.cli.command('reconcile-counters')
+    @click.option('--dry-run', is_flag=True, help="Compte les écarts sans les corriger")
+    def reconcile(dry_run):
+        """Recalcule les compteurs dénormalisés (réservations confirmées, notes, trajets complétés)"""
+        for name, count in reconcile_counters(dry_run=dry_run).items():
+            click.echo(f"{name}: {count} lignes {'en écart' if dry_run else 'corrigées'}")
@@ -0,0 +1,142 @@
+# backend/conditional.py
+"""
+Requêtes HTTP conditionnelles (ETag / Last-Modified).
+
+Les lectures de trajets et de profil dérivent un ETag de ce qui détermine
+leur contenu: updated_at pour une ligne, version de la collection pour une
+liste. Un client qui renvoie l'ETag (If-None-Match) ou la date
+(If-Modified-Since) de sa copie reçoit un 304 sans que la réponse soit
+requêtée ni sérialisée.
+
+La version d'une collection est une ligne de collection_versions,
+incrémentée dans la transaction qui modifie la collection: elle est donc
+partagée par tous les processus et validée en même temps que les données.
+Les compteurs dénormalisés (places_reservees), modifiés en SQL par les
+listeners de backend.models et par la réconciliation, l'incrémentent aussi.
+"""
+from datetime import datetime, timezone
+import hashlib
+
+from flask import current_app, request
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+
+from backend.extensions import db
+from backend.models import RECOUNTED_KEY, CollectionVersion, Trajet
+
+# Collections versionnées: modèle -> nom dans collection_versions
+VERSIONED_COLLECTIONS = {Trajet: 'trajets'}
+
+# Clé de session.info des collections modifiées par le flush en cours
+CHANGED_COLLECTIONS_KEY = 'changed_collections'
+
+
+def collection_version(name):
+    """(version, dernière modification) d'une collection, (0, None) si jamais modifiée"""
+    table = CollectionVersion.__table__
+    row = db.session.execute(
+        select(table.c.version, table.c.updated_at).where(table.c.name == name)
+    ).first()
+    if row is None:
+        return 0, None
+    return row.version, row.updated_at
+
+
+def make_etag(*parts):
+    """ETag opaque dérivé des parties données"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:24]
+
+
+def request_args_key():
+    """Paramètres de la requête sous forme canonique, pour les ETags de listes"""
+    return '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+
+
+def _http_date(value):
+    """datetime UTC naïf -> datetime aware à la seconde (précision des en-têtes HTTP)"""
+    return value.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def add_validators(response, etag, last_modified=None, private=False):
+    """Ajoute ETag, Last-Modified et Cache-Control (revalidation systématique)"""
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _http_date(last_modified)
+    response.cache_control.no_cache = True
+    if private:
+        response.cache_control.private = True
+    return response
+
+
+def not_modified(etag, last_modified=None, private=False):
+    """
+    Réponse 304 si la copie du client est à jour, None sinon.
+    If-None-Match prime sur If-Modified-Since lorsqu'il est présent.
+    """
+    if request.if_none_match:
+        fresh = request.if_none_match.contains_weak(etag)
+    elif last_modified is not None and request.if_modified_since is not None:
+        fresh = _http_date(last_modified) <= request.if_modified_since
+    else:
+        fresh = False
+
+    if not fresh:
+        return None
+    return add_validators(current_app.response_class(status=304), etag, last_modified, private)
+
+
+def _mark_changed(mapper, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(CHANGED_COLLECTIONS_KEY, set()).add(VERSIONED_COLLECTIONS[mapper.class_])
+
+
+def record_collection_change(mapper, connection, target):
+    """Ligne insérée ou supprimée: sa collection changera de version au flush"""
+    _mark_changed(mapper, target)
+
+
+def record_collection_update(mapper, connection, target):
+    """Ligne modifiée: idem, sauf si aucune colonne n'a réellement changé"""
+    session = object_session(target)
+    if session is not None and session.is_modified(target, include_collections=False):
+        _mark_changed(mapper, target)
+
+
+for _model in VERSIONED_COLLECTIONS:
+    event.listen(_model, 'after_insert', record_collection_change)
+    event.listen(_model, 'after_update', record_collection_update)
+    event.listen(_model, 'after_delete', record_collection_change)
+
+
+def bump_versions(connection, names):
+    """Incrémente, dans la transaction de connection, la version des collections names"""
+    table = CollectionVersion.__table__
+    now = datetime.utcnow()
+    for name in sorted(names):
+        updated = connection.execute(
+            table.update()
+            .where(table.c.name == name)
+            .values(version=table.c.version + 1, updated_at=now)
+        ).rowcount
+        if not updated:
+            connection.execute(table.insert().values(name=name, version=1, updated_at=now))
+
+
+# insert=True: s'exécute avant backend.models.expire_recounted, qui consomme
+# les compteurs modifiés en SQL pendant le flush (RECOUNTED_KEY)
+@event.listens_for(Session, 'after_flush', insert=True)
+def bump_collection_versions(session, flush_context):
+    """Incrémente, dans la transaction du flush, la version des collections modifiées"""
+    names = session.info.pop(CHANGED_COLLECTIONS_KEY, None) or set()
+    names.update(
+        VERSIONED_COLLECTIONS[model] for model, _, _ in session.info.get(RECOUNTED_KEY, ())
+        if model in VERSIONED_COLLECTIONS
+    )
+    if names:
+        bump_versions(session.connection(), names)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_collection_changes(session):
+    session.info.pop(CHANGED_COLLECTIONS_KEY, None)
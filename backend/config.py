@@ -41,8 +41,50 @@ class Config:
     # Configuration CORS
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000').split(',')
     
-    # Limites de taux
-    RATELIMIT_STORAGE_URL = os.environ.get('REDIS_URL', 'memory://')
+    # Matching: intervalle de reconstruction de l'index en mémoire (secondes),
+    # soit le retard maximal sur les trajets validés par les autres processus
+    MATCHING_INDEX_REFRESH_SECONDS = int(os.environ.get('MATCHING_INDEX_REFRESH_SECONDS', 300))
+    
+    # Matching: durée de vie du cache des statistiques par utilisateur (secondes)
+    MATCHING_STATS_CACHE_SECONDS = int(os.environ.get('MATCHING_STATS_CACHE_SECONDS', 30))
+    
+    # Matching: scoring parallèle au-delà de ce nombre de candidats
+    MATCHING_PARALLEL_THRESHOLD = int(os.environ.get('MATCHING_PARALLEL_THRESHOLD', 80000))
+    MATCHING_PARALLEL_WORKERS = int(os.environ.get('MATCHING_PARALLEL_WORKERS', min(os.cpu_count() or 1, 8)))
+    
+    # Matching: précalcul en arrière-plan (désactivé par défaut, nombre de workers pour l'activer)
+    MATCH_WORKERS = int(os.environ.get('MATCH_WORKERS', 0))
+    MATCH_JOB_BATCH_SIZE = int(os.environ.get('MATCH_JOB_BATCH_SIZE', 50))
+    MATCH_JOB_INTERVAL_SECONDS = int(os.environ.get('MATCH_JOB_INTERVAL_SECONDS', 30))
+    MATCH_ACTIVE_USER_SECONDS = int(os.environ.get('MATCH_ACTIVE_USER_SECONDS', 1800))
+    
+    # Encodage JSON des réponses par orjson s'il est installé
+    JSON_USE_ORJSON = os.environ.get('JSON_USE_ORJSON', 'True').lower() == 'true'
+    
+    # Cache des réponses: 'local', 'redis' ou 'none' (par défaut Redis si REDIS_URL est défini)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND')
+    CACHE_REDIS_URL = os.environ.get('REDIS_URL')
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 30))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 2048))
+    
+    # Révocation des JWT: 'redis', 'database' ou 'memory' (par défaut Redis si REDIS_URL est défini)
+    REVOCATION_BACKEND = os.environ.get('REVOCATION_BACKEND')
+    REVOCATION_REDIS_URL = os.environ.get('REDIS_URL')
+    REVOCATION_SYNC_SECONDS = float(os.environ.get('REVOCATION_SYNC_SECONDS', 1))
+    REVOCATION_BLOOM_CAPACITY = int(os.environ.get('REVOCATION_BLOOM_CAPACITY', 10000))
+    REVOCATION_BLOOM_ERROR_RATE = float(os.environ.get('REVOCATION_BLOOM_ERROR_RATE', 0.001))
+    
+    # Hachage des mots de passe: 'scrypt', 'pbkdf2' ou 'bcrypt' (voir backend.passwords)
+    PASSWORD_HASH_ALGORITHM = os.environ.get('PASSWORD_HASH_ALGORITHM', 'scrypt')
+    PASSWORD_HASH_COST = int(os.environ['PASSWORD_HASH_COST']) if os.environ.get('PASSWORD_HASH_COST') else None
+    PASSWORD_HASH_WORKERS = int(os.environ['PASSWORD_HASH_WORKERS']) if os.environ.get('PASSWORD_HASH_WORKERS') else None
+    PASSWORD_HASH_MAX_PENDING = int(os.environ['PASSWORD_HASH_MAX_PENDING']) if os.environ.get('PASSWORD_HASH_MAX_PENDING') else None
+    PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+    
+    # Limites de taux: Redis partagé précédé d'un bucket local (voir backend.rate_limit)
+    RATELIMIT_STORAGE_URI = f"bucket+{os.environ['REDIS_URL']}" if os.environ.get('REDIS_URL') else 'memory://'
+    RATELIMIT_LEASE_FRACTION = float(os.environ.get('RATELIMIT_LEASE_FRACTION', 0.1))
+    RATELIMIT_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))  # Processus web partageant les limites
     
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
@@ -92,6 +134,11 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     JWT_COOKIE_CSRF_PROTECT = False
+    CACHE_BACKEND = 'none'
+    REVOCATION_BACKEND = 'memory'
+    PASSWORD_HASH_ALGORITHM = 'pbkdf2'
+    PASSWORD_HASH_COST = 1000
+    PASSWORD_HASH_WORKERS = 0
     
     # Clés de test
     SECRET_KEY = 'test_secret_key'
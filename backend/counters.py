@@ -0,0 +1,71 @@
+# backend/counters.py
+"""
+Compteurs dénormalisés.
+
+Les compteurs déclarés dans backend.models.COUNTERS (réservations confirmées d'un
+trajet, notes et trajets complétés d'un utilisateur) sont tenus à jour par
+des listeners dans la transaction qui modifie les lignes sources. Les
+écritures faites hors de l'ORM peuvent toutefois les faire dériver: la
+réconciliation les recalcule en bloc depuis les tables sources et corrige
+les lignes en écart (la version des collections corrigées avance, voir
+backend.conditional).
+"""
+import logging
+
+from sqlalchemy import func, or_, select
+
+from backend.conditional import VERSIONED_COLLECTIONS, bump_versions
+from backend.extensions import db
+from backend.models import COUNTERS
+
+logger = logging.getLogger(__name__)
+
+
+def expected_value(counter):
+    """Valeur attendue du compteur, en sous-requête corrélée à la ligne propriétaire"""
+    source = counter.source.__table__
+    owner = counter.owner.__table__
+    return (
+        select(func.coalesce(func.sum(counter.expression(source)), 0))
+        .where(source.c[counter.owner_attr] == owner.c.id)
+        .scalar_subquery()
+    )
+
+
+def reconcile_counter(counter, dry_run=False):
+    """
+    Recalcule un compteur pour toutes les lignes en une requête et corrige
+    celles qui ont dérivé. Retourne le nombre de lignes en écart (non
+    corrigées si dry_run).
+    """
+    owner = counter.owner.__table__
+    column = owner.c[counter.column]
+    expected = expected_value(counter)
+    drifted = or_(column.is_(None), column != expected)
+
+    if dry_run:
+        return db.session.execute(select(func.count()).select_from(owner).where(drifted)).scalar()
+    return db.session.execute(owner.update().where(drifted).values({counter.column: expected})).rowcount
+
+
+def reconcile_counters(dry_run=False, columns=None):
+    """
+    Réconcilie les compteurs (tous, ou ceux dont la colonne figure dans
+    columns). Retourne {'table.colonne': lignes en écart}.
+    """
+    drift = {}
+    changed = set()
+    for counter in COUNTERS:
+        if columns is not None and counter.column not in columns:
+            continue
+        name = f"{counter.owner.__tablename__}.{counter.column}"
+        drift[name] = reconcile_counter(counter, dry_run=dry_run)
+        if drift[name]:
+            logger.warning(f"Compteur {name} en écart sur {drift[name]} lignes")
+            if counter.owner in VERSIONED_COLLECTIONS:
+                changed.add(VERSIONED_COLLECTIONS[counter.owner])
+    if not dry_run:
+        if changed:
+            bump_versions(db.session.connection(), changed)
+        db.session.commit()
+    return drift
@@ -11,7 +11,7 @@ from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_marshmallow import Marshmallow
-from flask_bcrypt import Bcrypt
+from backend.rate_limit import init_rate_limit
 import logging
 import os
 
@@ -27,19 +27,15 @@ jwt = JWTManager()
 # CORS pour les requêtes cross-origin
 cors = CORS()
 
-# Rate limiting pour la sécurité
+# Rate limiting pour la sécurité (stockage: RATELIMIT_STORAGE_URI, voir backend.rate_limit).
+# Pas de limite par défaut: seules les routes décorées (/login, /inscription) sont limitées
 limiter = Limiter(
     key_func=get_remote_address,
-    default_limits=["200 per day", "50 per hour"],
-    storage_uri="memory://",  # Sera remplacé par Redis en production
 )
 
 # Sérialisation/désérialisation
 ma = Marshmallow()
 
-# Hachage des mots de passe
-bcrypt = Bcrypt()
-
 # Configuration du logging
 def setup_logging(app):
     """Configure le système de logging"""
@@ -97,21 +93,6 @@ def configure_jwt(app):
             'error': 'token_revoked'
         }, 401
 
-# Liste des tokens révoqués (en production, utilisez Redis)
-revoked_tokens = set()
-
-def configure_jwt_revocation():
-    """Configure la révocation des tokens"""
-    
-    @jwt.token_in_blocklist_loader
-    def check_if_token_revoked(jwt_header, jwt_payload):
-        jti = jwt_payload['jti']
-        return jti in revoked_tokens
-
-def revoke_token(jti):
-    """Révoque un token"""
-    revoked_tokens.add(jti)
-
 def init_extensions(app):
     """Initialise toutes les extensions avec l'application Flask"""
     
@@ -122,16 +103,20 @@ def init_extensions(app):
     cors.init_app(app, origins=app.config.get('CORS_ORIGINS', ['http://localhost:3000']))
     
     # Configuration du rate limiter
-    limiter.init_app(app)
-    if app.config.get('RATELIMIT_STORAGE_URL'):
-        limiter.storage_uri = app.config['RATELIMIT_STORAGE_URL']
+    init_rate_limit(app, limiter)
     
     ma.init_app(app)
-    bcrypt.init_app(app)
+    
+    # Hachage des mots de passe (voir backend.passwords)
+    from backend.passwords import init_passwords
+    init_passwords(app)
     
     # Configuration des callbacks
     configure_jwt(app)
-    configure_jwt_revocation()
+    
+    # Révocation des tokens (voir backend.revocation)
+    from backend.revocation import init_revocation
+    init_revocation(app, jwt)
     
     # Configuration du logging
     setup_logging(app)
@@ -198,14 +183,19 @@ def reset_database():
 from functools import wraps
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
 
+# Rôle des utilisateurs ayant accès aux endpoints d'administration (métriques)
+ADMIN_ROLE = 'admin'
+
 def admin_required(f):
     """Décorateur pour vérifier les permissions d'administrateur"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
         verify_jwt_in_request()
-        current_user_id = get_jwt_identity()
-        # Ici vous pourriez vérifier si l'utilisateur est admin
-        # en interrogeant la base de données
+        # Rôle lu en base: un changement de rôle prend effet sans attendre l'expiration du token
+        from backend.identity import current_identity
+        user = current_identity()
+        if user is None or user.role != ADMIN_ROLE:
+            return {"error": "Accès réservé aux administrateurs"}, 403
         return f(*args, **kwargs)
     return decorated_function
 
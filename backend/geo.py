@@ -0,0 +1,166 @@
+# backend/geo.py
+"""
+Géolocalisation hors ligne et recherche par rayon.
+
+Les noms de lieux sont géocodés à partir d'un gazetteer local (fichier CSV
+nom,latitude,longitude), sans appel à une API externe. Les points sont
+rangés dans une grille uniforme: une recherche "à moins de R km" ne visite
+que les cellules recouvrant le rayon demandé.
+"""
+from collections import defaultdict
+import csv
+from functools import lru_cache
+import logging
+import math
+import os
+import threading
+
+from backend.locations import TrigramIndex, normalize_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), 'data', 'gazetteer.csv')
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Similarité minimale pour accepter un nom approché du gazetteer
+GEOCODE_MIN_SIMILARITY = 0.5
+
+# Taille des cellules de la grille (~5,5 km à l'équateur)
+GRID_CELL_DEGREES = 0.05
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance à vol d'oiseau entre deux points, en kilomètres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def _place_key(name):
+    return ' '.join(sorted(normalize_tokens(name)))
+
+
+class Gazetteer:
+    """Table nom de lieu -> (latitude, longitude) chargée depuis un fichier local"""
+
+    def __init__(self, path=DEFAULT_GAZETTEER_PATH):
+        self.path = path
+        self._places = {}
+        self._trigrams = TrigramIndex()
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        with self._lock:
+            if self._loaded:
+                return
+            try:
+                with open(self.path, encoding='utf-8') as handle:
+                    rows = csv.DictReader(line for line in handle if not line.startswith('#'))
+                    for row in rows:
+                        key = _place_key(row['nom'])
+                        self._places[key] = (float(row['latitude']), float(row['longitude']))
+                        self._trigrams.add(key)
+                logger.info(f"Gazetteer chargé: {len(self._places)} lieux")
+            except (OSError, KeyError, ValueError) as e:
+                logger.error(f"Impossible de charger le gazetteer {self.path}: {str(e)}")
+            self._loaded = True
+
+    def __len__(self):
+        self._load()
+        return len(self._places)
+
+    def geocode(self, place):
+        """
+        Retourne (latitude, longitude) d'un nom de lieu, ou None s'il est
+        inconnu. Les variantes proches ("calavi kpota", "Abomey Calavi") sont
+        rapprochées par trigrammes.
+        """
+        key = _place_key(place) if place else ''
+        if not key:
+            return None
+
+        self._load()
+        coordinates = self._places.get(key)
+        if coordinates is not None:
+            return coordinates
+
+        best = self._trigrams.search(key, threshold=GEOCODE_MIN_SIMILARITY, limit=1)
+        if best:
+            return self._places[best[0][0]]
+        return None
+
+
+gazetteer = Gazetteer()
+
+
+@lru_cache(maxsize=4096)
+def geocode(place):
+    """Géocode un nom de lieu avec le gazetteer local (résultat mis en cache)"""
+    return gazetteer.geocode(place)
+
+
+class GridIndex:
+    """
+    Index spatial en grille uniforme (clé -> latitude, longitude).
+    Non protégé: l'appelant sérialise les accès.
+    """
+
+    def __init__(self, cell_degrees=GRID_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._cells = defaultdict(set)
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def add(self, key, lat, lon):
+        """Indexe (ou déplace) un point"""
+        self.remove(key)
+        self._points[key] = (lat, lon)
+        self._cells[self._cell(lat, lon)].add(key)
+
+    def remove(self, key):
+        """Retire un point de l'index"""
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        bucket = self._cells.get(cell)
+        if bucket is not None:
+            bucket.discard(key)
+            if not bucket:
+                del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._points.clear()
+
+    def within(self, lat, lon, radius_km):
+        """
+        Points à moins de radius_km de (lat, lon), sous forme de liste
+        (clé, distance_km) triée par distance croissante.
+        """
+        dlat = radius_km / KM_PER_DEGREE
+        dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+        min_cell = self._cell(lat - dlat, lon - dlon)
+        max_cell = self._cell(lat + dlat, lon + dlon)
+
+        results = []
+        for cell_lat in range(min_cell[0], max_cell[0] + 1):
+            for cell_lon in range(min_cell[1], max_cell[1] + 1):
+                for key in self._cells.get((cell_lat, cell_lon), ()):
+                    point_lat, point_lon = self._points[key]
+                    distance = haversine_km(lat, lon, point_lat, point_lon)
+                    if distance <= radius_km:
+                        results.append((key, distance))
+
+        results.sort(key=lambda item: item[1])
+        return results
@@ -0,0 +1,138 @@
+# backend/horaires.py
+"""
+Interprétation des horaires en texte libre.
+
+Fonctions pures (sans accès à la base) partagées par les modèles, qui
+persistent les formes normalisées, et par le moteur de matching.
+"""
+from functools import lru_cache
+import re
+
+HOURS_PER_DAY = 24
+MINUTES_PER_HOUR = 60
+
+# Périodes nommées reconnues dans les préférences horaires
+TIME_PERIODS = (
+    ('matin', (6, 7, 8, 9, 10)),
+    ('midi', (11, 12, 13, 14)),
+    ('soir', (17, 18, 19, 20, 21)),
+    ('nuit', (22, 23, 0, 1, 2)),
+)
+
+# Extraction d'heures spécifiques dans les préférences (8h, 14h30, etc.)
+PREFERENCE_HOUR_PATTERN = re.compile(r'(\d{1,2})h?(\d{0,2})?')
+
+# Horaire de départ d'un trajet: "8h30", "14h", "08:30", etc.
+DEPARTURE_HOUR_PATTERN = re.compile(r'(\d{1,2})[h:]?(\d{0,2})?')
+
+# Heure renvoyée pour un horaire de départ non interprétable
+UNKNOWN_HOUR = -1
+
+
+def hours_mask(hours):
+    """Masque 24 bits des heures données (hors plage 0-23 ignorées)"""
+    mask = 0
+    for hour in hours:
+        if 0 <= hour < HOURS_PER_DAY:
+            mask |= 1 << hour
+    return mask
+
+
+@lru_cache(maxsize=4096)
+def parse_preference_mask(horaires):
+    """
+    Parse les préférences horaires (format simple) en masque 24 bits:
+    le bit h est levé si l'heure h est préférée. Résultat mis en cache par
+    chaîne brute.
+    """
+    if not horaires:
+        return 0
+
+    # Formats supportés: "8h-10h", "matin", "soir", "8h", etc.
+    horaires_lower = horaires.lower()
+    mask = 0
+
+    for period, hours in TIME_PERIODS:
+        if period in horaires_lower:
+            mask |= hours_mask(hours)
+            break
+
+    for match in PREFERENCE_HOUR_PATTERN.findall(horaires_lower):
+        mask |= hours_mask((int(match[0]),))
+
+    return mask
+
+
+@lru_cache(maxsize=4096)
+def parse_preference_order(horaires):
+    """
+    Heures préférées dans l'ordre où le score horaire les parcourt: celui
+    de l'ensemble des heures de la période nommée puis des heures
+    explicites, comme l'a toujours fait le matching. Le score retient la
+    première heure à moins de deux heures du départ (voir
+    matching.time_score_for_hours). Résultat mis en cache par chaîne brute.
+    """
+    if not horaires:
+        return ()
+
+    horaires_lower = horaires.lower()
+    preferences = []
+
+    for period, hours in TIME_PERIODS:
+        if period in horaires_lower:
+            preferences.extend(hours)
+            break
+
+    for match in PREFERENCE_HOUR_PATTERN.findall(horaires_lower):
+        hour = int(match[0])
+        if 0 <= hour < HOURS_PER_DAY:
+            preferences.append(hour)
+
+    return tuple(set(preferences))
+
+
+def mask_to_hours(mask):
+    """Liste croissante des heures d'un masque"""
+    return [hour for hour in range(HOURS_PER_DAY) if mask >> hour & 1]
+
+
+def parse_time_preference(horaires):
+    """
+    Parse les préférences horaires (format simple).
+    Retourne une liste d'heures préférées.
+    """
+    return mask_to_hours(parse_preference_mask(horaires))
+
+
+@lru_cache(maxsize=4096)
+def parse_departure_hour(horaire):
+    """
+    Extrait l'heure de départ d'un trajet ("8h30" -> 8).
+    Retourne UNKNOWN_HOUR si l'horaire n'est pas interprétable.
+    Le résultat est mis en cache par chaîne brute.
+    """
+    if not horaire:
+        return UNKNOWN_HOUR
+    time_match = DEPARTURE_HOUR_PATTERN.search(horaire.lower())
+    if not time_match:
+        return UNKNOWN_HOUR
+    return int(time_match.group(1))
+
+
+@lru_cache(maxsize=4096)
+def parse_departure_minute(horaire):
+    """
+    Convertit l'horaire de départ d'un trajet en minute de la journée
+    ("8h30" -> 510). Retourne None si l'horaire n'est pas une heure valide.
+    """
+    if not horaire:
+        return None
+    time_match = DEPARTURE_HOUR_PATTERN.search(horaire.lower())
+    if not time_match:
+        return None
+
+    hour = int(time_match.group(1))
+    minute = int(time_match.group(2) or 0)
+    if hour >= HOURS_PER_DAY or minute >= MINUTES_PER_HOUR:
+        return None
+    return hour * MINUTES_PER_HOUR + minute
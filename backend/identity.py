@@ -0,0 +1,73 @@
+# backend/identity.py
+"""
+Utilisateur courant, chargé une fois par requête.
+
+Le user_lookup_loader de Flask-JWT-Extended charge l'utilisateur du JWT à
+chaque vérification du token: décorateur jwt_required, puis à nouveau dans
+le context processor des templates. load_user garde les utilisateurs
+chargés sur flask.g, si bien que la vérification, la route, les templates
+et le matching partagent le même objet et une seule requête SQL.
+Hors requête HTTP (jobs, commandes CLI), rien n'est gardé: le contexte
+d'application y vit trop longtemps pour servir de cache. Pour la même
+raison, le cache est vidé au début de chaque requête: flask.g appartient
+au contexte d'application, partagé par les requêtes qui s'exécutent dans
+un contexte déjà ouvert (tests, scripts).
+"""
+from flask import current_app, g, has_request_context, request_started
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+from backend.extensions import db
+from backend.models import User
+
+# Attribut de flask.g: id -> User (ou None) chargés pendant la requête
+LOADED_USERS_ATTR = '_loaded_users'
+
+
+def _user_key(user_id):
+    """Id normalisé en entier (l'identité d'un JWT peut être une chaîne)"""
+    try:
+        return int(user_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def load_user(user_id):
+    """Utilisateur d'id user_id, chargé au plus une fois par requête (None si inconnu)"""
+    key = _user_key(user_id)
+    if key is None:
+        return None
+    if not has_request_context():
+        return db.session.get(User, key)
+
+    users = g.setdefault(LOADED_USERS_ATTR, {})
+    if key not in users:
+        users[key] = db.session.get(User, key)
+    return users[key]
+
+
+def forget_loaded_users(sender, **extra):
+    """Vide le cache des utilisateurs chargés (signal request_started)"""
+    g.pop(LOADED_USERS_ATTR, None)
+
+
+def current_identity(optional=False):
+    """
+    Utilisateur du JWT de la requête. Avec optional, le token est vérifié
+    s'il est présent et None est retourné sans token.
+    """
+    if optional:
+        verify_jwt_in_request(optional=True)
+    return load_user(get_jwt_identity())
+
+
+def init_identity(jwt):
+    """Branche le chargement de l'utilisateur courant sur le JWTManager"""
+    request_started.connect(forget_loaded_users)
+
+    @jwt.user_lookup_loader
+    def user_lookup_callback(jwt_header, jwt_payload):
+        return load_user(jwt_payload[current_app.config.get('JWT_IDENTITY_CLAIM', 'sub')])
+
+    @jwt.user_lookup_error_loader
+    def user_lookup_error_callback(jwt_header, jwt_payload):
+        return {"error": "Utilisateur introuvable"}, 404
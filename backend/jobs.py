@@ -0,0 +1,292 @@
+# backend/jobs.py
+"""
+Précalcul des matches en arrière-plan.
+
+Un thread de planification repère les utilisateurs actifs dont les matches
+matérialisés (voir backend.match_store) manquent ou vont expirer, les met
+en file, puis confie des lots d'utilisateurs à un pool de processus
+locaux. Chaque worker possède sa propre application Flask minimale et son
+propre index de matching; les résultats reviennent au processus web, qui
+les enregistre dans le store. Les routes /match ne calculent alors en
+ligne qu'en cas d'absence dans le cache.
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+import threading
+import time
+
+from flask import Flask
+
+from backend.extensions import db
+from backend.match_store import match_store, snapshot_user
+from backend.matching import compute_match_result, rescore_trajet
+from backend.matching_index import matching_index
+from backend.models import User
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 0
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_INTERVAL_SECONDS = 30
+DEFAULT_ACTIVE_SECONDS = 1800
+
+# Configuration transmise aux workers
+WORKER_CONFIG_KEYS = (
+    'SQLALCHEMY_DATABASE_URI',
+    'SQLALCHEMY_ENGINE_OPTIONS',
+    'SQLALCHEMY_TRACK_MODIFICATIONS',
+    'MATCHING_INDEX_REFRESH_SECONDS',
+)
+
+# Fenêtre (secondes) du calcul du débit
+THROUGHPUT_WINDOW_SECONDS = 60
+
+_worker_app = None
+
+
+def init_worker(config):
+    """Initialise un processus worker: application minimale et contexte actif"""
+    global _worker_app
+    _worker_app = Flask(__name__)
+    _worker_app.config.update(config)
+    db.init_app(_worker_app)
+    _worker_app.app_context().push()
+
+
+def compute_batch(user_ids, limit):
+    """
+    Calcule les matches d'un lot d'utilisateurs dans un worker.
+    Retourne une liste de (UserSnapshot, MatchResult).
+
+    L'index du worker n'est pas alimenté par les routes: il est reconstruit
+    à chaque lot, après la capture de la position du journal par le
+    processus web. Tout changement antérieur à cette position est donc
+    dans l'index, et match_store.put rejoue ceux qui ont suivi.
+    """
+    try:
+        matching_index.ensure_fresh(force=True)
+        results = []
+        for user in User.query.filter(User.id.in_(user_ids)).all():
+            results.append((snapshot_user(user), compute_match_result(user, limit)))
+        return results
+    finally:
+        db.session.remove()
+
+
+class JobQueue:
+    """File en mémoire d'utilisateurs à recalculer, sans doublons, FIFO"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._items = OrderedDict()
+
+    def __len__(self):
+        return len(self._items)
+
+    def put_many(self, user_ids):
+        """Ajoute des utilisateurs (ceux déjà en file gardent leur place)"""
+        with self._lock:
+            for user_id in user_ids:
+                self._items.setdefault(user_id, None)
+
+    def take(self, size):
+        """Retire jusqu'à size utilisateurs de la tête de file"""
+        with self._lock:
+            batch = []
+            while self._items and len(batch) < size:
+                batch.append(self._items.popitem(last=False)[0])
+            return batch
+
+
+class JobMetrics:
+    """Compteurs du précalcul: débit, profondeur de file, occupation des workers"""
+
+    def __init__(self, workers):
+        self._lock = threading.Lock()
+        self.workers = workers
+        self.started_at = time.monotonic()
+        self.batches_submitted = 0
+        self.batches_completed = 0
+        self.batches_failed = 0
+        self.users_computed = 0
+        self.results_stored = 0
+        self.busy_workers = 0
+        self._busy_seconds = 0.0
+        self._completions = deque()  # (instant, utilisateurs calculés)
+
+    def batch_started(self):
+        with self._lock:
+            self.batches_submitted += 1
+            self.busy_workers += 1
+
+    def batch_finished(self, duration, users, stored, failed=False):
+        now = time.monotonic()
+        with self._lock:
+            self.busy_workers -= 1
+            self._busy_seconds += duration
+            if failed:
+                self.batches_failed += 1
+                return
+            self.batches_completed += 1
+            self.users_computed += users
+            self.results_stored += stored
+            self._completions.append((now, users))
+
+    def snapshot(self, queue_depth):
+        """Métriques courantes sous forme de dict sérialisable"""
+        now = time.monotonic()
+        with self._lock:
+            while self._completions and now - self._completions[0][0] > THROUGHPUT_WINDOW_SECONDS:
+                self._completions.popleft()
+            recent_users = sum(users for _, users in self._completions)
+            uptime = now - self.started_at
+            return {
+                'workers': self.workers,
+                'busy_workers': self.busy_workers,
+                'queue_depth': queue_depth,
+                'batches_submitted': self.batches_submitted,
+                'batches_completed': self.batches_completed,
+                'batches_failed': self.batches_failed,
+                'users_computed': self.users_computed,
+                'results_stored': self.results_stored,
+                'throughput_users_per_second': round(recent_users / THROUGHPUT_WINDOW_SECONDS, 2),
+                'worker_utilization': round(
+                    self._busy_seconds / (self.workers * uptime), 3
+                ) if self.workers and uptime > 0 else 0.0,
+                'uptime_seconds': round(uptime, 1)
+            }
+
+
+class MatchPrecomputer:
+    """Planificateur et pool de processus du précalcul des matches"""
+
+    def __init__(self, app, workers, batch_size, interval, active_seconds):
+        self.app = app
+        self.workers = workers
+        self.batch_size = batch_size
+        self.interval = interval
+        self.active_seconds = active_seconds
+        self.queue = JobQueue()
+        self.metrics = JobMetrics(workers)
+        self._executor = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._slots = threading.Semaphore(workers)
+
+    def start(self):
+        """Démarre le pool de processus et le thread de planification"""
+        config = {key: self.app.config[key] for key in WORKER_CONFIG_KEYS if key in self.app.config}
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(config,)
+        )
+        self._thread = threading.Thread(target=self._run, name='match-precomputer', daemon=True)
+        self._thread.start()
+        logger.info(f"Précalcul des matches démarré: {self.workers} workers")
+
+    def stop(self):
+        """Arrête la planification et le pool (les lots en cours sont abandonnés)"""
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def schedule(self):
+        """Met en file les utilisateurs actifs dont les matches sont à rafraîchir"""
+        refresh_after = match_store.max_age() / 2
+        due = match_store.due_for_refresh(self.active_seconds, refresh_after)
+        self.queue.put_many(due)
+        return len(due)
+
+    def metrics_snapshot(self):
+        return self.metrics.snapshot(len(self.queue))
+
+    def _run(self):
+        next_schedule = 0.0
+        while not self._stop.is_set():
+            if time.monotonic() >= next_schedule:
+                with self.app.app_context():
+                    self.schedule()
+                next_schedule = time.monotonic() + self.interval
+
+            # Un lot par worker libre; sinon attendre qu'un worker se libère
+            if not self._slots.acquire(timeout=1):
+                continue
+            batch = self.queue.take(self.batch_size)
+            if not batch:
+                self._slots.release()
+                self._stop.wait(1)
+                continue
+            self._submit(batch)
+
+    def _submit(self, batch):
+        seq = match_store.seq
+        started = time.monotonic()
+        self.metrics.batch_started()
+        try:
+            future = self._executor.submit(compute_batch, batch, match_store.capacity)
+        except RuntimeError as e:
+            # Pool arrêté
+            logger.warning(f"Lot de précalcul non soumis: {str(e)}")
+            self.metrics.batch_finished(0.0, 0, 0, failed=True)
+            self._slots.release()
+            return
+        future.add_done_callback(lambda done: self._collect(done, seq, started))
+
+    def _collect(self, future, seq, started):
+        duration = time.monotonic() - started
+        try:
+            results = future.result()
+            with self.app.app_context():
+                stored = sum(
+                    1 for profile, result in results
+                    if match_store.put(profile, result, seq, rescore_trajet)
+                )
+            self.metrics.batch_finished(duration, len(results), stored)
+        except Exception as e:
+            logger.error(f"Erreur lors du précalcul des matches: {str(e)}")
+            self.metrics.batch_finished(duration, 0, 0, failed=True)
+        finally:
+            self._slots.release()
+
+
+# Précalcul du processus courant (None s'il est désactivé)
+precomputer = None
+
+
+def init_jobs(app):
+    """
+    Démarre le précalcul des matches si MATCH_WORKERS > 0. Il est désactivé
+    en test, avec une base SQLite en mémoire (invisible des workers) et dans
+    les workers eux-mêmes, qui peuvent réimporter le module principal.
+    """
+    global precomputer
+
+    if multiprocessing.parent_process() is not None:
+        return None
+
+    workers = app.config.get('MATCH_WORKERS', DEFAULT_WORKERS)
+    database_uri = app.config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if workers <= 0 or app.config.get('TESTING') or database_uri in ('sqlite://', 'sqlite:///:memory:'):
+        logger.info("Précalcul des matches désactivé")
+        return None
+
+    precomputer = MatchPrecomputer(
+        app,
+        workers=workers,
+        batch_size=app.config.get('MATCH_JOB_BATCH_SIZE', DEFAULT_BATCH_SIZE),
+        interval=app.config.get('MATCH_JOB_INTERVAL_SECONDS', DEFAULT_INTERVAL_SECONDS),
+        active_seconds=app.config.get('MATCH_ACTIVE_USER_SECONDS', DEFAULT_ACTIVE_SECONDS)
+    )
+    precomputer.start()
+    return precomputer
+
+
+def job_metrics():
+    """Métriques du précalcul, ou None s'il est désactivé"""
+    if precomputer is None:
+        return None
+    return precomputer.metrics_snapshot()
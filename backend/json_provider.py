@@ -0,0 +1,73 @@
+# backend/json_provider.py
+"""
+Encodage JSON des réponses de l'API.
+
+FastJSONProvider remplace le fournisseur par défaut de Flask: sortie
+compacte en UTF-8, dates et datetimes en ISO 8601 sans passer par
+isoformat() champ par champ, et encodage par orjson lorsqu'il est
+installé (repli sur le module json de la bibliothèque standard sinon, ou
+si JSON_USE_ORJSON vaut False).
+"""
+from datetime import date
+import decimal
+import json
+import uuid
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson est optionnel: repli sur le module json
+    orjson = None
+
+
+def _default(obj):
+    """Types non gérés nativement par le module json (ni par orjson pour Decimal)"""
+    if isinstance(obj, date):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Objet de type {type(obj).__name__} non sérialisable en JSON")
+
+
+def dumps_bytes(obj, use_orjson=True, sort_keys=False):
+    """Encode obj en JSON compact (bytes UTF-8)"""
+    if orjson is not None and use_orjson:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, sort_keys=sort_keys, separators=(',', ':')
+    ).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Fournisseur JSON de l'application (voir le docstring du module)"""
+
+    ensure_ascii = False
+    sort_keys = False
+    compact = True
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.use_orjson = orjson is not None and app.config.get('JSON_USE_ORJSON', True)
+
+    def dumps(self, obj, **kwargs):
+        if self.use_orjson and not kwargs:
+            return dumps_bytes(obj, sort_keys=self.sort_keys).decode('utf-8')
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Réponse JSON construite directement à partir des bytes encodés"""
+        obj = self._prepare_response_obj(args, kwargs)
+        body = dumps_bytes(obj, use_orjson=self.use_orjson, sort_keys=self.sort_keys)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,192 @@
+# backend/locations.py
+"""
+Normalisation et comparaison des noms de lieux.
+
+Chaque token distinct de point_depart / destination est interné en un
+identifiant entier. Un lieu est représenté par le tuple trié des
+identifiants de ses tokens, ce qui ramène la similarité de Jaccard à une
+intersection de tableaux triés.
+
+Pour la correspondance approximative ("Calavi" / "Abomey-Calavi" /
+"calavi kpota"), les lieux sont aussi découpés en trigrammes de caractères
+selon les règles de pg_trgm, et indexés par listes de postings.
+"""
+from collections import Counter, defaultdict
+from functools import lru_cache
+import heapq
+import re
+import threading
+
+# Tokens de localisation: "Abomey-Calavi" -> ("abomey", "calavi")
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Similarité minimale d'un lieu proche (seuil par défaut de pg_trgm)
+TRIGRAM_THRESHOLD = 0.3
+
+
+def normalize_tokens(text):
+    """
+    Découpe un nom de lieu en tokens normalisés (minuscules, sans ponctuation).
+    """
+    if not text:
+        return frozenset()
+    return frozenset(TOKEN_PATTERN.findall(text.lower()))
+
+
+class LocationDictionary:
+    """Dictionnaire token -> identifiant entier, partagé par le processus"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._tokens = []
+
+    def __len__(self):
+        return len(self._tokens)
+
+    def intern(self, token):
+        """Retourne l'identifiant du token, en lui en attribuant un si besoin"""
+        token_id = self._ids.get(token)
+        if token_id is not None:
+            return token_id
+
+        with self._lock:
+            token_id = self._ids.get(token)
+            if token_id is None:
+                token_id = self._ids[token] = len(self._tokens)
+                self._tokens.append(token)
+            return token_id
+
+    def token(self, token_id):
+        """Retourne le token correspondant à un identifiant"""
+        return self._tokens[token_id]
+
+    def token_ids(self, text):
+        """Tuple trié des identifiants des tokens d'un lieu"""
+        return tuple(sorted(self.intern(token) for token in normalize_tokens(text)))
+
+
+# Dictionnaire partagé par l'index de matching et le scoring
+location_dictionary = LocationDictionary()
+
+
+@lru_cache(maxsize=8192)
+def location_token_ids(text):
+    """Tuple trié des identifiants de tokens d'un lieu (mis en cache par texte)"""
+    return location_dictionary.token_ids(text)
+
+
+def intersection_size(ids1, ids2):
+    """Nombre d'éléments communs à deux tuples triés sans doublons"""
+    i = j = common = 0
+    len1, len2 = len(ids1), len(ids2)
+    while i < len1 and j < len2:
+        a, b = ids1[i], ids2[j]
+        if a == b:
+            common += 1
+            i += 1
+            j += 1
+        elif a < b:
+            i += 1
+        else:
+            j += 1
+    return common
+
+
+def jaccard_similarity(ids1, ids2):
+    """Similarité de Jaccard entre deux tuples triés d'identifiants"""
+    if not ids1 or not ids2:
+        return 0.0
+    common = intersection_size(ids1, ids2)
+    return common / (len(ids1) + len(ids2) - common)
+
+
+@lru_cache(maxsize=8192)
+def location_trigrams(text):
+    """
+    Trigrammes d'un lieu, calculés comme pg_trgm: chaque mot en minuscules
+    est préfixé de deux espaces et suffixé d'une espace.
+    """
+    trigrams = set()
+    for word in TOKEN_PATTERN.findall(text.lower()) if text else ():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            trigrams.add(padded[i:i + 3])
+    return frozenset(trigrams)
+
+
+def trigram_similarity(text1, text2):
+    """Similarité par trigrammes entre deux lieux (équivalent de similarity())"""
+    trigrams1 = location_trigrams(text1)
+    trigrams2 = location_trigrams(text2)
+    if not trigrams1 or not trigrams2:
+        return 0.0
+    common = len(trigrams1 & trigrams2)
+    return common / (len(trigrams1) + len(trigrams2) - common)
+
+
+class TrigramIndex:
+    """
+    Index inversé trigramme -> lieux. Une recherche ne parcourt que les
+    postings des trigrammes de la requête, pas l'ensemble des lieux.
+    Non protégé: l'appelant sérialise les accès.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._sizes = {}  # lieu -> nombre de trigrammes
+
+    def __len__(self):
+        return len(self._sizes)
+
+    def __contains__(self, text):
+        return text in self._sizes
+
+    def add(self, text):
+        """Indexe un lieu"""
+        if not text or text in self._sizes:
+            return
+        trigrams = location_trigrams(text)
+        if not trigrams:
+            return
+        self._sizes[text] = len(trigrams)
+        for trigram in trigrams:
+            self._postings[trigram].add(text)
+
+    def remove(self, text):
+        """Retire un lieu de l'index"""
+        if self._sizes.pop(text, None) is None:
+            return
+        for trigram in location_trigrams(text):
+            posting = self._postings.get(trigram)
+            if posting is not None:
+                posting.discard(text)
+                if not posting:
+                    del self._postings[trigram]
+
+    def clear(self):
+        self._postings.clear()
+        self._sizes.clear()
+
+    def search(self, text, threshold=TRIGRAM_THRESHOLD, limit=None):
+        """
+        Lieux dont la similarité avec text atteint threshold, sous forme de
+        liste (lieu, similarité) triée par similarité décroissante.
+        """
+        trigrams = location_trigrams(text)
+        if not trigrams:
+            return []
+
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self._postings.get(trigram, ()))
+
+        results = []
+        for location, common in shared.items():
+            similarity = common / (len(trigrams) + self._sizes[location] - common)
+            if similarity >= threshold:
+                results.append((location, similarity))
+
+        if limit is not None:
+            return heapq.nlargest(limit, results, key=lambda item: item[1])
+        return sorted(results, key=lambda item: item[1], reverse=True)
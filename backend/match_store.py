@@ -0,0 +1,293 @@
+# backend/match_store.py
+"""
+Matches matérialisés par utilisateur.
+
+Le store conserve, pour chaque utilisateur ayant demandé ses matches, le
+résultat de son dernier scoring (voir matching.MatchResult). Les
+listeners after_insert / after_update / after_delete sur Trajet et User
+alimentent un journal des changements validés; à la lecture suivante,
+seuls les trajets modifiés depuis sont re-scorés pour l'utilisateur, au
+lieu de relancer tout le matching.
+"""
+from bisect import insort
+from collections import deque, namedtuple
+import copy
+import logging
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from backend.matching_index import DEFAULT_REFRESH_SECONDS
+from backend.models import Trajet, User
+
+logger = logging.getLogger(__name__)
+
+# Nombre de matches matérialisés par utilisateur
+MATERIALIZED_MATCHES = 100
+
+# Taille du journal des changements: un utilisateur plus en retard est recalculé
+CHANGE_LOG_SIZE = 10000
+
+# Clé de session.info des changements en attente de commit
+PENDING_CHANGES_KEY = 'match_store_changes'
+
+# Champs d'un trajet utilisés par le scoring (copiés au moment du flush)
+TrajetSnapshot = namedtuple('TrajetSnapshot', [
+    'id', 'conducteur_id', 'point_depart', 'horaire_depart', 'depart_minute',
+    'depart_latitude', 'depart_longitude', 'places_disponibles', 'created_at'
+])
+
+# Champs du profil dont dépendent les matches d'un utilisateur
+UserSnapshot = namedtuple('UserSnapshot', [
+    'id', 'role', 'point_depart', 'horaires', 'horaires_mask', 'latitude', 'longitude'
+])
+
+
+def snapshot_trajet(trajet):
+    return TrajetSnapshot(
+        trajet.id, trajet.conducteur_id, trajet.point_depart, trajet.horaire_depart,
+        trajet.depart_minute, trajet.depart_latitude, trajet.depart_longitude,
+        trajet.places_disponibles, trajet.created_at
+    )
+
+
+def snapshot_user(user):
+    return UserSnapshot(
+        user.id, user.role, user.point_depart, user.horaires, user.horaires_mask,
+        user.latitude, user.longitude
+    )
+
+
+class StoredMatches:
+    """Résultat matérialisé d'un utilisateur et position dans le journal"""
+
+    def __init__(self, user, result, seq):
+        self.user = user  # UserSnapshot
+        self.result = result
+        self.seq = seq  # Dernier changement appliqué
+        self.computed_seq = seq  # Position du journal lors du calcul
+        self.built_at = time.monotonic()
+        # Des trajets au-dessus du seuil ont pu être écartés par la limite
+        self.truncated = len(result.scored) >= result.limit
+
+
+class MatchStore:
+    """
+    Store en mémoire user_id -> StoredMatches, propre à chaque processus.
+    Les entrées expirent après MATCHING_INDEX_REFRESH_SECONDS pour intégrer
+    les changements des autres workers et l'évolution du score de récence.
+    """
+
+    def __init__(self, capacity=MATERIALIZED_MATCHES, max_entries=10000, log_size=CHANGE_LOG_SIZE):
+        self.capacity = capacity
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._active = {}  # user_id -> dernière lecture (time.monotonic)
+        self._changes = deque(maxlen=log_size)  # (seq, trajet_id, TrajetSnapshot ou None)
+        self._seq = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def seq(self):
+        """Position courante dans le journal des changements"""
+        return self._seq
+
+    def record(self, changes):
+        """Ajoute au journal des changements validés (trajet_id, snapshot ou None si supprimé)"""
+        with self._lock:
+            for trajet_id, trajet in changes:
+                self._seq += 1
+                self._changes.append((self._seq, trajet_id, trajet))
+
+    def invalidate(self, user_id=None):
+        """Oublie les matches d'un utilisateur (ou de tous)"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+    @staticmethod
+    def max_age():
+        if has_app_context():
+            return current_app.config.get('MATCHING_INDEX_REFRESH_SECONDS', DEFAULT_REFRESH_SECONDS)
+        return DEFAULT_REFRESH_SECONDS
+
+    def get(self, user, compute, rescore):
+        """
+        Retourne le résultat matérialisé de l'utilisateur, mis à jour avec
+        les changements de trajets survenus depuis.
+
+        compute(user, limit) calcule un MatchResult complet; rescore(user,
+        trajet) retourne la ligne (trajet_id, score, geo_score, time_score)
+        d'un trajet pour l'utilisateur, ou None s'il ne correspond pas.
+        """
+        profile = snapshot_user(user)
+        with self._lock:
+            self._active[user.id] = time.monotonic()
+            stored = self._entries.get(user.id)
+            seq = self._seq
+            if stored is not None and self._is_current(stored, profile):
+                if self._catch_up(stored, rescore):
+                    return stored.result
+                del self._entries[user.id]
+
+        result = compute(user, self.capacity)
+        self.put(profile, result, seq, rescore)
+        return result
+
+    def put(self, profile, result, seq, rescore):
+        """
+        Enregistre un résultat calculé à la position seq du journal (par
+        exemple par un worker), après lui avoir appliqué les changements
+        survenus depuis. Retourne False s'il est déjà périmé ou si le
+        résultat enregistré, encore valide, a été calculé plus tard.
+        """
+        with self._lock:
+            existing = self._entries.get(profile.id)
+            if existing is not None and existing.computed_seq > seq and self._is_current(existing, profile):
+                return False
+            stored = StoredMatches(profile, result, seq)
+            # Ré-appliquer un changement déjà pris en compte est sans effet
+            if not (self._is_current(stored, profile) and self._catch_up(stored, rescore)):
+                return False
+            self._entries.pop(profile.id, None)
+            self._evict()
+            self._entries[profile.id] = stored
+            return True
+
+    def due_for_refresh(self, active_seconds, refresh_after):
+        """
+        Utilisateurs ayant lu leurs matches depuis moins de active_seconds
+        dont le résultat manque ou date de plus de refresh_after secondes.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._active = {
+                user_id: accessed_at for user_id, accessed_at in self._active.items()
+                if now - accessed_at <= active_seconds
+            }
+            due = []
+            for user_id in self._active:
+                stored = self._entries.get(user_id)
+                if stored is None or now - stored.built_at >= refresh_after:
+                    due.append(user_id)
+            return due
+
+    def _is_current(self, stored, profile):
+        if stored.user != profile:
+            return False
+        if time.monotonic() - stored.built_at > self.max_age():
+            return False
+        # Journal tronqué depuis la dernière lecture
+        return not self._changes or stored.seq >= self._changes[0][0] - 1
+
+    def _catch_up(self, stored, rescore):
+        """
+        Applique les changements du journal; retourne False si un recalcul
+        est nécessaire. Les lecteurs parcourent stored.result hors du verrou:
+        les changements sont appliqués à une copie, qui le remplace.
+        """
+        if stored.seq >= self._seq:
+            return True
+        result = copy.copy(stored.result)
+        result.scored = list(result.scored)
+        stored.result = result
+        for seq, trajet_id, trajet in self._changes:
+            if seq <= stored.seq:
+                continue
+            if not self._apply(stored, trajet_id, trajet, rescore):
+                return False
+        stored.seq = self._seq
+        return True
+
+    def _apply(self, stored, trajet_id, trajet, rescore):
+        scored = stored.result.scored
+        previous = None
+        for position, row in enumerate(scored):
+            if row[0] == trajet_id:
+                previous = scored.pop(position)
+                break
+
+        row = rescore(stored.user, trajet) if trajet is not None else None
+        if previous is not None and stored.truncated and (row is None or row[1] < previous[1]):
+            # Un trajet écarté par la limite pourrait prendre la place libérée
+            return False
+        if row is None:
+            return True
+
+        insort(scored, row, key=lambda item: (-item[1], item[0]))
+        self._trim(stored)
+        return True
+
+    @staticmethod
+    def _trim(stored):
+        """Garde les `limit` meilleurs matches et les ex aequo après arrondi"""
+        result = stored.result
+        if len(result.scored) <= result.limit:
+            return
+        kth_score = result.scored[result.limit - 1][1]
+        kept = [row for row in result.scored if row[1] >= kth_score - result.slack]
+        if len(kept) < len(result.scored):
+            result.scored[:] = kept
+            stored.truncated = True
+
+    def _evict(self):
+        if len(self._entries) < self.max_entries:
+            return
+        # Les entrées les plus anciennes sont en tête du dict
+        for user_id in list(self._entries)[:len(self._entries) - self.max_entries + 1]:
+            del self._entries[user_id]
+
+
+# Store partagé par les requêtes du processus courant
+match_store = MatchStore()
+
+
+def _pending_changes(target):
+    session = object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault(PENDING_CHANGES_KEY, [])
+
+
+@event.listens_for(Trajet, 'after_insert')
+@event.listens_for(Trajet, 'after_update')
+def record_trajet_change(mapper, connection, target):
+    """Trajet créé ou modifié: à re-scorer après le commit"""
+    pending = _pending_changes(target)
+    if pending is not None:
+        pending.append((target.id, snapshot_trajet(target)))
+
+
+@event.listens_for(Trajet, 'after_delete')
+def record_trajet_deletion(mapper, connection, target):
+    """Trajet supprimé: à retirer des matches après le commit"""
+    pending = _pending_changes(target)
+    if pending is not None:
+        pending.append((target.id, None))
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def record_user_change(mapper, connection, target):
+    """Profil modifié ou supprimé: ses matches seront recalculés"""
+    match_store.invalidate(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_pending_changes(session):
+    changes = session.info.pop(PENDING_CHANGES_KEY, None)
+    if changes:
+        match_store.record(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_pending_changes(session):
+    session.info.pop(PENDING_CHANGES_KEY, None)
@@ -1,11 +1,41 @@
 # backend/matching.py
 from backend.models import User, Trajet
+from backend import scoring
 from backend.extensions import db
+from backend.geo import KM_PER_DEGREE, haversine_km
+from backend.horaires import (
+    HOURS_PER_DAY, MINUTES_PER_HOUR, UNKNOWN_HOUR, mask_to_hours,
+    parse_departure_hour, parse_preference_mask, parse_preference_order, parse_time_preference
+)
+from backend.identity import load_user
+from backend.locations import jaccard_similarity, location_token_ids, trigram_similarity
+from backend.match_store import match_store
+from backend.matching_index import (
+    matching_index, GEO_MATCH_RADIUS_KM, HOUR_TOLERANCE, PRUNED_GEO_SCORE, max_pruned_score
+)
+from backend.passenger_index import passenger_index
 from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from functools import lru_cache
+from sqlalchemy import and_, case, func, or_
+import heapq
 import logging
+import math
+import os
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# Nombre maximal d'ids par clause IN (limite des variables SQLite)
+CANDIDATE_CHUNK_SIZE = 500
+
+# Scoring parallèle: nombre de candidats à partir duquel les lignes sont
+# réparties entre plusieurs threads. En deçà, le gain n'est pas mesurable
+# (voir benchmarks/parallel_scoring.py)
+DEFAULT_PARALLEL_THRESHOLD = 80000
+DEFAULT_PARALLEL_WORKERS = min(os.cpu_count() or 1, 8)
+
 def calculate_text_similarity(text1, text2):
     """
     Calcule la similarité entre deux textes (simplifiée).
@@ -25,56 +55,83 @@ def calculate_text_similarity(text1, text2):
     if text1_lower in text2_lower or text2_lower in text1_lower:
         return 0.8
     
-    # Mots communs
-    words1 = set(text1_lower.split())
-    words2 = set(text2_lower.split())
-    
-    if not words1 or not words2:
+    # Mots communs (Jaccard sur les identifiants de tokens internés)
+    return jaccard_similarity(location_token_ids(text1), location_token_ids(text2))
+
+def calculate_location_similarity(text1, text2):
+    """
+    Score géographique entre deux lieux: le meilleur de la similarité
+    textuelle et de la similarité par trigrammes, qui rapproche les
+    variantes d'un même lieu ("Calavi", "Abomey-Calavi", "calavi kpota").
+    """
+    if not text1 or not text2:
         return 0.0
-    
-    common_words = words1.intersection(words2)
-    total_words = words1.union(words2)
-    
-    if total_words:
-        return len(common_words) / len(total_words)
-    
-    return 0.0
+    return max(calculate_text_similarity(text1, text2), trigram_similarity(text1, text2))
 
-def parse_time_preference(horaires):
+def user_coordinates(user):
+    """(latitude, longitude) du point de départ d'un utilisateur, ou None"""
+    if user.latitude is None or user.longitude is None:
+        return None
+    return (user.latitude, user.longitude)
+
+def distance_score(lat1, lon1, lat2, lon2, radius_km=GEO_MATCH_RADIUS_KM):
     """
-    Parse les préférences horaires (format simple).
-    Retourne une liste d'heures préférées.
+    Score de proximité entre deux points: 1 au même endroit, décroissant
+    linéairement jusqu'à 0 à radius_km.
     """
-    if not horaires:
-        return []
+    return max(0.0, 1 - haversine_km(lat1, lon1, lat2, lon2) / radius_km)
+
+def calculate_geo_score(user, point_depart, latitude, longitude):
+    """
+    Score géographique d'un point de départ pour un utilisateur: le meilleur
+    de la similarité des noms de lieux et de la proximité des coordonnées,
+    chacune n'étant prise en compte que si les deux côtés sont renseignés.
+    """
+    geo_score = 0.0
+    if user.point_depart and point_depart:
+        geo_score = calculate_location_similarity(user.point_depart, point_depart)
+    coordinates = user_coordinates(user)
+    if coordinates is not None and latitude is not None and longitude is not None:
+        geo_score = max(geo_score, distance_score(*coordinates, latitude, longitude))
+    return geo_score
+
+def bounding_box_clause(latitude, longitude, radius_km=GEO_MATCH_RADIUS_KM):
+    """
+    Prédicat SQL sur les coordonnées de départ: rectangle englobant le
+    cercle de rayon radius_km (le score affine ensuite la distance).
+    """
+    dlat = radius_km / KM_PER_DEGREE
+    dlon = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+    return and_(
+        Trajet.depart_latitude.between(latitude - dlat, latitude + dlat),
+        Trajet.depart_longitude.between(longitude - dlon, longitude + dlon)
+    )
+
+def user_preference_mask(user):
+    """
+    Masque des heures préférées d'un utilisateur, lu depuis la colonne
+    persistée horaires_mask quand elle est renseignée.
+    """
+    if user.horaires_mask is not None:
+        return user.horaires_mask
+    return parse_preference_mask(user.horaires)
+
+def time_score_for_hours(preferred_hours, trajet_hour):
+    """
+    Score horaire d'un trajet partant à trajet_hour pour des heures
+    préférées dans l'ordre de parse_preference_order: la première heure à
+    moins de deux heures du départ détermine le score.
+    """
+    if not preferred_hours:
+        return 0.5
     
-    # Formats supportés: "8h-10h", "matin", "soir", "8h", etc.
-    horaires_lower = horaires.lower()
-    preferences = []
-    
-    if 'matin' in horaires_lower:
-        preferences.extend([6, 7, 8, 9, 10])
-    elif 'midi' in horaires_lower:
-        preferences.extend([11, 12, 13, 14])
-    elif 'soir' in horaires_lower:
-        preferences.extend([17, 18, 19, 20, 21])
-    elif 'nuit' in horaires_lower:
-        preferences.extend([22, 23, 0, 1, 2])
-    
-    # Extraction d'heures spécifiques (8h, 14h30, etc.)
-    import re
-    time_pattern = r'(\d{1,2})h?(\d{0,2})?'
-    matches = re.findall(time_pattern, horaires_lower)
-    
-    for match in matches:
-        try:
-            hour = int(match[0])
-            if 0 <= hour <= 23:
-                preferences.append(hour)
-        except ValueError:
-            continue
-    
-    return list(set(preferences))  # Supprime les doublons
+    for pref_hour in preferred_hours:
+        if abs(trajet_hour - pref_hour) <= 1:  # Tolérance de 1h
+            return 1.0
+        elif abs(trajet_hour - pref_hour) <= 2:  # Tolérance de 2h
+            return 0.7
+    
+    return 0.3  # Horaire possible mais pas optimal
 
 def calculate_time_compatibility(user_horaires, trajet_horaire):
     """
@@ -83,31 +140,513 @@ def calculate_time_compatibility(user_horaires, trajet_horaire):
     if not user_horaires or not trajet_horaire:
         return 0.5  # Score neutre si pas d'info
     
-    user_preferences = parse_time_preference(user_horaires)
+    # Format attendu: "8h30", "14h", "08:30", etc.
+    trajet_hour = parse_departure_hour(trajet_horaire)
+    if trajet_hour == UNKNOWN_HOUR:
+        return 0.5
     
-    # Essayer d'extraire l'heure du trajet
-    try:
-        # Format attendu: "8h30", "14h", "08:30", etc.
-        import re
-        time_match = re.search(r'(\d{1,2})[h:]?(\d{0,2})?', trajet_horaire.lower())
-        if time_match:
-            trajet_hour = int(time_match.group(1))
-            
-            if not user_preferences:
-                return 0.5
-            
-            # Vérifier si l'heure du trajet correspond aux préférences
-            for pref_hour in user_preferences:
-                if abs(trajet_hour - pref_hour) <= 1:  # Tolérance de 1h
-                    return 1.0
-                elif abs(trajet_hour - pref_hour) <= 2:  # Tolérance de 2h
-                    return 0.7
+    return time_score_for_hours(parse_preference_order(user_horaires), trajet_hour)
+
+@lru_cache(maxsize=1024)
+def time_table_for_hours(preferred_hours):
+    """
+    Score horaire pour chaque code de la colonne heure du moteur vectorisé
+    (voir backend.scoring), pour des heures préférées ordonnées.
+    """
+    # NO_HOUR: pas de composante horaire, UNKNOWN_HOUR: score neutre
+    table = [0.0, 0.5]
+    table.extend(time_score_for_hours(preferred_hours, hour) for hour in range(scoring.HOUR_TABLE_SIZE))
+    return tuple(table)
+
+def build_time_table(user):
+    """
+    Table des scores horaires de l'utilisateur pour le moteur vectorisé.
+    Retourne None si l'utilisateur n'a pas d'horaires.
+    """
+    if not user.horaires:
+        return None
+    return time_table_for_hours(parse_preference_order(user.horaires))
+
+def hour_window_clause(preference_mask, tolerance=HOUR_TOLERANCE):
+    """
+    Prédicat SQL sur Trajet.depart_minute: départ à moins de `tolerance`
+    heures d'une heure préférée, ou horaire non interprétable (NULL).
+    """
+    hours = set()
+    for pref_hour in mask_to_hours(preference_mask):
+        hours.update(range(max(0, pref_hour - tolerance), min(HOURS_PER_DAY, pref_hour + tolerance + 1)))
+    
+    clauses = [Trajet.depart_minute.is_(None)]
+    window_start = None
+    for hour in range(HOURS_PER_DAY + 1):
+        if hour in hours:
+            if window_start is None:
+                window_start = hour
+        elif window_start is not None:
+            clauses.append(Trajet.depart_minute.between(
+                window_start * MINUTES_PER_HOUR, hour * MINUTES_PER_HOUR - 1
+            ))
+            window_start = None
+    
+    return or_(*clauses)
+
+def build_match_reasons(user, geo_score, time_score):
+    """
+    Construit la liste des raisons d'un match à partir de ses composantes.
+    """
+    reasons = []
+    if geo_score > 0.7:
+        reasons.append(f"Point de départ similaire ({geo_score:.1%})")
+    if time_score > 0.7:
+        reasons.append(f"Horaires compatibles ({time_score:.1%})")
+    if user.role == 'passager':
+        reasons.append("Vous cherchez un trajet")
+    return reasons
+
+def available_trajets_query(user):
+    """Trajets des autres conducteurs ayant des places disponibles"""
+    return Trajet.query.filter(
+        Trajet.conducteur_id != user.id,
+        Trajet.places_disponibles > 0
+    )
+
+def load_candidate_trajets(user):
+    """
+    Charge les trajets disponibles susceptibles de correspondre à
+    l'utilisateur. Retourne (trajets, borne) où borne majore le score des
+    trajets écartés (voir matching_index.max_pruned_score), ou None si rien
+    ne permet de les restreindre.
+    
+    Sans point de départ, le score géographique ne vient que des
+    coordonnées: la fenêtre horaire (depart_minute) et le rectangle
+    englobant le rayon sont évalués en SQL, et un trajet écarté n'a aucun
+    score géographique. Sinon, l'index de matching donne les candidats.
+    """
+    preference_mask = user_preference_mask(user) if user.horaires else 0
+    preferred_hours = mask_to_hours(preference_mask)
+    coordinates = user_coordinates(user)
+    role_bonus = (user.role == 'passager')
+    
+    if not user.point_depart:
+        clauses = []
+        if coordinates is not None:
+            clauses.append(bounding_box_clause(*coordinates))
+        if preference_mask:
+            clauses.append(hour_window_clause(preference_mask))
+        if not clauses:
+            return None
+        trajets = available_trajets_query(user).filter(or_(*clauses)).order_by(Trajet.id).all()
+        return trajets, max_pruned_score(0.0, bool(user.horaires), preferred_hours, role_bonus)
+    
+    candidate_ids = matching_index.candidates(
+        user.point_depart,
+        preferred_hours,
+        exclude_conducteur_id=user.id,
+        coordinates=coordinates
+    )
+    if candidate_ids is None:
+        return None
+    
+    trajets = load_trajets_by_ids(user, sorted(candidate_ids))
+    # Sans token, ni les tokens ni les trigrammes n'ont sélectionné de lieu
+    geo_bound = PRUNED_GEO_SCORE if location_token_ids(user.point_depart) else 1.0
+    return trajets, max_pruned_score(geo_bound, bool(user.horaires), preferred_hours, role_bonus)
+
+def score_row_candidates(user, limit, slack=0.0):
+    """
+    Scoring ligne à ligne (sans NumPy): liste de (trajet_id, score,
+    geo_score, time_score) triée par score décroissant puis par id.
+    
+    Les trajets candidats (voir load_candidate_trajets) sont scorés
+    d'abord. Si le `limit`-ième meilleur score, moins `slack`, dépasse la
+    borne des trajets écartés, aucun d'eux ne peut entrer dans les
+    meilleurs matches, même après arrondi: ils ne sont pas chargés. Sinon,
+    les autres trajets disponibles sont scorés à leur tour.
+    """
+    scored = []
+    scored_ids = set()
+    candidates = load_candidate_trajets(user)
+    if candidates is not None:
+        trajets, bound = candidates
+        scored = [
+            (trajet.id, score, geo_score, time_score)
+            for trajet, score, geo_score, time_score in score_trajets(user, trajets)
+        ]
+        scored.sort(key=lambda x: (-x[1], x[0]))
+        if 0 < limit <= len(scored) and scored[limit - 1][1] - slack > bound:
+            return scored
+        scored_ids = {trajet.id for trajet in trajets}
+    
+    remaining = [trajet for trajet in available_trajets_query(user).all() if trajet.id not in scored_ids]
+    scored.extend(
+        (trajet.id, score, geo_score, time_score)
+        for trajet, score, geo_score, time_score in score_trajets(user, remaining)
+    )
+    scored.sort(key=lambda x: (-x[1], x[0]))
+    return scored
+
+def load_trajets_by_ids(user, trajet_ids):
+    """
+    Charge les trajets disponibles dont l'id est donné, dans le même ordre.
+    Si un trajet a disparu depuis l'indexation, l'index est marqué à reconstruire.
+    """
+    base_query = available_trajets_query(user)
+    
+    trajets_by_id = {}
+    for start in range(0, len(trajet_ids), CANDIDATE_CHUNK_SIZE):
+        chunk = trajet_ids[start:start + CANDIDATE_CHUNK_SIZE]
+        for trajet in base_query.filter(Trajet.id.in_(chunk)).all():
+            trajets_by_id[trajet.id] = trajet
+    
+    if len(trajets_by_id) < len(trajet_ids):
+        matching_index.invalidate()
+    
+    return [trajets_by_id[trajet_id] for trajet_id in trajet_ids if trajet_id in trajets_by_id]
+
+def load_users_by_ids(user_ids):
+    """
+    Charge en une requête IN par lot de CANDIDATE_CHUNK_SIZE les
+    utilisateurs dont l'id est donné; retourne un dict id -> User.
+    """
+    user_ids = sorted(set(user_ids))
+    users_by_id = {}
+    for start in range(0, len(user_ids), CANDIDATE_CHUNK_SIZE):
+        chunk = user_ids[start:start + CANDIDATE_CHUNK_SIZE]
+        for user in User.query.filter(User.id.in_(chunk)).all():
+            users_by_id[user.id] = user
+    return users_by_id
+
+def score_trajets(user, trajets):
+    """
+    Scoring ligne à ligne (utilisé lorsque NumPy n'est pas disponible).
+    Retourne une liste de (trajet, score, geo_score, time_score) au-dessus du seuil.
+    """
+    scored = []
+    
+    for trajet in trajets:
+        score = 0.0
+        geo_score = 0.0
+        time_score = 0.0
+        
+        # 1. Compatibilité géographique (nom du point de départ et coordonnées)
+        geo_score = calculate_geo_score(
+            user, trajet.point_depart, trajet.depart_latitude, trajet.depart_longitude
+        )
+        score += geo_score * scoring.GEO_WEIGHT  # 40% du score total
+        
+        # 2. Compatibilité horaire
+        if user.horaires and trajet.horaire_depart:
+            time_score = calculate_time_compatibility(user.horaires, trajet.horaire_depart)
+            score += time_score * scoring.TIME_WEIGHT  # 30% du score total
+        
+        # 3. Disponibilité des places
+        places_score = min(trajet.places_disponibles / scoring.MAX_PLACES, 1.0)  # Normalisation sur 4 places max
+        score += places_score * scoring.PLACES_WEIGHT  # 10% du score total
+        
+        # 4. Récence du trajet (favoriser les trajets récents)
+        if trajet.created_at:
+            days_ago = (datetime.utcnow() - trajet.created_at).days
+            recency_score = max(0, 1 - (days_ago / scoring.RECENCY_DAYS))  # Score diminue sur 30 jours
+            score += recency_score * scoring.RECENCY_WEIGHT  # 10% du score total
+        
+        # 5. Bonus si même rôle (conducteur cherche passager ou vice versa)
+        if user.role == 'passager':  # Passager cherche des trajets de conducteurs
+            score += scoring.ROLE_BONUS  # 10% bonus
+        
+        # Filtrer les matches avec un score minimum
+        if score > scoring.MATCH_THRESHOLD:  # Seuil de pertinence
+            scored.append((trajet, score, geo_score, time_score))
+    
+    return scored
+
+def parallel_scoring_settings():
+    """
+    (seuil de candidats, nombre de threads) du scoring parallèle, lus dans
+    MATCHING_PARALLEL_THRESHOLD et MATCHING_PARALLEL_WORKERS.
+    """
+    threshold = DEFAULT_PARALLEL_THRESHOLD
+    workers = DEFAULT_PARALLEL_WORKERS
+    if has_app_context():
+        threshold = current_app.config.get('MATCHING_PARALLEL_THRESHOLD', threshold)
+        workers = current_app.config.get('MATCHING_PARALLEL_WORKERS', workers)
+    return threshold, workers
+
+def score_user_candidates(user, limit, slack=0.0):
+    """
+    Scoring vectorisé de tous les trajets de l'index.
+    Retourne une liste de (trajet_id, score, geo_score, time_score) triée par
+    score décroissant (voir scoring.select_top pour `slack`).
+    L'élagage par l'index n'est pas utilisé ici: construire l'ensemble des
+    candidats coûte plus cher que de scorer toutes les lignes (voir
+    benchmarks/matching_latency.py), le score géographique étant calculé
+    une fois par lieu distinct.
+    """
+    columns = matching_index.columns()
+    rows = columns.rows_for(exclude_conducteur_id=user.id)
+    if not rows.size:
+        return []
+    
+    # Clé de lieu: (point_depart, depart_latitude, depart_longitude)
+    geo_table = scoring.build_location_table(
+        columns, rows,
+        lambda location: calculate_geo_score(user, *location)
+    )
+    
+    time_table = build_time_table(user)
+    role_bonus = (user.role == 'passager')
+    threshold, workers = parallel_scoring_settings()
+    if workers > 1 and rows.size >= threshold:
+        top = scoring.score_top_parallel(
+            columns, rows, geo_table, time_table, role_bonus, limit, slack=slack, workers=workers
+        )
+    else:
+        top = scoring.score_top(columns, rows, geo_table, time_table, role_bonus, limit, slack=slack)
+    
+    return [
+        (int(trajet_id), float(score), float(geo_score), float(time_score))
+        for trajet_id, score, geo_score, time_score in zip(
+            columns.ids[top.rows].tolist(), top.scores.tolist(),
+            top.geo_scores.tolist(), top.time_scores.tolist()
+        )
+    ]
+
+# Écart de score conservé au-delà de la limite: le tri détaillé se fait sur
+# le score arrondi à 0,01, les ex aequo après arrondi doivent être présents
+ROUNDING_SLACK = 0.011
+
+# Nombre de matches pris en compte par les statistiques
+STATS_MATCH_LIMIT = 100
+
+# Score arrondi au-delà duquel un match est de bonne qualité
+HIGH_QUALITY_SCORE = 0.7
+
+# Histogramme de qualité: (tranche, score arrondi minimal exclu), du meilleur au moins bon
+QUALITY_BUCKETS = (
+    ('excellent', HIGH_QUALITY_SCORE),
+    ('bon', 0.5),
+    ('moyen', 0.0),
+)
+
+DEFAULT_STATS_CACHE_SECONDS = 30
+
+class MatchResult:
+    """
+    Résultat d'une passe de scoring pour un utilisateur: les matches
+    (trajet_id, score, geo_score, time_score) triés par score décroissant
+    puis par id, et éventuellement les compteurs de trajets. Il ne contient
+    aucun objet de session et peut donc être mis en cache entre requêtes.
+    Les listes de matches, matches détaillés et statistiques en dérivent.
+    """
+    
+    def __init__(self, user_id, scored, limit, total_trajets=None, available_trajets=None):
+        self.user_id = user_id
+        self.scored = scored
+        self.limit = limit
+        self.slack = ROUNDING_SLACK
+        self.total_trajets = total_trajets
+        self.available_trajets = available_trajets
+    
+    def _limit(self, limit):
+        return self.limit if limit is None else min(limit, self.limit)
+    
+    def top(self, limit=None):
+        """Les meilleurs matches par score décroissant"""
+        return self.scored[:self._limit(limit)]
+    
+    def detailed_top(self, limit=None):
+        """Les meilleurs matches par score arrondi décroissant, puis par id"""
+        ordered = sorted(self.scored, key=lambda x: (-round(x[1], 2), x[0]))
+        return ordered[:self._limit(limit)]
+    
+    @property
+    def total_matches(self):
+        return len(self.top())
+    
+    def high_quality_count(self):
+        """Nombre de matches dont le score arrondi dépasse HIGH_QUALITY_SCORE"""
+        return sum(1 for _, score, _, _ in self.detailed_top() if round(score, 2) > HIGH_QUALITY_SCORE)
+    
+    def histogram(self):
+        """Répartition des matches par tranche de qualité (voir QUALITY_BUCKETS)"""
+        counts = {bucket: 0 for bucket, _ in QUALITY_BUCKETS}
+        for _, score, _, _ in self.detailed_top():
+            rounded = round(score, 2)
+            for bucket, min_score in QUALITY_BUCKETS:
+                if rounded > min_score:
+                    counts[bucket] += 1
+                    break
+        return counts
+    
+    def matches(self, user, limit=None):
+        """Trajets des meilleurs matches, dans l'ordre du score"""
+        return load_trajets_by_ids(user, [trajet_id for trajet_id, _, _, _ in self.top(limit)])
+    
+    def detailed(self, user, limit=None):
+        """Matches sérialisés avec scores, raisons et conducteur"""
+        scored = self.detailed_top(limit)
+        trajets = load_trajets_by_ids(user, [trajet_id for trajet_id, _, _, _ in scored])
+        trajets_by_id = {trajet.id: trajet for trajet in trajets}
+        
+        # Conducteurs des trajets retenus, chargés en une seule requête
+        conducteurs = load_users_by_ids(trajet.conducteur_id for trajet in trajets)
+        
+        matches_with_score = []
+        
+        for trajet_id, score, geo_score, time_score in scored:
+            trajet = trajets_by_id.get(trajet_id)
+            if trajet is None:
+                continue
+            conducteur = conducteurs.get(trajet.conducteur_id)
             
-            return 0.3  # Horaire possible mais pas optimal
-    except:
-        pass
+            matches_with_score.append({
+                'trajet': {
+                    'id': trajet.id,
+                    'point_depart': trajet.point_depart,
+                    'destination': trajet.destination,
+                    'horaire_depart': trajet.horaire_depart,
+                    'places_disponibles': trajet.places_disponibles,
+                    'created_at': trajet.created_at.isoformat(),
+                    'conducteur': {
+                        'id': conducteur.id,
+                        'nom': conducteur.nom,
+                        'prenom': conducteur.prenom,
+                        'photo': conducteur.photo
+                    } if conducteur else None
+                },
+                'score': round(score, 2),
+                'reasons': build_match_reasons(user, geo_score, time_score),
+                'compatibility_percentage': round(score * 100, 1)
+            })
+        
+        return matches_with_score
     
-    return 0.5
+    def statistics(self, user):
+        """Statistiques de matching (nécessite les compteurs de trajets)"""
+        available_trajets = self.available_trajets or 0
+        total_matches = self.total_matches
+        return {
+            'user_id': self.user_id,
+            'total_trajets_available': available_trajets,
+            'total_trajets_all': self.total_trajets or 0,
+            'total_matches': total_matches,
+            'high_quality_matches': self.high_quality_count(),
+            'quality_histogram': self.histogram(),
+            'matching_rate': round((total_matches / available_trajets * 100) if available_trajets > 0 else 0, 1),
+            'user_profile_completeness': calculate_profile_completeness(user),
+            'recommendations': generate_profile_recommendations(user)
+        }
+
+def count_trajets(user):
+    """
+    Compte en une requête les trajets des autres conducteurs:
+    retourne (total, avec des places disponibles).
+    """
+    total, available = db.session.query(
+        func.count(Trajet.id),
+        func.coalesce(func.sum(case((Trajet.places_disponibles > 0, 1), else_=0)), 0)
+    ).filter(Trajet.conducteur_id != user.id).one()
+    return total, int(available)
+
+def compute_match_result(user, limit, with_counts=False):
+    """
+    Passe de scoring unique des trajets candidats d'un utilisateur.
+    Le résultat permet de dériver jusqu'à `limit` matches, dans l'ordre
+    du score brut comme dans celui du score arrondi.
+    """
+    if scoring.is_available():
+        scored = score_user_candidates(user, limit, slack=ROUNDING_SLACK)
+    else:
+        scored = score_row_candidates(user, limit, slack=ROUNDING_SLACK)
+    
+    total_trajets = available_trajets = None
+    if with_counts:
+        total_trajets, available_trajets = count_trajets(user)
+    
+    return MatchResult(user.id, scored, limit, total_trajets, available_trajets)
+
+def rescore_trajet(user, trajet):
+    """
+    Ligne (trajet_id, score, geo_score, time_score) d'un seul trajet pour un
+    utilisateur, avec les mêmes critères que le scoring des candidats.
+    Retourne None si le trajet ne correspond pas. user et trajet peuvent
+    être des instantanés.
+    """
+    if trajet.conducteur_id == user.id or not trajet.places_disponibles or trajet.places_disponibles <= 0:
+        return None
+    
+    scored = score_trajets(user, [trajet])
+    if not scored:
+        return None
+    _, score, geo_score, time_score = scored[0]
+    return (trajet.id, score, geo_score, time_score)
+
+def get_match_result(user, limit):
+    """
+    Résultat de matching de l'utilisateur, lu depuis les matches
+    matérialisés (voir backend.match_store) quand `limit` le permet.
+    """
+    if limit > match_store.capacity:
+        return compute_match_result(user, limit)
+    return match_store.get(user, compute_match_result, rescore_trajet)
+
+class MatchResultCache:
+    """
+    Cache par utilisateur des MatchResult servant aux statistiques, à durée
+    de vie courte: un tableau de bord qui interroge les statistiques en
+    boucle ne relance pas tout le pipeline de matching.
+    """
+    
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # user_id -> (expiration, MatchResult)
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def get(self, user_id):
+        """Résultat en cache pour l'utilisateur, ou None s'il a expiré"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            return entry[1]
+    
+    def set(self, user_id, result, ttl):
+        """Met un résultat en cache pour ttl secondes"""
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            self._entries.pop(user_id, None)
+            if len(self._entries) >= self.max_entries:
+                self._entries = {
+                    key: entry for key, entry in self._entries.items() if entry[0] > now
+                }
+                while len(self._entries) >= self.max_entries:
+                    # Les entrées les plus anciennes sont en tête du dict
+                    del self._entries[next(iter(self._entries))]
+            self._entries[user_id] = (now + ttl, result)
+    
+    def invalidate(self, user_id=None):
+        """Oublie le résultat d'un utilisateur (ou de tous)"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_id, None)
+
+# Cache partagé par les requêtes du processus courant
+match_result_cache = MatchResultCache()
+
+def stats_cache_seconds():
+    """Durée de vie du cache des statistiques (MATCHING_STATS_CACHE_SECONDS)"""
+    if has_app_context():
+        return current_app.config.get('MATCHING_STATS_CACHE_SECONDS', DEFAULT_STATS_CACHE_SECONDS)
+    return DEFAULT_STATS_CACHE_SECONDS
 
 def find_matches(user_id, limit=10):
     """
@@ -115,72 +654,12 @@ def find_matches(user_id, limit=10):
     Algorithme de matching amélioré avec scoring.
     """
     try:
-        user = User.query.get(user_id)
+        user = load_user(user_id)
         if not user:
             logger.warning(f"Utilisateur {user_id} non trouvé pour le matching")
             return []
         
-        # Récupérer tous les trajets disponibles (pas créés par l'utilisateur)
-        trajets = Trajet.query.filter(
-            Trajet.conducteur_id != user_id,
-            Trajet.places_disponibles > 0
-        ).all()
-        
-        if not trajets:
-            logger.info(f"Aucun trajet disponible pour le matching de l'utilisateur {user_id}")
-            return []
-        
-        matches_with_score = []
-        
-        for trajet in trajets:
-            score = 0.0
-            reasons = []
-            
-            # 1. Compatibilité géographique (point de départ)
-            if user.point_depart and trajet.point_depart:
-                geo_score = calculate_text_similarity(user.point_depart, trajet.point_depart)
-                score += geo_score * 0.4  # 40% du score total
-                if geo_score > 0.7:
-                    reasons.append(f"Point de départ similaire ({geo_score:.1%})")
-            
-            # 2. Compatibilité horaire
-            if user.horaires and trajet.horaire_depart:
-                time_score = calculate_time_compatibility(user.horaires, trajet.horaire_depart)
-                score += time_score * 0.3  # 30% du score total
-                if time_score > 0.7:
-                    reasons.append(f"Horaires compatibles ({time_score:.1%})")
-            
-            # 3. Disponibilité des places
-            places_score = min(trajet.places_disponibles / 4, 1.0)  # Normalisation sur 4 places max
-            score += places_score * 0.1  # 10% du score total
-            
-            # 4. Récence du trajet (favoriser les trajets récents)
-            if trajet.created_at:
-                days_ago = (datetime.utcnow() - trajet.created_at).days
-                recency_score = max(0, 1 - (days_ago / 30))  # Score diminue sur 30 jours
-                score += recency_score * 0.1  # 10% du score total
-            
-            # 5. Bonus si même rôle (conducteur cherche passager ou vice versa)
-            if user.role == 'passager':  # Passager cherche des trajets de conducteurs
-                score += 0.1  # 10% bonus
-                reasons.append("Vous cherchez un trajet")
-            
-            # Filtrer les matches avec un score minimum
-            if score > 0.3:  # Seuil de pertinence
-                matches_with_score.append({
-                    'trajet': trajet,
-                    'score': score,
-                    'reasons': reasons
-                })
-        
-        # Trier par score décroissant
-        matches_with_score.sort(key=lambda x: x['score'], reverse=True)
-        
-        # Limiter le nombre de résultats
-        matches_with_score = matches_with_score[:limit]
-        
-        # Retourner seulement les trajets (pour compatibilité)
-        matches = [match['trajet'] for match in matches_with_score]
+        matches = get_match_result(user, limit).matches(user, limit)
         
         logger.info(f"Matching pour utilisateur {user_id}: {len(matches)} trajets trouvés")
         
@@ -195,89 +674,61 @@ def find_detailed_matches(user_id, limit=10):
     Version détaillée du matching qui retourne les scores et raisons.
     """
     try:
-        user = User.query.get(user_id)
+        user = load_user(user_id)
         if not user:
             return []
         
-        trajets = Trajet.query.filter(
-            Trajet.conducteur_id != user_id,
-            Trajet.places_disponibles > 0
-        ).all()
-        
-        if not trajets:
-            return []
-        
-        matches_with_score = []
-        
-        for trajet in trajets:
-            score = 0.0
-            reasons = []
-            
-            # Logique de scoring identique à find_matches
-            if user.point_depart and trajet.point_depart:
-                geo_score = calculate_text_similarity(user.point_depart, trajet.point_depart)
-                score += geo_score * 0.4
-                if geo_score > 0.7:
-                    reasons.append(f"Point de départ similaire ({geo_score:.1%})")
-            
-            if user.horaires and trajet.horaire_depart:
-                time_score = calculate_time_compatibility(user.horaires, trajet.horaire_depart)
-                score += time_score * 0.3
-                if time_score > 0.7:
-                    reasons.append(f"Horaires compatibles ({time_score:.1%})")
-            
-            places_score = min(trajet.places_disponibles / 4, 1.0)
-            score += places_score * 0.1
-            
-            if trajet.created_at:
-                days_ago = (datetime.utcnow() - trajet.created_at).days
-                recency_score = max(0, 1 - (days_ago / 30))
-                score += recency_score * 0.1
-            
-            if user.role == 'passager':
-                score += 0.1
-                reasons.append("Vous cherchez un trajet")
-            
-            if score > 0.3:
-                # Récupérer les infos du conducteur
-                conducteur = User.query.get(trajet.conducteur_id)
-                
-                matches_with_score.append({
-                    'trajet': {
-                        'id': trajet.id,
-                        'point_depart': trajet.point_depart,
-                        'destination': trajet.destination,
-                        'horaire_depart': trajet.horaire_depart,
-                        'places_disponibles': trajet.places_disponibles,
-                        'created_at': trajet.created_at.isoformat(),
-                        'conducteur': {
-                            'id': conducteur.id,
-                            'nom': conducteur.nom,
-                            'prenom': conducteur.prenom,
-                            'photo': conducteur.photo
-                        } if conducteur else None
-                    },
-                    'score': round(score, 2),
-                    'reasons': reasons,
-                    'compatibility_percentage': round(score * 100, 1)
-                })
-        
-        # Trier par score décroissant
-        matches_with_score.sort(key=lambda x: x['score'], reverse=True)
-        
-        return matches_with_score[:limit]
+        return get_match_result(user, limit).detailed(user, limit)
         
     except Exception as e:
         logger.error(f"Erreur lors du matching détaillé pour utilisateur {user_id}: {str(e)}")
         return []
 
+# Matching inversé: pondérations et seuil (plus élevé que pour les trajets)
+REVERSE_GEO_WEIGHT = 0.4
+REVERSE_TIME_WEIGHT = 0.3
+REVERSE_MATCH_THRESHOLD = 0.4
+
+def reverse_min_geo(time_score):
+    """
+    Score géographique à dépasser pour qu'un passager atteigne le seuil du
+    matching inversé avec ce score horaire.
+    """
+    return (REVERSE_MATCH_THRESHOLD - time_score * REVERSE_TIME_WEIGHT) / REVERSE_GEO_WEIGHT
+
+def reverse_candidates(trajet):
+    """
+    Ids des passagers susceptibles de dépasser le seuil pour ce trajet.
+    Loin de ses heures préférées, un passager obtient au plus le score
+    horaire neutre (0,5) et doit donc être proche géographiquement; à
+    HOUR_TOLERANCE heures près, un score horaire de 1 abaisse ce minimum.
+    """
+    coordinates = None
+    if trajet.depart_latitude is not None and trajet.depart_longitude is not None:
+        coordinates = (trajet.depart_latitude, trajet.depart_longitude)
+    
+    candidate_ids = passenger_index.near_location(trajet.point_depart, coordinates, reverse_min_geo(0.5))
+    
+    trajet_hour = parse_departure_hour(trajet.horaire_depart)
+    if trajet_hour != UNKNOWN_HOUR:
+        near_hours = passenger_index.preferring_hours(
+            range(trajet_hour - HOUR_TOLERANCE, trajet_hour + HOUR_TOLERANCE + 1)
+        )
+        if near_hours:
+            candidate_ids |= near_hours & passenger_index.near_location(
+                trajet.point_depart, coordinates, reverse_min_geo(1.0)
+            )
+    
+    return candidate_ids
+
 def find_reverse_matches(user_id, limit=10):
     """
     Trouve les utilisateurs qui pourraient être intéressés par les trajets de l'utilisateur.
     Utile pour les conducteurs qui veulent voir qui pourrait être intéressé.
+    Chaque trajet ne score que les passagers retenus par l'index des passagers.
     """
     try:
-        user = User.query.get(user_id)
+        user = load_user(user_id)
         if not user:
             return []
         
@@ -286,64 +737,75 @@ def find_reverse_matches(user_id, limit=10):
         if not user_trajets:
             return []
         
-        # Récupérer les autres utilisateurs (potentiels passagers)
-        potential_passengers = User.query.filter(
-            User.id != user_id,
-            User.role == 'passager'
-        ).all()
+        # Meilleur match de chaque passager: (score arrondi, rang du trajet, trajet, raisons)
+        best_matches = {}
         
-        reverse_matches = []
-        
-        for trajet in user_trajets:
-            for passenger in potential_passengers:
+        for rank, trajet in enumerate(user_trajets):
+            # Sans horaire de départ, le score géographique seul ne dépasse pas le seuil
+            if not trajet.horaire_depart:
+                continue
+            
+            for passenger_id in reverse_candidates(trajet):
+                passenger = passenger_index.get(passenger_id)
+                if passenger is None or passenger_id == user_id:
+                    continue
+                
                 score = 0.0
                 reasons = []
                 
                 # Compatibilité géographique
-                if passenger.point_depart and trajet.point_depart:
-                    geo_score = calculate_text_similarity(passenger.point_depart, trajet.point_depart)
-                    score += geo_score * 0.4
+                geo_score = calculate_geo_score(
+                    passenger, trajet.point_depart, trajet.depart_latitude, trajet.depart_longitude
+                )
+                if geo_score:
+                    score += geo_score * REVERSE_GEO_WEIGHT
                     if geo_score > 0.7:
                         reasons.append(f"Point de départ compatible")
                 
                 # Compatibilité horaire
-                if passenger.horaires and trajet.horaire_depart:
-                    time_score = calculate_time_compatibility(passenger.horaires, trajet.horaire_depart)
-                    score += time_score * 0.3
-                    if time_score > 0.7:
-                        reasons.append(f"Horaires compatibles")
+                time_score = calculate_time_compatibility(passenger.horaires, trajet.horaire_depart)
+                score += time_score * REVERSE_TIME_WEIGHT
+                if time_score > 0.7:
+                    reasons.append(f"Horaires compatibles")
                 
-                if score > 0.4:  # Seuil plus élevé pour les reverse matches
-                    reverse_matches.append({
-                        'passenger': {
-                            'id': passenger.id,
-                            'nom': passenger.nom,
-                            'prenom': passenger.prenom,
-                            'point_depart': passenger.point_depart,
-                            'horaires': passenger.horaires,
-                            'photo': passenger.photo
-                        },
-                        'trajet': {
-                            'id': trajet.id,
-                            'point_depart': trajet.point_depart,
-                            'destination': trajet.destination,
-                            'horaire_depart': trajet.horaire_depart
-                        },
-                        'score': round(score, 2),
-                        'reasons': reasons
-                    })
+                if score > REVERSE_MATCH_THRESHOLD:  # Seuil plus élevé pour les reverse matches
+                    rounded = round(score, 2)
+                    current = best_matches.get(passenger_id)
+                    if current is None or rounded > current[0]:
+                        best_matches[passenger_id] = (rounded, rank, trajet, reasons)
         
-        # Trier par score et éliminer les doublons
-        seen_passengers = set()
-        unique_matches = []
+        # Meilleurs passagers par score, puis par rang du trajet et id
+        top = heapq.nsmallest(
+            limit, best_matches.items(),
+            key=lambda item: (-item[1][0], item[1][1], item[0])
+        )
+        passengers = load_users_by_ids(passenger_id for passenger_id, _ in top)
         
-        for match in sorted(reverse_matches, key=lambda x: x['score'], reverse=True):
-            passenger_id = match['passenger']['id']
-            if passenger_id not in seen_passengers:
-                unique_matches.append(match)
-                seen_passengers.add(passenger_id)
+        unique_matches = []
+        for passenger_id, (score, _, trajet, reasons) in top:
+            passenger = passengers.get(passenger_id)
+            if passenger is None:
+                continue
+            unique_matches.append({
+                'passenger': {
+                    'id': passenger.id,
+                    'nom': passenger.nom,
+                    'prenom': passenger.prenom,
+                    'point_depart': passenger.point_depart,
+                    'horaires': passenger.horaires,
+                    'photo': passenger.photo
+                },
+                'trajet': {
+                    'id': trajet.id,
+                    'point_depart': trajet.point_depart,
+                    'destination': trajet.destination,
+                    'horaire_depart': trajet.horaire_depart
+                },
+                'score': score,
+                'reasons': reasons
+            })
         
-        return unique_matches[:limit]
+        return unique_matches
         
     except Exception as e:
         logger.error(f"Erreur lors du reverse matching pour utilisateur {user_id}: {str(e)}")
@@ -352,33 +814,19 @@ def find_reverse_matches(user_id, limit=10):
 def get_matching_statistics(user_id):
     """
     Retourne des statistiques sur le matching pour un utilisateur.
+    Le résultat du scoring est mis en cache quelques secondes par utilisateur.
     """
     try:
-        user = User.query.get(user_id)
+        user = load_user(user_id)
         if not user:
             return None
         
-        total_trajets = Trajet.query.filter(Trajet.conducteur_id != user_id).count()
-        available_trajets = Trajet.query.filter(
-            Trajet.conducteur_id != user_id,
-            Trajet.places_disponibles > 0
-        ).count()
-        
-        matches = find_matches(user_id, limit=100)  # Récupérer plus pour les stats
-        high_quality_matches = [m for m in find_detailed_matches(user_id, limit=100) if m['score'] > 0.7]
-        
-        stats = {
-            'user_id': user_id,
-            'total_trajets_available': available_trajets,
-            'total_trajets_all': total_trajets,
-            'total_matches': len(matches),
-            'high_quality_matches': len(high_quality_matches),
-            'matching_rate': round((len(matches) / available_trajets * 100) if available_trajets > 0 else 0, 1),
-            'user_profile_completeness': calculate_profile_completeness(user),
-            'recommendations': generate_profile_recommendations(user)
-        }
+        result = match_result_cache.get(user_id)
+        if result is None:
+            result = compute_match_result(user, STATS_MATCH_LIMIT, with_counts=True)
+            match_result_cache.set(user_id, result, stats_cache_seconds())
         
-        return stats
+        return result.statistics(user)
         
     except Exception as e:
         logger.error(f"Erreur lors du calcul des statistiques pour utilisateur {user_id}: {str(e)}")
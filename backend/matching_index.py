@@ -0,0 +1,397 @@
+# backend/matching_index.py
+"""
+Index de matching en mémoire.
+
+Chaque trajet disponible est rangé par identifiants de tokens de son point
+de départ (voir backend.locations), par trigrammes de ses lieux de départ et
+d'arrivée, par position dans une grille spatiale (voir backend.geo) et par
+tranche horaire de départ. Sans NumPy, find_matches interroge cet index
+pour charger et scorer d'abord les trajets candidats: les autres ne sont
+chargés que si un trajet écarté pourrait encore entrer dans les meilleurs
+matches (voir max_pruned_score et matching.score_row_candidates). Le
+moteur vectorisé score toutes ses colonnes, ce qui coûte moins cher que
+de construire l'ensemble des candidats (voir benchmarks/matching_latency.py).
+"""
+from collections import Counter, defaultdict, namedtuple
+import logging
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from backend import scoring
+from backend.extensions import db
+from backend.geo import GridIndex
+from backend.horaires import MINUTES_PER_HOUR, UNKNOWN_HOUR, parse_departure_hour
+from backend.locations import TRIGRAM_THRESHOLD, TrigramIndex, location_token_ids
+from backend.models import Trajet
+
+logger = logging.getLogger(__name__)
+
+# Écart maximal (en heures) encore récompensé par le score horaire
+HOUR_TOLERANCE = 2
+
+# Rayon (km) en deçà duquel la distance contribue au score géographique
+GEO_MATCH_RADIUS_KM = 10.0
+
+DEFAULT_REFRESH_SECONDS = 300
+
+# Clé de session.info des trajets à réindexer après le commit
+PENDING_INDEX_CHANGES_KEY = 'matching_index_changes'
+
+# Scores horaires d'un trajet hors de la fenêtre des heures préférées, et
+# d'un utilisateur dont les horaires ne contiennent aucune heure
+# interprétable (voir matching.time_score_for_hours)
+OFF_WINDOW_TIME_SCORE = 0.3
+NEUTRAL_TIME_SCORE = 0.5
+
+# Score géographique maximal d'un trajet écarté par l'index: sans token
+# commun, ni trigrammes au-dessus de TRIGRAM_THRESHOLD, ni voisinage, un
+# nom contenu dans l'autre vaut encore 0,8 (voir
+# matching.calculate_text_similarity)
+PRUNED_GEO_SCORE = 0.8
+
+IndexEntry = namedtuple('IndexEntry', [
+    'conducteur_id', 'token_ids', 'hour', 'point_depart', 'destination',
+    'horaire_depart', 'places_disponibles', 'created_at',
+    'depart_latitude', 'depart_longitude'
+])
+
+
+def trajet_hour(horaire_depart, depart_minute):
+    """Heure de départ indexée d'un trajet (UNKNOWN_HOUR si non interprétable)"""
+    if depart_minute is not None:
+        return depart_minute // MINUTES_PER_HOUR
+    return parse_departure_hour(horaire_depart)
+
+
+def max_pruned_score(geo_score, has_horaires, preferred_hours, role_bonus):
+    """
+    Borne supérieure du score d'un trajet écarté: son score géographique
+    reste sous geo_score et il part loin des heures préférées, mais places,
+    récence et bonus de rôle peuvent valoir leur maximum. Les composantes
+    sont additionnées dans l'ordre de matching.score_trajets.
+    """
+    score = geo_score * scoring.GEO_WEIGHT
+    if preferred_hours:
+        score += OFF_WINDOW_TIME_SCORE * scoring.TIME_WEIGHT
+    elif has_horaires:
+        score += NEUTRAL_TIME_SCORE * scoring.TIME_WEIGHT
+    score += scoring.PLACES_WEIGHT
+    score += scoring.RECENCY_WEIGHT
+    if role_bonus:
+        score += scoring.ROLE_BONUS
+    return score
+
+
+class MatchingIndex:
+    """
+    Index inversé des trajets disponibles (places_disponibles > 0).
+
+    L'index est alimenté par les listeners after_insert / after_update /
+    after_delete sur Trajet, appliqués au commit (voir apply_pending_index_changes):
+    tout trajet validé par une session du processus y figure, qu'il vienne
+    d'une route, d'un job ou d'un script. Chaque worker possède sa propre
+    copie: les modifications faites par les autres processus n'y entrent
+    qu'à la reconstruction depuis la base, au plus tard
+    MATCHING_INDEX_REFRESH_SECONDS après. Pendant ce délai, un trajet
+    supprimé ou complet ailleurs peut encore être candidat, mais il est
+    écarté au chargement (voir matching.load_trajets_by_ids); un trajet
+    créé ailleurs n'est pas encore proposé.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}  # trajet_id -> IndexEntry
+        self._by_token = defaultdict(set)
+        self._by_hour = defaultdict(set)
+        self._by_location = defaultdict(set)  # point_depart -> trajet_ids
+        self._destination_counts = Counter()
+        self._departure_trigrams = TrigramIndex()
+        self._destination_trigrams = TrigramIndex()
+        self._grid = GridIndex()
+        self._built_at = None
+        self._version = 0
+        self._columns = None
+        self._columns_version = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _insert(self, trajet_id, conducteur_id, point_depart, destination, horaire_depart,
+                depart_minute, places_disponibles, created_at,
+                depart_latitude=None, depart_longitude=None):
+        if not places_disponibles or places_disponibles <= 0:
+            self._discard(trajet_id)
+            return
+
+        token_ids = location_token_ids(point_depart)
+        hour = trajet_hour(horaire_depart, depart_minute)
+        entry = IndexEntry(
+            conducteur_id, token_ids, hour, point_depart, destination,
+            horaire_depart, places_disponibles, created_at,
+            depart_latitude, depart_longitude
+        )
+        # Trajet inchangé (mise à jour d'un champ non indexé): l'instantané
+        # en colonnes reste valide
+        if self._entries.get(trajet_id) == entry:
+            return
+
+        self._discard(trajet_id)
+        self._entries[trajet_id] = entry
+        self._version += 1
+        for token_id in token_ids:
+            self._by_token[token_id].add(trajet_id)
+        self._by_hour[hour].add(trajet_id)
+        if point_depart:
+            self._by_location[point_depart].add(trajet_id)
+            self._departure_trigrams.add(point_depart)
+        if destination:
+            self._destination_counts[destination] += 1
+            self._destination_trigrams.add(destination)
+        if depart_latitude is not None and depart_longitude is not None:
+            self._grid.add(trajet_id, depart_latitude, depart_longitude)
+
+    @staticmethod
+    def _discard_from(buckets, key, trajet_id):
+        """Retire trajet_id d'un bucket; retourne True si le bucket est supprimé"""
+        bucket = buckets.get(key)
+        if bucket is None:
+            return False
+        bucket.discard(trajet_id)
+        if bucket:
+            return False
+        del buckets[key]
+        return True
+
+    def _discard(self, trajet_id):
+        entry = self._entries.pop(trajet_id, None)
+        if entry is None:
+            return
+        self._version += 1
+
+        for token_id in entry.token_ids:
+            self._discard_from(self._by_token, token_id, trajet_id)
+        self._discard_from(self._by_hour, entry.hour, trajet_id)
+        if entry.point_depart and self._discard_from(self._by_location, entry.point_depart, trajet_id):
+            self._departure_trigrams.remove(entry.point_depart)
+        if entry.destination:
+            self._destination_counts[entry.destination] -= 1
+            if self._destination_counts[entry.destination] <= 0:
+                del self._destination_counts[entry.destination]
+                self._destination_trigrams.remove(entry.destination)
+        self._grid.remove(trajet_id)
+
+    def add(self, trajet):
+        """Ajoute ou met à jour un trajet dans l'index"""
+        with self._lock:
+            self._insert(*index_row(trajet))
+
+    def apply(self, changes):
+        """
+        Applique des changements validés: liste de (trajet_id, ligne) où
+        ligne est le résultat de index_row, ou None pour une suppression.
+        """
+        with self._lock:
+            for trajet_id, row in changes:
+                if row is None:
+                    self._discard(trajet_id)
+                else:
+                    self._insert(*row)
+
+    def remove(self, trajet_id):
+        """Retire un trajet de l'index"""
+        with self._lock:
+            self._discard(trajet_id)
+
+    def clear(self):
+        """Vide l'index (il sera reconstruit au prochain accès)"""
+        with self._lock:
+            self._entries.clear()
+            self._by_token.clear()
+            self._by_hour.clear()
+            self._by_location.clear()
+            self._destination_counts.clear()
+            self._departure_trigrams.clear()
+            self._destination_trigrams.clear()
+            self._grid.clear()
+            self._built_at = None
+            self._version += 1
+
+    def invalidate(self):
+        """Force une reconstruction au prochain accès"""
+        self._built_at = None
+
+    def rebuild(self):
+        """Reconstruit l'index à partir de la base de données"""
+        rows = db.session.query(
+            Trajet.id,
+            Trajet.conducteur_id,
+            Trajet.point_depart,
+            Trajet.destination,
+            Trajet.horaire_depart,
+            Trajet.depart_minute,
+            Trajet.places_disponibles,
+            Trajet.created_at,
+            Trajet.depart_latitude,
+            Trajet.depart_longitude
+        ).filter(Trajet.places_disponibles > 0).all()
+
+        with self._lock:
+            self.clear()
+            for row in rows:
+                self._insert(*row)
+            self._built_at = time.monotonic()
+
+        logger.info(f"Index de matching reconstruit: {len(rows)} trajets")
+
+    def ensure_fresh(self, force=False):
+        """Reconstruit l'index s'il est vide, trop ancien ou si force est vrai"""
+        if force:
+            self.rebuild()
+            return
+
+        refresh_seconds = DEFAULT_REFRESH_SECONDS
+        if has_app_context():
+            refresh_seconds = current_app.config.get('MATCHING_INDEX_REFRESH_SECONDS', refresh_seconds)
+
+        built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at > refresh_seconds:
+            self.rebuild()
+
+    def similar_locations(self, text, field='point_depart', threshold=TRIGRAM_THRESHOLD, limit=None):
+        """
+        Lieux indexés (départ ou destination) proches de text par trigrammes,
+        sous forme de liste (lieu, similarité) triée par similarité décroissante.
+        """
+        self.ensure_fresh()
+
+        trigrams = self._departure_trigrams if field == 'point_depart' else self._destination_trigrams
+        with self._lock:
+            return trigrams.search(text, threshold=threshold, limit=limit)
+
+    def within_radius(self, latitude, longitude, radius_km):
+        """
+        Trajets disponibles partant à moins de radius_km du point donné,
+        sous forme de liste (trajet_id, distance_km) triée par distance.
+        """
+        self.ensure_fresh()
+
+        with self._lock:
+            return self._grid.within(latitude, longitude, radius_km)
+
+    def candidates(self, point_depart, preferred_hours, exclude_conducteur_id=None,
+                   coordinates=None):
+        """
+        Retourne les ids des trajets dont le point de départ partage un token
+        avec point_depart, lui est proche par trigrammes ou se trouve à moins
+        de GEO_MATCH_RADIUS_KM de coordinates (latitude, longitude), ou
+        partant à moins de HOUR_TOLERANCE heures d'une heure préférée (les
+        horaires non interprétables sont toujours inclus).
+
+        Retourne None si l'utilisateur n'a ni point de départ, ni coordonnées,
+        ni horaire exploitable: l'index ne permet alors aucun élagage. Le
+        score d'un trajet écarté est borné par max_pruned_score avec
+        PRUNED_GEO_SCORE.
+        """
+        token_ids = location_token_ids(point_depart)
+        hours = set()
+        for pref_hour in preferred_hours or ():
+            hours.update(range(pref_hour - HOUR_TOLERANCE, pref_hour + HOUR_TOLERANCE + 1))
+
+        if not token_ids and not hours and not coordinates:
+            return None
+
+        self.ensure_fresh()
+
+        result = set()
+        with self._lock:
+            for token_id in token_ids:
+                result.update(self._by_token.get(token_id, ()))
+            if token_ids:
+                for location, _ in self._departure_trigrams.search(point_depart):
+                    result.update(self._by_location.get(location, ()))
+            if coordinates:
+                result.update(trajet_id for trajet_id, _ in self._grid.within(
+                    coordinates[0], coordinates[1], GEO_MATCH_RADIUS_KM
+                ))
+            if hours:
+                hours.add(UNKNOWN_HOUR)
+                for hour in hours:
+                    result.update(self._by_hour.get(hour, ()))
+
+            if exclude_conducteur_id is not None:
+                result = {
+                    trajet_id for trajet_id in result
+                    if self._entries[trajet_id].conducteur_id != exclude_conducteur_id
+                }
+
+        return result
+
+    def columns(self):
+        """
+        Retourne l'instantané en colonnes (scoring.TrajetColumns) des trajets
+        indexés, reconstruit uniquement si l'index a changé depuis.
+        """
+        self.ensure_fresh()
+
+        with self._lock:
+            if self._columns is None or self._columns_version != self._version:
+                self._columns = scoring.TrajetColumns(
+                    (trajet_id, entry.conducteur_id,
+                     (entry.point_depart, entry.depart_latitude, entry.depart_longitude),
+                     entry.hour if entry.horaire_depart else scoring.NO_HOUR,
+                     entry.places_disponibles, entry.created_at)
+                    for trajet_id, entry in self._entries.items()
+                )
+                self._columns_version = self._version
+            return self._columns
+
+
+# Index partagé par les blueprints du processus courant
+matching_index = MatchingIndex()
+
+
+def index_row(trajet):
+    """Arguments de MatchingIndex._insert pour un trajet, copiés au moment du flush"""
+    return (trajet.id, trajet.conducteur_id, trajet.point_depart, trajet.destination,
+            trajet.horaire_depart, trajet.depart_minute, trajet.places_disponibles,
+            trajet.created_at, trajet.depart_latitude, trajet.depart_longitude)
+
+
+def _pending_index_changes(target):
+    session = object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault(PENDING_INDEX_CHANGES_KEY, [])
+
+
+@event.listens_for(Trajet, 'after_insert')
+@event.listens_for(Trajet, 'after_update')
+def record_trajet_index_change(mapper, connection, target):
+    """Trajet créé ou modifié: à réindexer après le commit"""
+    pending = _pending_index_changes(target)
+    if pending is not None:
+        pending.append((target.id, index_row(target)))
+
+
+@event.listens_for(Trajet, 'after_delete')
+def record_trajet_index_deletion(mapper, connection, target):
+    """Trajet supprimé: à retirer de l'index après le commit"""
+    pending = _pending_index_changes(target)
+    if pending is not None:
+        pending.append((target.id, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def apply_pending_index_changes(session):
+    changes = session.info.pop(PENDING_INDEX_CHANGES_KEY, None)
+    if changes:
+        matching_index.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def discard_pending_index_changes(session):
+    session.info.pop(PENDING_INDEX_CHANGES_KEY, None)
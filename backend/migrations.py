@@ -0,0 +1,194 @@
+# backend/migrations.py
+"""
+Migrations de schéma idempotentes.
+
+db.create_all() ne crée que les tables manquantes: les colonnes et index
+ajoutés aux modèles après coup sont appliqués ici sur les bases existantes,
+puis les lignes concernées sont remplies. Chaque migration peut être
+relancée sans effet de bord.
+"""
+import logging
+
+from sqlalchemy import inspect, text
+
+from backend.counters import reconcile_counters
+from backend.extensions import db
+from backend.geo import geocode
+from backend.horaires import parse_departure_minute, parse_preference_mask
+from backend.models import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+# Nombre de lignes mises à jour par lot lors des remplissages
+BACKFILL_BATCH_SIZE = 1000
+
+
+def add_column_if_missing(table, column, ddl_type):
+    """Ajoute une colonne à une table existante si elle n'existe pas encore"""
+    columns = {col['name'] for col in inspect(db.engine).get_columns(table)}
+    if column in columns:
+        return False
+
+    with db.engine.begin() as connection:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl_type}'))
+    logger.info(f"Colonne ajoutée: {table}.{column}")
+    return True
+
+
+def create_index_if_missing(name, table, columns):
+    """Crée un index s'il n'existe pas encore"""
+    indexes = {index['name'] for index in inspect(db.engine).get_indexes(table)}
+    if name in indexes:
+        return False
+
+    with db.engine.begin() as connection:
+        connection.execute(text(f'CREATE INDEX {name} ON {table} ({", ".join(columns)})'))
+    logger.info(f"Index créé: {name}")
+    return True
+
+
+def backfill(select_sql, update_sql, compute):
+    """
+    Remplit une colonne dérivée par lots: select_sql retourne (id, source),
+    update_sql reçoit les paramètres :id et :value.
+    """
+    updated = 0
+    with db.engine.begin() as connection:
+        rows = connection.execute(text(select_sql)).fetchall()
+        for start in range(0, len(rows), BACKFILL_BATCH_SIZE):
+            batch = rows[start:start + BACKFILL_BATCH_SIZE]
+            params = [{'id': row[0], 'value': compute(row[1])} for row in batch]
+            if params:
+                connection.execute(text(update_sql), params)
+                updated += len(params)
+    return updated
+
+
+def migrate_normalized_horaires():
+    """
+    Colonnes normalisées trajets.depart_minute et users.horaires_mask.
+    Elles ne sont remplies qu'à leur création: ensuite, les listeners de
+    backend.models les tiennent à jour, et un depart_minute NULL désigne
+    un horaire non interprétable qu'il est inutile de relire à chaque
+    démarrage.
+    """
+    trajets = users = 0
+    if add_column_if_missing('trajets', 'depart_minute', 'INTEGER'):
+        trajets = backfill(
+            'SELECT id, horaire_depart FROM trajets',
+            'UPDATE trajets SET depart_minute = :value WHERE id = :id',
+            parse_departure_minute
+        )
+    create_index_if_missing('ix_trajets_depart_minute', 'trajets', ['depart_minute'])
+    if add_column_if_missing('users', 'horaires_mask', 'INTEGER'):
+        users = backfill(
+            'SELECT id, horaires FROM users',
+            'UPDATE users SET horaires_mask = :value WHERE id = :id',
+            parse_preference_mask
+        )
+    create_index_if_missing('ix_users_horaires_mask', 'users', ['horaires_mask'])
+    logger.info(f"Horaires normalisés: {trajets} trajets, {users} utilisateurs")
+
+
+def migrate_geo_coordinates():
+    """Coordonnées des points de départ, géocodées avec le gazetteer local"""
+    add_column_if_missing('users', 'latitude', 'FLOAT')
+    add_column_if_missing('users', 'longitude', 'FLOAT')
+    add_column_if_missing('trajets', 'depart_latitude', 'FLOAT')
+    add_column_if_missing('trajets', 'depart_longitude', 'FLOAT')
+
+    updated = 0
+    for table, place, lat, lon in (
+        ('users', 'point_depart', 'latitude', 'longitude'),
+        ('trajets', 'point_depart', 'depart_latitude', 'depart_longitude'),
+    ):
+        with db.engine.begin() as connection:
+            rows = connection.execute(text(
+                f'SELECT id, {place} FROM {table} '
+                f'WHERE {lat} IS NULL AND {place} IS NOT NULL'
+            )).fetchall()
+            params = []
+            for row_id, name in rows:
+                coordinates = geocode(name)
+                if coordinates is not None:
+                    params.append({'id': row_id, 'lat': coordinates[0], 'lon': coordinates[1]})
+            for start in range(0, len(params), BACKFILL_BATCH_SIZE):
+                connection.execute(
+                    text(f'UPDATE {table} SET {lat} = :lat, {lon} = :lon WHERE id = :id'),
+                    params[start:start + BACKFILL_BATCH_SIZE]
+                )
+            updated += len(params)
+    logger.info(f"Coordonnées géocodées: {updated} lignes")
+
+
+def migrate_trajets_keyset_index():
+    """Index composite (created_at, id) de la pagination par curseur"""
+    create_index_if_missing('ix_trajets_created_at_id', 'trajets', ['created_at', 'id'])
+
+
+# Index composites des filtres de GET /api/trajets (voir backend.trajet_filters)
+TRAJETS_FILTER_INDEXES = (
+    ('ix_trajets_statut_date_places', ['statut', 'date_trajet', 'places_disponibles']),
+    ('ix_trajets_destination_statut_date', ['destination', 'statut', 'date_trajet']),
+    ('ix_trajets_depart_statut_date', ['point_depart', 'statut', 'date_trajet']),
+    ('ix_trajets_statut_depart_minute', ['statut', 'depart_minute']),
+    ('ix_trajets_statut_prix', ['statut', 'prix_par_place']),
+    ('ix_trajets_statut_created_at_id', ['statut', 'created_at', 'id']),
+)
+
+
+def migrate_trajets_filter_indexes():
+    """Index composites des filtres et tris de la liste des trajets"""
+    for name, columns in TRAJETS_FILTER_INDEXES:
+        create_index_if_missing(name, 'trajets', columns)
+
+
+def migrate_places_reservees():
+    """Compteur dénormalisé des places réservées, rempli depuis les réservations"""
+    if add_column_if_missing('trajets', 'places_reservees', 'INTEGER NOT NULL DEFAULT 0'):
+        reconcile_counters(columns=('places_reservees',))
+
+
+# Agrégats dénormalisés de users (voir backend.models.COUNTERS)
+USER_AGGREGATE_COLUMNS = (
+    'rating_sum', 'rating_count', 'completed_trajets_count', 'completed_reservations_count'
+)
+
+
+def migrate_user_aggregates():
+    """Notes et trajets complétés agrégés sur users, remplis depuis les tables sources"""
+    added = [
+        column for column in USER_AGGREGATE_COLUMNS
+        if add_column_if_missing('users', column, 'INTEGER NOT NULL DEFAULT 0')
+    ]
+    if added:
+        reconcile_counters(columns=added)
+
+
+def migrate_revoked_tokens():
+    """Table revoked_tokens du backend de révocation 'database' (voir backend.revocation)"""
+    if inspect(db.engine).has_table(RevokedToken.__tablename__):
+        return
+
+    RevokedToken.__table__.create(db.engine)
+    logger.info("Table créée: revoked_tokens")
+
+
+# Migrations appliquées dans l'ordre par run_migrations
+MIGRATIONS = [
+    migrate_normalized_horaires,
+    migrate_geo_coordinates,
+    migrate_trajets_keyset_index,
+    migrate_trajets_filter_indexes,
+    migrate_places_reservees,
+    migrate_user_aggregates,
+    migrate_revoked_tokens,
+]
+
+
+def run_migrations():
+    """Crée les tables manquantes puis applique toutes les migrations"""
+    db.create_all()
+    for migration in MIGRATIONS:
+        logger.info(f"Migration: {migration.__name__}")
+        migration()
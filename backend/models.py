@@ -1,8 +1,12 @@
 # backend/models.py
+from collections import namedtuple
 from datetime import datetime
 from backend.extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
-from sqlalchemy import event
+from backend.geo import geocode, haversine_km
+from backend.horaires import parse_departure_minute, parse_preference_mask
+from backend.passwords import password_service
+from sqlalchemy import case, event, func, inspect, select
+from sqlalchemy.orm import Session, object_session
 import re
 
 class User(db.Model):
@@ -16,12 +20,20 @@ class User(db.Model):
     mot_de_passe = db.Column(db.String(200), nullable=False)
     role = db.Column(db.String(20), default='passager', index=True)  # 'conducteur' ou 'passager'
     point_depart = db.Column(db.String(200), index=True)
+    latitude = db.Column(db.Float)  # Coordonnées optionnelles du point de départ
+    longitude = db.Column(db.Float)
     horaires = db.Column(db.String(50))
+    horaires_mask = db.Column(db.Integer, index=True)  # Bit h levé si l'heure h est préférée (voir backend.horaires)
     photo = db.Column(db.String(200))
     is_active = db.Column(db.Boolean, default=True, index=True)
     is_verified = db.Column(db.Boolean, default=False)
     verification_token = db.Column(db.String(100))
     last_login = db.Column(db.DateTime)
+    # Agrégats dénormalisés (voir backend.counters)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    completed_trajets_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Trajets complétés comme conducteur
+    completed_reservations_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Réservations complétées comme passager
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -36,11 +48,16 @@ class User(db.Model):
         """Hash et stocke le mot de passe"""
         if len(password) < 6:
             raise ValueError("Le mot de passe doit contenir au moins 6 caractères")
-        self.mot_de_passe = generate_password_hash(password)
+        self.mot_de_passe = password_service.hash(password)
 
     def check_password(self, password):
-        """Vérifie le mot de passe"""
-        return check_password_hash(self.mot_de_passe, password)
+        """Vérifie le mot de passe et le rehache si les paramètres de hachage ont changé"""
+        if not password_service.verify(self.mot_de_passe, password):
+            return False
+        rehashed = password_service.rehash(self.mot_de_passe, password)
+        if rehashed is not None:
+            self.mot_de_passe = rehashed
+        return True
     
     def is_email_valid(self):
         """Valide le format de l'email"""
@@ -58,18 +75,17 @@ class User(db.Model):
         return f"{self.prenom} {self.nom}"
     
     def get_average_rating(self):
-        """Calcule la note moyenne de l'utilisateur"""
-        evaluations = self.evaluations_recues.all()
-        if not evaluations:
+        """Note moyenne de l'utilisateur, d'après les agrégats maintenus"""
+        if not self.rating_count:
             return None
-        return sum(eval.note for eval in evaluations) / len(evaluations)
+        return self.rating_sum / self.rating_count
     
     def get_completed_trips_count(self):
-        """Compte le nombre de trajets complétés"""
+        """Nombre de trajets complétés, d'après les agrégats maintenus"""
         if self.role == 'conducteur':
-            return self.trajets_conducteur.filter_by(statut='complete').count()
+            return self.completed_trajets_count or 0
         else:
-            return self.reservations.filter_by(statut='complete').count()
+            return self.completed_reservations_count or 0
     
     def to_dict(self, include_sensitive=False):
         """Convertit l'utilisateur en dictionnaire"""
@@ -81,6 +97,8 @@ class User(db.Model):
             'telephone': self.telephone if include_sensitive else None,
             'role': self.role,
             'point_depart': self.point_depart,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             'horaires': self.horaires,
             'photo': self.photo,
             'is_active': self.is_active,
@@ -96,15 +114,30 @@ class User(db.Model):
 
 class Trajet(db.Model):
     __tablename__ = 'trajets'
+    __table_args__ = (
+        # Pagination par curseur (voir backend.pagination)
+        db.Index('ix_trajets_created_at_id', 'created_at', 'id'),
+        # Filtres de la liste des trajets (voir backend.trajet_filters)
+        db.Index('ix_trajets_statut_date_places', 'statut', 'date_trajet', 'places_disponibles'),
+        db.Index('ix_trajets_destination_statut_date', 'destination', 'statut', 'date_trajet'),
+        db.Index('ix_trajets_depart_statut_date', 'point_depart', 'statut', 'date_trajet'),
+        db.Index('ix_trajets_statut_depart_minute', 'statut', 'depart_minute'),
+        db.Index('ix_trajets_statut_prix', 'statut', 'prix_par_place'),
+        db.Index('ix_trajets_statut_created_at_id', 'statut', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     conducteur_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     point_depart = db.Column(db.String(200), nullable=False, index=True)
     destination = db.Column(db.String(200), nullable=False, index=True)
+    depart_latitude = db.Column(db.Float)  # Coordonnées optionnelles du point de départ
+    depart_longitude = db.Column(db.Float)
     horaire_depart = db.Column(db.String(50), nullable=False)
+    depart_minute = db.Column(db.Integer, index=True)  # Minute de la journée, NULL si horaire non interprétable
     date_trajet = db.Column(db.Date)
     places_disponibles = db.Column(db.Integer, default=1)
     places_totales = db.Column(db.Integer, default=1)
+    places_reservees = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Nombre de réservations confirmées (voir backend.counters)
     prix_par_place = db.Column(db.Float, default=0.0)
     description = db.Column(db.Text)
     statut = db.Column(db.String(20), default='active', index=True)  # 'active', 'complete', 'cancelled'
@@ -116,15 +149,10 @@ class Trajet(db.Model):
     # Relations
     reservations = db.relationship('Reservation', backref='trajet', lazy='dynamic', cascade='all, delete-orphan')
     
-    @property
-    def places_reservees(self):
-        """Calcule le nombre de places réservées"""
-        return self.reservations.filter_by(statut='confirmee').count()
-    
     @property
     def places_libres(self):
         """Calcule le nombre de places libres"""
-        return max(0, self.places_disponibles - self.places_reservees)
+        return max(0, self.places_disponibles - (self.places_reservees or 0))
     
     def is_available(self):
         """Vérifie si le trajet est disponible pour réservation"""
@@ -137,9 +165,16 @@ class Trajet(db.Model):
         return self.conducteur_id == user_id and self.statut == 'active'
     
     def get_distance_estimate(self):
-        """Estimation simple de distance (à améliorer avec une vraie API)"""
-        # Logique simplifiée - à remplacer par une vraie API de géolocalisation
-        return "Distance non calculée"
+        """Estimation de la distance à vol d'oiseau (gazetteer local)"""
+        if self.depart_latitude is not None and self.depart_longitude is not None:
+            origin = (self.depart_latitude, self.depart_longitude)
+        else:
+            origin = geocode(self.point_depart)
+        arrival = geocode(self.destination)
+        
+        if not origin or not arrival:
+            return "Distance non calculée"
+        return f"{haversine_km(*origin, *arrival):.1f} km"
     
     def to_dict(self, include_conducteur=False):
         """Convertit le trajet en dictionnaire"""
@@ -148,6 +183,8 @@ class Trajet(db.Model):
             'conducteur_id': self.conducteur_id,
             'point_depart': self.point_depart,
             'destination': self.destination,
+            'depart_latitude': self.depart_latitude,
+            'depart_longitude': self.depart_longitude,
             'horaire_depart': self.horaire_depart,
             'date_trajet': self.date_trajet.isoformat() if self.date_trajet else None,
             'places_disponibles': self.places_disponibles,
@@ -268,6 +305,29 @@ class Evaluation(db.Model):
     def __repr__(self):
         return f"<Evaluation {self.note}/5 de {self.evaluateur_id} vers {self.evalue_id}>"
 
+class CollectionVersion(db.Model):
+    """Version d'une collection, incrémentée à chaque modification validée (voir backend.conditional)"""
+    __tablename__ = 'collection_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<CollectionVersion {self.name} v{self.version}>"
+
+class RevokedToken(db.Model):
+    """JWT révoqué, conservé jusqu'à son expiration (voir backend.revocation)"""
+    __tablename__ = 'revoked_tokens'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(64), unique=True, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f"<RevokedToken {self.jti}>"
+
 # Événements SQLAlchemy pour validation automatique
 @event.listens_for(User, 'before_insert')
 @event.listens_for(User, 'before_update')
@@ -279,6 +339,45 @@ def validate_user(mapper, connection, target):
     if not target.is_phone_valid():
         raise ValueError(f"Format de téléphone invalide: {target.telephone}")
 
+@event.listens_for(User, 'before_insert')
+@event.listens_for(User, 'before_update')
+def normalize_user_horaires(mapper, connection, target):
+    """Persiste le masque des heures préférées dérivé de horaires"""
+    target.horaires_mask = parse_preference_mask(target.horaires)
+
+@event.listens_for(Trajet, 'before_insert')
+@event.listens_for(Trajet, 'before_update')
+def normalize_trajet_horaire(mapper, connection, target):
+    """Persiste la minute de départ dérivée de horaire_depart"""
+    target.depart_minute = parse_departure_minute(target.horaire_depart)
+
+def _geocode_if_needed(target, place_attr, lat_attr, lon_attr):
+    """
+    Géocode le lieu avec le gazetteer local lorsqu'il change, sauf si des
+    coordonnées explicites sont fournies en même temps.
+    """
+    attrs = inspect(target).attrs
+    place_changed = attrs[place_attr].history.has_changes()
+    coords_changed = attrs[lat_attr].history.has_changes() or attrs[lon_attr].history.has_changes()
+    if not place_changed or coords_changed:
+        return
+    
+    latitude, longitude = geocode(getattr(target, place_attr)) or (None, None)
+    setattr(target, lat_attr, latitude)
+    setattr(target, lon_attr, longitude)
+
+@event.listens_for(User, 'before_insert')
+@event.listens_for(User, 'before_update')
+def geocode_user(mapper, connection, target):
+    """Coordonnées du point de départ de l'utilisateur"""
+    _geocode_if_needed(target, 'point_depart', 'latitude', 'longitude')
+
+@event.listens_for(Trajet, 'before_insert')
+@event.listens_for(Trajet, 'before_update')
+def geocode_trajet(mapper, connection, target):
+    """Coordonnées du point de départ du trajet"""
+    _geocode_if_needed(target, 'point_depart', 'depart_latitude', 'depart_longitude')
+
 @event.listens_for(Evaluation, 'before_insert')
 @event.listens_for(Evaluation, 'before_update')
 def validate_evaluation(mapper, connection, target):
@@ -288,3 +387,128 @@ def validate_evaluation(mapper, connection, target):
     
     if target.evaluateur_id == target.evalue_id:
         raise ValueError("Un utilisateur ne peut pas s'auto-évaluer")
+
+# Compteurs dénormalisés tenus à jour par listeners (voir backend.counters)
+#
+# Chaque compteur est la somme, sur les lignes d'un modèle source, d'une
+# contribution calculée à partir de quelques colonnes, rattachée à la ligne
+# propriétaire désignée par une clé étrangère. Les écarts sont appliqués par
+# incrément SQL dans la transaction du flush: des modifications concurrentes
+# s'additionnent au lieu de s'écraser. expression est l'équivalent SQL de
+# contribution, utilisé par la réconciliation.
+Counter = namedtuple('Counter', [
+    'source', 'owner_attr', 'owner', 'column', 'attrs', 'contribution', 'expression'
+])
+
+# Clé de session.info des compteurs modifiés en SQL pendant le flush
+RECOUNTED_KEY = 'recounted_counters'
+
+# places_reservees compte les réservations confirmées, comme l'ancienne
+# propriété Trajet.places_reservees, et non leurs nombre_places
+COUNTERS = (
+    Counter(Reservation, 'trajet_id', Trajet, 'places_reservees', ('statut',),
+            lambda row: 1 if row.statut == 'confirmee' else 0,
+            lambda t: case((t.c.statut == 'confirmee', 1), else_=0)),
+    Counter(Reservation, 'passager_id', User, 'completed_reservations_count', ('statut',),
+            lambda row: 1 if row.statut == 'complete' else 0,
+            lambda t: case((t.c.statut == 'complete', 1), else_=0)),
+    Counter(Trajet, 'conducteur_id', User, 'completed_trajets_count', ('statut',),
+            lambda row: 1 if row.statut == 'complete' else 0,
+            lambda t: case((t.c.statut == 'complete', 1), else_=0)),
+    Counter(Evaluation, 'evalue_id', User, 'rating_sum', ('note',),
+            lambda row: row.note or 0,
+            lambda t: func.coalesce(t.c.note, 0)),
+    Counter(Evaluation, 'evalue_id', User, 'rating_count', (),
+            lambda row: 1,
+            lambda t: 1),
+)
+
+def _stored_row(connection, model, row_id, names):
+    """Valeurs en base des colonnes names d'une ligne, verrouillée jusqu'au commit"""
+    table = model.__table__
+    return connection.execute(
+        select(*[table.c[name] for name in names])
+        .where(table.c.id == row_id)
+        .with_for_update()
+    ).first()
+
+def _apply_deltas(connection, target, deltas):
+    """
+    Applique les écarts {(compteur, id propriétaire): valeur} puis marque
+    les attributs chargés dans la session comme périmés. updated_at avance
+    avec le compteur: les ETags qui en dérivent changent (voir backend.conditional).
+    """
+    changed = [(counter, owner_id) for (counter, owner_id), delta in deltas.items()
+               if owner_id is not None and delta]
+    for counter, owner_id in changed:
+        table = counter.owner.__table__
+        connection.execute(
+            table.update()
+            .where(table.c.id == owner_id)
+            .values({
+                counter.column: table.c[counter.column] + deltas[(counter, owner_id)],
+                'updated_at': datetime.utcnow()
+            })
+        )
+    session = object_session(target)
+    if changed and session is not None:
+        session.info.setdefault(RECOUNTED_KEY, set()).update(
+            (counter.owner, owner_id, counter.column) for counter, owner_id in changed
+        )
+
+def _counted_names(counters):
+    names = []
+    for counter in counters:
+        for name in (counter.owner_attr,) + counter.attrs:
+            if name not in names:
+                names.append(name)
+    return names
+
+def _add_contributions(deltas, counters, row, sign):
+    for counter in counters:
+        key = (counter, getattr(row, counter.owner_attr))
+        deltas[key] = deltas.get(key, 0) + sign * counter.contribution(row)
+
+def _maintain_counters(source):
+    """Enregistre les listeners qui tiennent à jour les compteurs alimentés par source"""
+    counters = [counter for counter in COUNTERS if counter.source is source]
+    names = _counted_names(counters)
+
+    @event.listens_for(source, 'after_insert')
+    def count_inserted(mapper, connection, target):
+        deltas = {}
+        _add_contributions(deltas, counters, target, 1)
+        _apply_deltas(connection, target, deltas)
+
+    @event.listens_for(source, 'before_update')
+    def recount_updated(mapper, connection, target):
+        # L'ancienne contribution est relue en base: la valeur précédente
+        # d'un attribut modifié n'est pas toujours chargée
+        attrs = inspect(target).attrs
+        if not any(attrs[name].history.has_changes() for name in names):
+            return
+        deltas = {}
+        previous = _stored_row(connection, source, target.id, names)
+        if previous is not None:
+            _add_contributions(deltas, counters, previous, -1)
+        _add_contributions(deltas, counters, target, 1)
+        _apply_deltas(connection, target, deltas)
+
+    @event.listens_for(source, 'before_delete')
+    def uncount_deleted(mapper, connection, target):
+        previous = _stored_row(connection, source, target.id, names)
+        if previous is not None:
+            deltas = {}
+            _add_contributions(deltas, counters, previous, -1)
+            _apply_deltas(connection, target, deltas)
+
+for _source in (Reservation, Trajet, Evaluation):
+    _maintain_counters(_source)
+
+@event.listens_for(Session, 'after_flush')
+def expire_recounted(session, flush_context):
+    """Les compteurs modifiés en SQL seront relus au prochain accès"""
+    for model, row_id, column in session.info.pop(RECOUNTED_KEY, None) or ():
+        instance = session.identity_map.get(inspect(model).identity_key_from_primary_key((row_id,)))
+        if instance is not None:
+            session.expire(instance, [column, 'updated_at'])
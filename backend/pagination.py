@@ -0,0 +1,179 @@
+# backend/pagination.py
+"""
+Pagination par curseur (keyset).
+
+Au lieu d'un OFFSET, chaque page reprend après la dernière ligne de la
+précédente: la requête suit un index composite (created_at, id) ou
+(clé de tri, id) et coûte la même chose quelle que soit la profondeur. Le curseur transmis au client
+est un jeton opaque encodant la position de cette dernière ligne.
+
+Les lignes sans valeur de tri (NULL) viennent après toutes les autres,
+par id, comme avec la pagination par numéro de page: l'ordre complet est
+(colonne IS NULL, colonne, id). Chaque segment est lu par sa propre
+requête, qui suit le même index.
+"""
+import base64
+from datetime import date, datetime
+import json
+
+from sqlalchemy import text, tuple_
+
+from backend.extensions import db
+
+
+class InvalidCursor(ValueError):
+    """Curseur de pagination illisible ou altéré"""
+
+
+def encode_cursor(value, row_id, key=None):
+    """
+    Jeton opaque (base64 URL) de la position (valeur de tri, id); key est
+    le nom du tri, vérifié au décodage. value vaut None dans le segment
+    des lignes sans valeur de tri.
+    """
+    payload = {'i': row_id}
+    if isinstance(value, datetime):
+        payload['c'] = value.isoformat()
+    elif isinstance(value, date):
+        payload['d'] = value.isoformat()
+    else:
+        payload['v'] = value
+    if key is not None:
+        payload['k'] = key
+    payload = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, key=None):
+    """
+    Position (valeur de tri, id) d'un jeton; lève InvalidCursor s'il est
+    invalide ou s'il a été émis pour un autre tri que key.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if payload.get('k') != key:
+            raise InvalidCursor("Curseur émis pour un autre tri")
+        if 'c' in payload:
+            value = datetime.fromisoformat(payload['c'])
+        elif 'd' in payload:
+            value = date.fromisoformat(payload['d'])
+        else:
+            value = payload['v']
+            if value is not None and (not isinstance(value, (int, float)) or isinstance(value, bool)):
+                raise InvalidCursor("Valeur de tri invalide")
+        return value, int(payload['i'])
+    except (ValueError, TypeError, KeyError, AttributeError, UnicodeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def keyset_page(query, model, per_page, cursor=None, column=None, descending=True, key=None):
+    """
+    Page suivant `cursor` (None pour la première), triée selon (column, id),
+    par défaut du plus récent au plus ancien selon created_at, puis les
+    lignes sans valeur pour column, par id dans le même sens. key nomme le
+    tri dans le curseur. Retourne (lignes, curseur suivant ou None).
+    """
+    per_page = max(per_page, 1)
+    if column is None:
+        column = model.created_at
+    value = row_id = None
+    if cursor:
+        value, row_id = decode_cursor(cursor, key)
+    order_id = model.id.desc() if descending else model.id.asc()
+
+    rows = []
+    if row_id is None or value is not None:
+        valued = query.filter(column.isnot(None))
+        if row_id is not None:
+            position = tuple_(column, model.id)
+            after = tuple_(value, row_id)
+            valued = valued.filter(position < after if descending else position > after)
+        valued = valued.order_by(column.desc() if descending else column.asc(), order_id)
+        rows = valued.limit(per_page + 1).all()
+
+    if len(rows) <= per_page:
+        # Fin des lignes valuées: suite dans le segment NULL
+        nulls = query.filter(column.is_(None))
+        if row_id is not None and value is None:
+            nulls = nulls.filter(model.id < row_id if descending else model.id > row_id)
+        rows += nulls.order_by(order_id).limit(per_page + 1 - len(rows)).all()
+    if len(rows) <= per_page:
+        return rows, None
+
+    rows = rows[:per_page]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, column.key), last.id, key)
+
+
+def estimate_count(model):
+    """
+    Estimation peu coûteuse du nombre de lignes d'une table: statistiques
+    du planificateur sous PostgreSQL, plus grand id ailleurs. Elle ignore
+    tout filtre: ce n'est pas le total d'une liste filtrée.
+    """
+    table = model.__tablename__
+    if db.engine.dialect.name == 'postgresql':
+        estimate = db.session.execute(
+            text('SELECT reltuples FROM pg_class WHERE relname = :table'),
+            {'table': table}
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    return db.session.query(db.func.max(model.id)).scalar() or 0
+
+
+def keyset_page_positions(positions, per_page, cursor=None, descending=True, key=None):
+    """
+    Équivalent de keyset_page sur des positions (valeur de tri, id) déjà
+    chargées. Retourne (ids de la page, curseur suivant ou None).
+    """
+    per_page = max(per_page, 1)
+    valued = sorted((position for position in positions if position[0] is not None), reverse=descending)
+    nulls = sorted((position for position in positions if position[0] is None), reverse=descending)
+    if cursor:
+        value, row_id = decode_cursor(cursor, key)
+        if value is None:
+            valued = []
+            nulls = [
+                position for position in nulls
+                if (position[1] < row_id if descending else position[1] > row_id)
+            ]
+        else:
+            try:
+                valued = [
+                    position for position in valued
+                    if (position < (value, row_id) if descending else position > (value, row_id))
+                ]
+            except TypeError as e:
+                raise InvalidCursor(str(e))
+    positions = valued + nulls
+
+    page = positions[:per_page]
+    next_cursor = None
+    if len(positions) > per_page:
+        next_cursor = encode_cursor(page[-1][0], page[-1][1], key)
+    return [row_id for _, row_id in page], next_cursor
+
+
+def offset_page_positions(positions, page, per_page, descending=False):
+    """
+    Page numéro page de positions (valeur de tri, id) déjà chargées, les
+    lignes sans valeur en dernier. Retourne (ids de la page, pagination)
+    avec les champs de Flask-SQLAlchemy.
+    """
+    page = max(page, 1)
+    per_page = max(per_page, 1)
+    ordered = sorted((position for position in positions if position[0] is not None), reverse=descending)
+    ordered += sorted(position for position in positions if position[0] is None)
+    total = len(ordered)
+    pages = -(-total // per_page)
+    start = (page - 1) * per_page
+    return [row_id for _, row_id in ordered[start:start + per_page]], {
+        "page": page,
+        "pages": pages,
+        "per_page": per_page,
+        "total": total,
+        "has_next": page < pages,
+        "has_prev": page > 1
+    }
@@ -0,0 +1,199 @@
+# backend/passenger_index.py
+"""
+Index des passagers pour le matching inversé.
+
+Chaque passager ayant des préférences horaires est rangé par identifiants
+de tokens de son point de départ, par trigrammes de ce lieu, par position
+dans une grille spatiale et par heure préférée (bits de son masque
+horaire). find_reverse_matches sonde cet index pour chaque trajet du
+conducteur au lieu de croiser tous les trajets avec tous les passagers.
+"""
+from collections import defaultdict, namedtuple
+import logging
+import threading
+import time
+
+from flask import current_app, has_app_context
+
+from backend.extensions import db
+from backend.geo import GridIndex
+from backend.horaires import mask_to_hours, parse_preference_mask
+from backend.locations import TrigramIndex, location_token_ids
+from backend.matching_index import DEFAULT_REFRESH_SECONDS, GEO_MATCH_RADIUS_KM
+from backend.models import User
+
+logger = logging.getLogger(__name__)
+
+PassengerEntry = namedtuple('PassengerEntry', [
+    'id', 'token_ids', 'point_depart', 'horaires', 'horaires_mask',
+    'latitude', 'longitude'
+])
+
+
+class PassengerIndex:
+    """
+    Index inversé des passagers dont les horaires sont renseignés: sans
+    horaires, un passager ne peut pas atteindre le seuil du matching inversé.
+
+    Comme l'index des trajets, il est alimenté par les routes qui modifient
+    les profils et reconstruit périodiquement depuis la base.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}  # user_id -> PassengerEntry
+        self._by_token = defaultdict(set)
+        self._by_hour = defaultdict(set)
+        self._by_location = defaultdict(set)  # point_depart -> user_ids
+        self._trigrams = TrigramIndex()
+        self._grid = GridIndex()
+        self._built_at = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id):
+        return self._entries.get(user_id)
+
+    def _insert(self, user_id, role, point_depart, horaires, horaires_mask, latitude, longitude):
+        self._discard(user_id)
+        if role != 'passager' or not horaires:
+            return
+
+        if horaires_mask is None:
+            horaires_mask = parse_preference_mask(horaires)
+        token_ids = location_token_ids(point_depart)
+
+        self._entries[user_id] = PassengerEntry(
+            user_id, token_ids, point_depart, horaires, horaires_mask, latitude, longitude
+        )
+        for token_id in token_ids:
+            self._by_token[token_id].add(user_id)
+        for hour in mask_to_hours(horaires_mask):
+            self._by_hour[hour].add(user_id)
+        if point_depart:
+            self._by_location[point_depart].add(user_id)
+            self._trigrams.add(point_depart)
+        if latitude is not None and longitude is not None:
+            self._grid.add(user_id, latitude, longitude)
+
+    @staticmethod
+    def _discard_from(buckets, key, user_id):
+        """Retire user_id d'un bucket; retourne True si le bucket est supprimé"""
+        bucket = buckets.get(key)
+        if bucket is None:
+            return False
+        bucket.discard(user_id)
+        if bucket:
+            return False
+        del buckets[key]
+        return True
+
+    def _discard(self, user_id):
+        entry = self._entries.pop(user_id, None)
+        if entry is None:
+            return
+
+        for token_id in entry.token_ids:
+            self._discard_from(self._by_token, token_id, user_id)
+        for hour in mask_to_hours(entry.horaires_mask):
+            self._discard_from(self._by_hour, hour, user_id)
+        if entry.point_depart and self._discard_from(self._by_location, entry.point_depart, user_id):
+            self._trigrams.remove(entry.point_depart)
+        self._grid.remove(user_id)
+
+    def add(self, user):
+        """Ajoute, met à jour ou retire (s'il n'est plus éligible) un utilisateur"""
+        with self._lock:
+            self._insert(user.id, user.role, user.point_depart, user.horaires,
+                         user.horaires_mask, user.latitude, user.longitude)
+
+    def remove(self, user_id):
+        """Retire un utilisateur de l'index"""
+        with self._lock:
+            self._discard(user_id)
+
+    def clear(self):
+        """Vide l'index (il sera reconstruit au prochain accès)"""
+        with self._lock:
+            self._entries.clear()
+            self._by_token.clear()
+            self._by_hour.clear()
+            self._by_location.clear()
+            self._trigrams.clear()
+            self._grid.clear()
+            self._built_at = None
+
+    def invalidate(self):
+        """Force une reconstruction au prochain accès"""
+        self._built_at = None
+
+    def rebuild(self):
+        """Reconstruit l'index à partir de la base de données"""
+        rows = db.session.query(
+            User.id,
+            User.role,
+            User.point_depart,
+            User.horaires,
+            User.horaires_mask,
+            User.latitude,
+            User.longitude
+        ).filter(
+            User.role == 'passager',
+            User.horaires.isnot(None),
+            User.horaires != ''
+        ).all()
+
+        with self._lock:
+            self.clear()
+            for row in rows:
+                self._insert(*row)
+            self._built_at = time.monotonic()
+
+        logger.info(f"Index des passagers reconstruit: {len(self._entries)} passagers")
+
+    def ensure_fresh(self):
+        """Reconstruit l'index s'il est vide ou trop ancien"""
+        refresh_seconds = DEFAULT_REFRESH_SECONDS
+        if has_app_context():
+            refresh_seconds = current_app.config.get('MATCHING_INDEX_REFRESH_SECONDS', refresh_seconds)
+
+        built_at = self._built_at
+        if built_at is None or time.monotonic() - built_at > refresh_seconds:
+            self.rebuild()
+
+    def near_location(self, point_depart, coordinates, min_geo):
+        """
+        Passagers dont le score géographique avec ce point de départ peut
+        dépasser min_geo: token commun, trigrammes proches d'au moins
+        min_geo, ou distance inférieure à GEO_MATCH_RADIUS_KM * (1 - min_geo).
+        Un lieu qui n'est proche que par inclusion d'une sous-chaîne, sans
+        token commun ni trigrammes proches, n'est pas retenu.
+        """
+        self.ensure_fresh()
+
+        result = set()
+        with self._lock:
+            for token_id in location_token_ids(point_depart):
+                result.update(self._by_token.get(token_id, ()))
+            if point_depart:
+                for location, _ in self._trigrams.search(point_depart, threshold=min_geo):
+                    result.update(self._by_location.get(location, ()))
+            if coordinates is not None:
+                radius_km = GEO_MATCH_RADIUS_KM * (1 - min_geo)
+                result.update(user_id for user_id, _ in self._grid.within(*coordinates, radius_km))
+        return result
+
+    def preferring_hours(self, hours):
+        """Passagers dont au moins une heure préférée figure dans hours"""
+        self.ensure_fresh()
+
+        result = set()
+        with self._lock:
+            for hour in hours:
+                result.update(self._by_hour.get(hour, ()))
+        return result
+
+
+# Index partagé par les blueprints du processus courant
+passenger_index = PassengerIndex()
@@ -0,0 +1,252 @@
+# backend/passwords.py
+"""
+Hachage des mots de passe.
+
+Le coût d'un hachage (scrypt par défaut, pbkdf2 ou bcrypt) est réglé par
+PASSWORD_HASH_ALGORITHM et PASSWORD_HASH_COST. Les formats restent ceux de
+Werkzeug pour scrypt et pbkdf2 (method$sel$hash) et le format $2b$ pour
+bcrypt: les mots de passe déjà enregistrés restent vérifiables. Lorsqu'un
+mot de passe vérifié a été haché avec d'autres paramètres, User.check_password
+le rehache avec les paramètres courants.
+
+Les hachages s'exécutent dans un pool borné (threads par défaut: hashlib et
+bcrypt relâchent le GIL; processus avec PASSWORD_HASH_EXECUTOR=process).
+Au plus PASSWORD_HASH_MAX_PENDING hachages sont en cours ou en attente: au
+delà, PasswordHashingBusy (503) est levée immédiatement, si bien qu'une
+rafale de connexions ne retient pas tous les threads des workers sur le CPU.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+import multiprocessing
+import os
+import threading
+
+from werkzeug.exceptions import ServiceUnavailable
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import bcrypt
+except ImportError:  # bcrypt est optionnel: algorithmes de Werkzeug uniquement
+    bcrypt = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ALGORITHM = 'scrypt'
+
+# Coût par défaut: N de scrypt, itérations de pbkdf2, rounds de bcrypt
+DEFAULT_COSTS = {'scrypt': 32768, 'pbkdf2': 600000, 'bcrypt': 12}
+
+# Délai suggéré (Retry-After) au client refusé lorsque la file est pleine
+BUSY_RETRY_AFTER_SECONDS = 1
+
+# bcrypt ne prend en compte que les 72 premiers octets du mot de passe
+BCRYPT_MAX_BYTES = 72
+
+
+class PasswordHashingBusy(ServiceUnavailable):
+    """File des hachages pleine: la requête est refusée plutôt que mise en attente"""
+
+    description = "Service momentanément surchargé, veuillez réessayer."
+
+
+def _bcrypt_secret(password):
+    return password.encode('utf-8')[:BCRYPT_MAX_BYTES]
+
+
+def hash_password(algorithm, cost, password):
+    """Hache un mot de passe (fonction de module: exécutable dans un processus du pool)"""
+    if algorithm == 'bcrypt':
+        return bcrypt.hashpw(_bcrypt_secret(password), bcrypt.gensalt(rounds=cost)).decode('ascii')
+    return generate_password_hash(password, method=werkzeug_method(algorithm, cost))
+
+
+def verify_password(stored, password):
+    """Vérifie un mot de passe contre un hachage de l'un des formats reconnus"""
+    if not stored:
+        return False
+    if stored.startswith('$2'):
+        if bcrypt is None:
+            logger.error("Hachage bcrypt enregistré mais le paquet bcrypt n'est pas installé")
+            return False
+        return bcrypt.checkpw(_bcrypt_secret(password), stored.encode('ascii'))
+    return check_password_hash(stored, password)
+
+
+def werkzeug_method(algorithm, cost):
+    """Méthode Werkzeug correspondant à l'algorithme et au coût"""
+    if algorithm == 'scrypt':
+        return f"scrypt:{cost}:8:1"
+    if algorithm == 'pbkdf2':
+        return f"pbkdf2:sha256:{cost}"
+    raise ValueError(f"Algorithme de hachage inconnu: {algorithm}")
+
+
+class PasswordHasher:
+    """Algorithme et coût courants du hachage des mots de passe"""
+
+    def __init__(self, algorithm=DEFAULT_ALGORITHM, cost=None):
+        if algorithm not in DEFAULT_COSTS:
+            raise ValueError(f"Algorithme de hachage inconnu: {algorithm}")
+        if algorithm == 'bcrypt' and bcrypt is None:
+            raise RuntimeError("PASSWORD_HASH_ALGORITHM=bcrypt requiert le paquet bcrypt")
+        self.algorithm = algorithm
+        self.cost = int(cost or DEFAULT_COSTS[algorithm])
+
+    def needs_rehash(self, stored):
+        """Le hachage a-t-il été produit avec d'autres paramètres que les courants?"""
+        if not stored:
+            return True
+        if stored.startswith('$2'):
+            parts = stored.split('$')
+            return self.algorithm != 'bcrypt' or len(parts) < 3 or parts[2] != f"{self.cost:02d}"
+        if self.algorithm == 'bcrypt':
+            return True
+        return stored.split('$', 1)[0] != werkzeug_method(self.algorithm, self.cost)
+
+
+class PasswordService:
+    """Hachages exécutés dans un pool borné (voir le docstring du module)"""
+
+    def __init__(self):
+        self.hasher = PasswordHasher()
+        self.workers = 0
+        self.max_pending = 0
+        self.executor_kind = 'thread'
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+        # Compteurs mis à jour par les threads des requêtes: verrou distinct de celui du pool
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        with self._stats_lock:
+            self.hashed = 0
+            self.verified = 0
+            self.rehashed = 0
+            self.rejected = 0
+            self.pending = 0
+
+    def _count(self, counter, delta=1):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + delta)
+
+    def configure(self, hasher, workers=0, max_pending=None, executor_kind='thread'):
+        """Sans workers, les hachages s'exécutent directement dans le thread appelant"""
+        self.shutdown()
+        self.hasher = hasher
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+        self.executor_kind = executor_kind
+        self._slots = threading.BoundedSemaphore(self.max_pending) if workers > 0 else None
+        self._reset_stats()
+
+    def _get_executor(self):
+        # Créé au premier hachage: un worker forké ne réutilise pas le pool du parent
+        with self._lock:
+            if self._executor is None:
+                if self.executor_kind == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='password-hash'
+                    )
+            return self._executor
+
+    def _run(self, fn, *args):
+        if self._slots is None:
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            self._count('rejected')
+            raise PasswordHashingBusy(retry_after=BUSY_RETRY_AFTER_SECONDS)
+        self._count('pending')
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            self._count('pending', -1)
+            self._slots.release()
+
+    def hash(self, password):
+        self._count('hashed')
+        return self._run(hash_password, self.hasher.algorithm, self.hasher.cost, password)
+
+    def verify(self, stored, password):
+        self._count('verified')
+        return self._run(verify_password, stored, password)
+
+    def rehash(self, stored, password):
+        """
+        Nouveau hachage d'un mot de passe vérifié si stored a été produit avec
+        d'autres paramètres que les courants; None sinon, ou si la file est
+        pleine (le rehachage attendra la connexion suivante).
+        """
+        if not self.hasher.needs_rehash(stored):
+            return None
+        try:
+            rehashed = self.hash(password)
+        except PasswordHashingBusy:
+            return None
+        self._count('rehashed')
+        return rehashed
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'algorithm': self.hasher.algorithm,
+                'cost': self.hasher.cost,
+                'executor': self.executor_kind if self.workers > 0 else 'inline',
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'hashed': self.hashed,
+                'verified': self.verified,
+                'rehashed': self.rehashed,
+                'rejected': self.rejected,
+            }
+
+
+# Service partagé par les requêtes du processus courant
+password_service = PasswordService()
+
+
+def init_passwords(app):
+    """
+    Configure l'algorithme, le coût et le pool des hachages.
+    PASSWORD_HASH_WORKERS vaut par défaut le nombre de cœurs; 0 hache dans
+    le thread de la requête. Les processus du pool n'en créent pas d'autre.
+    """
+    workers = app.config.get('PASSWORD_HASH_WORKERS')
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if multiprocessing.parent_process() is not None:
+        workers = 0
+
+    password_service.configure(
+        PasswordHasher(
+            app.config.get('PASSWORD_HASH_ALGORITHM', DEFAULT_ALGORITHM),
+            app.config.get('PASSWORD_HASH_COST'),
+        ),
+        workers=workers,
+        max_pending=app.config.get('PASSWORD_HASH_MAX_PENDING'),
+        executor_kind=app.config.get('PASSWORD_HASH_EXECUTOR', 'thread'),
+    )
+    @app.errorhandler(PasswordHashingBusy)
+    def password_hashing_busy(error):
+        return {"error": error.description}, 503, {'Retry-After': str(BUSY_RETRY_AFTER_SECONDS)}
+
+    logger.info(
+        f"Hachage des mots de passe: {password_service.hasher.algorithm} "
+        f"(coût {password_service.hasher.cost}, {workers} workers)"
+    )
+    return password_service
+
+
+def password_metrics():
+    """Compteurs du hachage des mots de passe"""
+    return password_service.stats()
@@ -0,0 +1,156 @@
+# backend/rate_limit.py
+"""
+Stockage des limites de taux partagé entre workers, précédé d'un bucket local.
+
+Flask-Limiter compte les requêtes d'une clé (limite + IP) par fenêtre fixe
+dans le stockage configuré (RATELIMIT_STORAGE_URI). Avec un stockage
+partagé comme Redis, chaque requête coûterait un aller-retour réseau.
+LocalBucketStorage, enregistré sous les schémas bucket+<schéma> (par
+exemple bucket+redis://localhost:6379/0), réserve à la place un bloc de
+jetons d'un seul INCR sur le stockage partagé et les consomme localement:
+- un bloc vaut RATELIMIT_LEASE_FRACTION de la limite, répartie entre les
+  RATELIMIT_WORKERS processus (au moins un jeton), si bien que les limites
+  strictes (5 par minute sur /login) restent vérifiées à chaque requête et
+  que les limites larges sont synchronisées par lots;
+- chaque jeton porte son rang dans la fenêtre partagée, comparé à la
+  limite comme le ferait le stockage partagé: la limite tient pour
+  l'ensemble des workers;
+- une fois la limite atteinte, les requêtes de la clé sont refusées
+  localement jusqu'à la fin de la fenêtre, sans accès au stockage.
+Les jetons réservés mais inutilisés d'un worker comptent dans la fenêtre:
+au pire, une clé est refusée un bloc par worker avant la limite, soit
+RATELIMIT_LEASE_FRACTION de la limite au total.
+"""
+import threading
+import time
+
+from limits.storage import Storage, storage_from_string
+
+# Part de la limite réservée par un worker à chaque synchronisation
+DEFAULT_LEASE_FRACTION = 0.1
+
+# Intervalle de suppression des buckets dont la fenêtre est écoulée
+SWEEP_INTERVAL_SECONDS = 60
+
+# Granularités des clés limits: <namespace>/<identifiants>/<quantité>/<multiple>/<granularité>
+GRANULARITIES = {'second', 'minute', 'hour', 'day', 'month', 'year'}
+
+
+def limit_amount(key):
+    """Quantité autorisée par la limite d'une clé, None si la clé n'est pas reconnue"""
+    parts = key.rsplit('/', 3)
+    if len(parts) == 4 and parts[3] in GRANULARITIES and parts[1].isdigit():
+        return int(parts[1])
+    return None
+
+
+class Lease:
+    """Jetons [next, end] réservés dans la fenêtre partagée d'une clé"""
+
+    __slots__ = ('next', 'end', 'expires_at')
+
+    def __init__(self, start, end, expires_at):
+        self.next = start
+        self.end = end
+        self.expires_at = expires_at
+
+
+class LocalBucketStorage(Storage):
+    """Stockage limits délégant à un stockage partagé par blocs de jetons"""
+
+    STORAGE_SCHEME = [
+        'bucket+memory', 'bucket+redis', 'bucket+rediss', 'bucket+redis+unix',
+        'bucket+redis+cluster', 'bucket+redis+sentinel', 'bucket+memcached',
+    ]
+
+    def __init__(self, uri, wrap_exceptions=False, lease_fraction=DEFAULT_LEASE_FRACTION, workers=1,
+                 **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions)
+        self.shared = storage_from_string(uri.split('+', 1)[1], wrap_exceptions=wrap_exceptions, **options)
+        self.lease_fraction = float(lease_fraction)
+        self.workers = max(1, int(workers))
+        self._leases = {}
+        self._lock = threading.Lock()
+        self._swept_at = time.time()
+        self.local_hits = 0
+        self.shared_hits = 0
+
+    @property
+    def base_exceptions(self):
+        return self.shared.base_exceptions
+
+    def _lease_size(self, limit, amount):
+        if limit is None:
+            return amount
+        # Jetons inutilisés bornés à lease_fraction de la limite pour l'ensemble des workers
+        return max(amount, int(limit * self.lease_fraction / self.workers))
+
+    def _sweep(self, now):
+        if now - self._swept_at < SWEEP_INTERVAL_SECONDS:
+            return
+        for key in [key for key, lease in self._leases.items() if lease.expires_at <= now]:
+            del self._leases[key]
+        self._swept_at = now
+
+    def incr(self, key, expiry, amount=1, **options):
+        """Rang du dernier des amount jetons consommés dans la fenêtre partagée de la clé"""
+        now = time.time()
+        limit = limit_amount(key)
+        with self._lock:
+            lease = self._leases.get(key)
+            if lease is not None and lease.expires_at > now:
+                count = lease.next + amount - 1
+                if count <= lease.end:
+                    lease.next += amount
+                    self.local_hits += 1
+                    return count
+                if limit is not None and lease.end >= limit:
+                    # Fenêtre épuisée pour tous les workers: refus sans aller-retour
+                    self.local_hits += 1
+                    return count
+
+        size = self._lease_size(limit, amount)
+        end = self.shared.incr(key, expiry, amount=size, **options)
+        start = end - size + 1
+        # Le premier bloc ouvre la fenêtre; sinon son échéance est lue une fois
+        expires_at = now + expiry if start == 1 else self.shared.get_expiry(key)
+
+        with self._lock:
+            self._leases[key] = Lease(start + amount, end, expires_at)
+            self.shared_hits += 1
+            self._sweep(now)
+        return start + amount - 1
+
+    def get(self, key):
+        return self.shared.get(key)
+
+    def get_expiry(self, key):
+        return self.shared.get_expiry(key)
+
+    def check(self):
+        return self.shared.check()
+
+    def reset(self):
+        with self._lock:
+            self._leases.clear()
+        return self.shared.reset()
+
+    def clear(self, key):
+        with self._lock:
+            self._leases.pop(key, None)
+        return self.shared.clear(key)
+
+
+def init_rate_limit(app, limiter):
+    """
+    Initialise Flask-Limiter sur le stockage de RATELIMIT_STORAGE_URI, en
+    passant RATELIMIT_LEASE_FRACTION et RATELIMIT_WORKERS au bucket local
+    s'il est utilisé.
+    """
+    uri = app.config.get('RATELIMIT_STORAGE_URI') or 'memory://'
+    if uri.startswith('bucket+'):
+        options = dict(app.config.get('RATELIMIT_STORAGE_OPTIONS') or {})
+        options.setdefault('lease_fraction', app.config.get('RATELIMIT_LEASE_FRACTION', DEFAULT_LEASE_FRACTION))
+        options.setdefault('workers', app.config.get('RATELIMIT_WORKERS', 1))
+        app.config['RATELIMIT_STORAGE_OPTIONS'] = options
+    limiter.init_app(app)
@@ -0,0 +1,456 @@
+# backend/revocation.py
+"""
+Révocation des JWT.
+
+Un token révoqué (déconnexion) est conservé par un backend jusqu'à son
+expiration, après quoi le décodage du JWT le rejette de toute façon:
+- 'memory': dictionnaire jti -> expiration du processus courant, purgé par
+  un tas des expirations (développement, tests);
+- 'database': table revoked_tokens, partagée par les workers et persistante;
+- 'redis': une clé par jti expirant avec le token, et un stream des
+  révocations pour la synchronisation des workers.
+
+check_if_token_revoked interroge d'abord un filtre de Bloom local: la
+grande majorité des tokens, jamais révoqués, sont acceptés sans accès au
+backend; seul un token présent dans le filtre (révoqué ou faux positif)
+est confirmé par le backend. Le filtre est découpé par tranche
+d'expiration: une tranche dont tous les tokens ont expiré est supprimée,
+ce qui borne la mémoire au nombre de tranches couvrant la durée de vie
+maximale d'un token.
+
+Chaque processus ajoute à son filtre les révocations faites par les autres
+en lisant, au plus une fois toutes les REVOCATION_SYNC_SECONDS, les
+révocations apparues depuis la lecture précédente. Une déconnexion prend
+donc effet immédiatement dans son processus et en au plus ce délai dans
+les autres.
+
+Si le backend est injoignable, les requêtes authentifiées continuent d'être
+servies avec le dernier état du filtre: un token absent du filtre est
+accepté, un token présent est refusé faute de confirmation. Les erreurs
+sont journalisées et comptées dans les métriques.
+"""
+from datetime import datetime, timedelta
+import hashlib
+import heapq
+import logging
+import math
+import threading
+import time
+
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from backend.extensions import db
+from backend.models import RevokedToken
+
+try:
+    import redis
+except ImportError:  # redis est optionnel: backends mémoire et base de données
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Dimensionnement par défaut d'une tranche du filtre de Bloom
+DEFAULT_BLOOM_CAPACITY = 10000
+DEFAULT_BLOOM_ERROR_RATE = 0.001
+DEFAULT_BUCKET_SECONDS = 86400
+DEFAULT_SYNC_SECONDS = 1.0
+
+# Durée de conservation d'un token sans expiration
+DEFAULT_RETENTION_SECONDS = 30 * 86400
+
+# Intervalle entre deux purges des révocations expirées
+PURGE_INTERVAL_SECONDS = 600
+
+# Fenêtre relue à chaque synchronisation en base: couvre les transactions
+# validées dans le désordre de leurs ids et le décalage d'horloge des workers
+SYNC_OVERLAP_SECONDS = 60
+
+
+class BloomFilter:
+    """Filtre de Bloom dimensionné pour capacity éléments au taux de faux positifs donné"""
+
+    def __init__(self, capacity=DEFAULT_BLOOM_CAPACITY, error_rate=DEFAULT_BLOOM_ERROR_RATE):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hachage: k positions dérivées de deux valeurs de 64 bits
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def _is_set(self, position):
+        return self.bits[position >> 3] & (1 << (position & 7))
+
+    def add(self, key):
+        positions = self._positions(key)
+        if all(self._is_set(position) for position in positions):
+            return  # Déjà présent (ou indiscernable): le taux estimé ne change pas
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self._is_set(position) for position in self._positions(key))
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+    def error_rate(self):
+        """Taux de faux positifs estimé pour le nombre d'éléments ajoutés"""
+        return (1 - math.exp(-self.hash_count * self.count / self.size)) ** self.hash_count
+
+
+class ExpiringBloomFilter:
+    """Filtres de Bloom par tranche d'expiration, supprimés une fois la tranche expirée"""
+
+    def __init__(self, bucket_seconds=DEFAULT_BUCKET_SECONDS, capacity=DEFAULT_BLOOM_CAPACITY,
+                 error_rate=DEFAULT_BLOOM_ERROR_RATE):
+        self.bucket_seconds = bucket_seconds
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._buckets = {}
+
+    def _bucket(self, expires_at):
+        return int(expires_at // self.bucket_seconds)
+
+    def add(self, jti, expires_at):
+        bucket = self._bucket(expires_at)
+        bloom = self._buckets.get(bucket)
+        if bloom is None:
+            bloom = self._buckets[bucket] = BloomFilter(self.capacity, self.error_rate)
+        bloom.add(jti)
+
+    def might_contain(self, jti, expires_at):
+        bloom = self._buckets.get(self._bucket(expires_at))
+        return bloom is not None and jti in bloom
+
+    def prune(self, now):
+        """Supprime les tranches dont tous les tokens ont expiré"""
+        for bucket in [bucket for bucket in self._buckets if (bucket + 1) * self.bucket_seconds <= now]:
+            del self._buckets[bucket]
+
+    def stats(self):
+        blooms = list(self._buckets.values())
+        return {
+            'buckets': len(blooms),
+            'items': sum(bloom.count for bloom in blooms),
+            'bytes': sum(bloom.nbytes for bloom in blooms),
+            'max_error_rate': round(max((bloom.error_rate() for bloom in blooms), default=0.0), 6),
+        }
+
+
+class MemoryRevocationBackend:
+    """Révocations du processus courant, purgées à leur expiration"""
+
+    name = 'memory'
+
+    def __init__(self):
+        self._expiry = {}
+        self._heap = []
+        self._lock = threading.Lock()
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._expiry[jti] = expires_at
+            heapq.heappush(self._heap, (expires_at, jti))
+
+    def contains(self, jti, now):
+        expires_at = self._expiry.get(jti)
+        return expires_at is not None and expires_at > now
+
+    def changes(self, cursor, now):
+        # Seul ce processus révoque: ses révocations sont déjà dans le filtre
+        return [], cursor
+
+    def purge(self, now):
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires_at, jti = heapq.heappop(self._heap)
+                if self._expiry.get(jti) == expires_at:
+                    del self._expiry[jti]
+
+    def count(self):
+        return len(self._expiry)
+
+
+class DatabaseRevocationBackend:
+    """Révocations dans la table revoked_tokens, hors de la session de la requête"""
+
+    name = 'database'
+
+    def add(self, jti, expires_at):
+        table = RevokedToken.__table__
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(table.insert().values(
+                    jti=jti, expires_at=datetime.utcfromtimestamp(expires_at), revoked_at=datetime.utcnow()
+                ))
+        except IntegrityError:
+            pass  # Déjà révoqué
+
+    def contains(self, jti, now):
+        table = RevokedToken.__table__
+        with db.engine.connect() as connection:
+            return connection.execute(
+                select(table.c.id)
+                .where(table.c.jti == jti, table.c.expires_at > datetime.utcfromtimestamp(now))
+            ).first() is not None
+
+    def changes(self, cursor, now):
+        """
+        Révocations non expirées d'id supérieur au curseur, plus celles des
+        SYNC_OVERLAP_SECONDS dernières secondes: un id plus petit peut être
+        validé après un plus grand. Le curseur est (dernier id, instant).
+        """
+        table = RevokedToken.__table__
+        last_id, last_sync = cursor or (0, None)
+        recent = table.c.id > last_id
+        if last_sync is not None:
+            recent = or_(recent, table.c.revoked_at >= datetime.utcfromtimestamp(last_sync - SYNC_OVERLAP_SECONDS))
+
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                select(table.c.id, table.c.jti, table.c.expires_at)
+                .where(recent, table.c.expires_at > datetime.utcfromtimestamp(now))
+            ).all()
+        entries = [(row.jti, (row.expires_at - datetime(1970, 1, 1)).total_seconds()) for row in rows]
+        return entries, (max([last_id] + [row.id for row in rows]), now)
+
+    def purge(self, now):
+        table = RevokedToken.__table__
+        with db.engine.begin() as connection:
+            connection.execute(delete(table).where(table.c.expires_at <= datetime.utcfromtimestamp(now)))
+
+    def count(self):
+        with db.engine.connect() as connection:
+            return connection.execute(select(func.count()).select_from(RevokedToken.__table__)).scalar()
+
+
+class RedisRevocationBackend:
+    """
+    Révocations dans Redis: une clé par jti expirant avec le token, et un
+    stream des révocations tronqué à la durée de vie maximale d'un token.
+    """
+
+    name = 'redis'
+
+    def __init__(self, client, retention_seconds=DEFAULT_RETENTION_SECONDS, prefix='roadonifri:revoked:'):
+        self.client = client
+        self.retention_seconds = retention_seconds
+        self.prefix = prefix
+        self.log_key = f"{prefix}log"
+
+    def add(self, jti, expires_at):
+        oldest = int((time.time() - self.retention_seconds) * 1000)
+        pipeline = self.client.pipeline()
+        pipeline.set(f"{self.prefix}{jti}", 1, exat=math.ceil(expires_at))
+        pipeline.xadd(self.log_key, {'jti': jti, 'exp': expires_at}, minid=oldest, approximate=True)
+        pipeline.execute()
+
+    def contains(self, jti, now):
+        return bool(self.client.exists(f"{self.prefix}{jti}"))
+
+    def changes(self, cursor, now):
+        """Entrées du stream postérieures au curseur (id du dernier élément lu)"""
+        cursor = cursor or '0'
+        entries = []
+        for _, messages in self.client.xread({self.log_key: cursor}) or ():
+            for message_id, fields in messages:
+                cursor = message_id
+                expires_at = float(fields[b'exp'])
+                if expires_at > now:
+                    entries.append((fields[b'jti'].decode('utf-8'), expires_at))
+        return entries, cursor
+
+    def purge(self, now):
+        # Les clés expirent d'elles-mêmes et le stream est tronqué à l'ajout
+        pass
+
+    def count(self):
+        return self.client.xlen(self.log_key)
+
+
+class RevocationStore:
+    """Backend de révocation précédé du filtre de Bloom du processus"""
+
+    def __init__(self):
+        self.backend = MemoryRevocationBackend()
+        self.bloom = ExpiringBloomFilter()
+        self.sync_seconds = DEFAULT_SYNC_SECONDS
+        self.retention_seconds = DEFAULT_RETENTION_SECONDS
+        self._lock = threading.Lock()
+        # Compteurs des métriques, incrémentés hors de _lock par is_revoked
+        self._stats_lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._cursor = None
+        self._synced_at = 0.0
+        self._purged_at = 0.0
+        with self._stats_lock:
+            self.checks = 0
+            self.backend_checks = 0
+            self.false_positives = 0
+            self.backend_errors = 0
+
+    def _count(self, counter):
+        with self._stats_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def configure(self, backend, bloom=None, sync_seconds=DEFAULT_SYNC_SECONDS,
+                  retention_seconds=DEFAULT_RETENTION_SECONDS):
+        with self._lock:
+            self.backend = backend
+            self.bloom = bloom or ExpiringBloomFilter()
+            self.sync_seconds = sync_seconds
+            self.retention_seconds = retention_seconds
+            self._reset()
+
+    def _expiry(self, expires_at, now):
+        return float(expires_at) if expires_at is not None else now + self.retention_seconds
+
+    def revoke(self, jti, expires_at=None):
+        """Révoque un token jusqu'à son expiration (timestamp exp du JWT)"""
+        now = time.time()
+        expires_at = self._expiry(expires_at, now)
+        if expires_at <= now:
+            return
+        self.backend.add(jti, expires_at)
+        with self._lock:
+            self.bloom.add(jti, expires_at)
+
+    def is_revoked(self, jti, expires_at=None):
+        now = time.time()
+        self._sync(now)
+        self._count('checks')
+        if not self.bloom.might_contain(jti, self._expiry(expires_at, now)):
+            return False
+
+        self._count('backend_checks')
+        try:
+            revoked = self.backend.contains(jti, now)
+        except Exception as e:
+            # Backend injoignable: le filtre signale une révocation possible, le token est refusé
+            self._count('backend_errors')
+            logger.error(f"Vérification de révocation impossible, token refusé: {str(e)}")
+            return True
+        if not revoked:
+            self._count('false_positives')
+        return revoked
+
+    def _sync(self, now):
+        """
+        Ajoute au filtre les révocations des autres processus, au plus toutes
+        les sync_seconds. Si le backend est injoignable, le filtre garde son
+        dernier état et la synchronisation est retentée à l'échéance suivante.
+        """
+        if now - self._synced_at < self.sync_seconds:
+            return
+        with self._lock:
+            if now - self._synced_at < self.sync_seconds:
+                return
+            self._synced_at = now
+            try:
+                entries, self._cursor = self.backend.changes(self._cursor, now)
+                for jti, expires_at in entries:
+                    self.bloom.add(jti, expires_at)
+                if now - self._purged_at >= PURGE_INTERVAL_SECONDS:
+                    self.backend.purge(now)
+                    self._purged_at = now
+            except Exception as e:
+                self._count('backend_errors')
+                logger.error(f"Synchronisation des révocations impossible ({self.backend.name}): {str(e)}")
+            self.bloom.prune(now)
+
+    def _revoked_count(self):
+        try:
+            return self.backend.count()
+        except Exception as e:
+            logger.error(f"Comptage des révocations impossible: {str(e)}")
+            return None
+
+    def stats(self):
+        stats = {'backend': self.backend.name, 'revoked': self._revoked_count()}
+        with self._stats_lock:
+            stats.update({
+                'checks': self.checks,
+                'backend_checks': self.backend_checks,
+                'false_positives': self.false_positives,
+                'backend_errors': self.backend_errors,
+            })
+        stats['bloom'] = self.bloom.stats()
+        return stats
+
+
+# Store partagé par les requêtes du processus courant
+revocation_store = RevocationStore()
+
+
+def revoke_token(jti, expires_at=None):
+    """Révoque un token (jti et exp du JWT)"""
+    revocation_store.revoke(jti, expires_at)
+
+
+def _seconds(value, default):
+    """Durée de config (timedelta, secondes, ou False pour sans expiration) en secondes"""
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if value is False or value is None:
+        return default
+    return float(value)
+
+
+def init_revocation(app, jwt):
+    """
+    Configure le backend selon REVOCATION_BACKEND: 'redis' (REDIS_URL),
+    'database' ou 'memory'. Sans valeur explicite, Redis est utilisé si
+    REDIS_URL est défini et le client redis installé, la base sinon.
+    Branche ensuite la vérification sur le JWTManager.
+    """
+    retention = max(
+        _seconds(app.config.get('JWT_ACCESS_TOKEN_EXPIRES'), DEFAULT_RETENTION_SECONDS),
+        _seconds(app.config.get('JWT_REFRESH_TOKEN_EXPIRES'), DEFAULT_RETENTION_SECONDS),
+    )
+    backend_name = app.config.get('REVOCATION_BACKEND')
+    redis_url = app.config.get('REVOCATION_REDIS_URL')
+    if not backend_name:
+        backend_name = 'redis' if redis_url and redis is not None else 'database'
+
+    if backend_name == 'redis':
+        if redis is None or not redis_url:
+            raise RuntimeError("REVOCATION_BACKEND=redis requiert le paquet redis et REDIS_URL")
+        backend = RedisRevocationBackend(redis.Redis.from_url(redis_url), retention_seconds=retention)
+    elif backend_name == 'database':
+        backend = DatabaseRevocationBackend()
+    else:
+        backend = MemoryRevocationBackend()
+
+    revocation_store.configure(
+        backend,
+        ExpiringBloomFilter(
+            bucket_seconds=app.config.get('REVOCATION_BUCKET_SECONDS', DEFAULT_BUCKET_SECONDS),
+            capacity=app.config.get('REVOCATION_BLOOM_CAPACITY', DEFAULT_BLOOM_CAPACITY),
+            error_rate=app.config.get('REVOCATION_BLOOM_ERROR_RATE', DEFAULT_BLOOM_ERROR_RATE),
+        ),
+        sync_seconds=app.config.get('REVOCATION_SYNC_SECONDS', DEFAULT_SYNC_SECONDS),
+        retention_seconds=retention,
+    )
+
+    @jwt.token_in_blocklist_loader
+    def check_if_token_revoked(jwt_header, jwt_payload):
+        return revocation_store.is_revoked(jwt_payload['jti'], jwt_payload.get('exp'))
+
+    logger.info(f"Révocation des tokens: {backend_name}")
+    return revocation_store
+
+
+def revocation_metrics():
+    """Compteurs de la révocation et mémoire du filtre de Bloom"""
+    return revocation_store.stats()
@@ -10,8 +10,14 @@ import logging
 
 from backend.models import User, Trajet
 from backend.schemas import UserSchema, TrajetSchema, UserRegistrationSchema, UserLoginSchema
-from backend.matching import find_matches
-from backend.extensions import db, limiter, revoke_token
+from backend.matching import find_matches, match_result_cache
+from backend.cache import cached_response
+from backend.conditional import add_validators, make_etag, not_modified
+from backend.passenger_index import passenger_index
+from backend.passwords import PasswordHashingBusy
+from backend.revocation import revoke_token
+from backend.extensions import db, limiter
+from backend.identity import current_identity
 from backend.utils import validate_email, validate_phone, send_email_notification
 
 # Configuration du logging
@@ -95,6 +101,7 @@ def inscription():
             
             db.session.add(new_user)
             db.session.commit()
+            passenger_index.add(new_user)
             
             logger.info(f"Nouvel utilisateur inscrit: {new_user.email}")
             
@@ -128,6 +135,9 @@ def inscription():
             flash(f"{error_msg}: {', '.join(e.messages.values()) if isinstance(e.messages, dict) else str(e.messages)}", "danger")
             return render_template('signup.html')
             
+        except PasswordHashingBusy:
+            raise
+            
         except Exception as e:
             logger.error(f"Erreur lors de l'inscription: {str(e)}")
             db.session.rollback()
@@ -216,6 +226,9 @@ def login():
             flash(error_msg, "danger")
             return render_template('login.html')
             
+        except PasswordHashingBusy:
+            raise
+            
         except Exception as e:
             logger.error(f"Erreur lors de la connexion: {str(e)}")
             error_msg = "Une erreur est survenue lors de la connexion."
@@ -231,9 +244,9 @@ def login():
 def logout():
     """Déconnexion de l'utilisateur"""
     try:
-        # Révocation du token
-        jti = get_jwt()['jti']
-        revoke_token(jti)
+        # Révocation du token jusqu'à son expiration
+        token = get_jwt()
+        revoke_token(token['jti'], token.get('exp'))
         
         if request.is_json:
             response = jsonify({'message': 'Déconnexion réussie'})
@@ -259,7 +272,7 @@ def refresh():
     try:
         current_user_id = get_jwt_identity()
         # Récupérer le rôle de l'utilisateur pour les claims
-        user = User.query.get(current_user_id)
+        user = current_identity()
         if not user:
             return jsonify({'error': 'Utilisateur introuvable'}), 404
             
@@ -292,7 +305,7 @@ def profile():
     """Gestion du profil utilisateur"""
     try:
         current_user_id = get_jwt_identity()
-        user = User.query.get(current_user_id)
+        user = current_identity()
         
         if not user:
             error_msg = "Utilisateur introuvable."
@@ -344,6 +357,8 @@ def profile():
             
             user.date_modification = datetime.utcnow()
             db.session.commit()
+            match_result_cache.invalidate(user.id)
+            passenger_index.add(user)
             
             logger.info(f"Profil mis à jour pour: {user.email}")
             
@@ -365,6 +380,9 @@ def profile():
             }), 400
         flash("Données invalides.", "danger")
         
+    except PasswordHashingBusy:
+        raise
+        
     except Exception as e:
         logger.error(f"Erreur lors de la mise à jour du profil: {str(e)}")
         db.session.rollback()
@@ -474,7 +492,11 @@ def trajet_detail(trajet_id):
     trajet = Trajet.query.get_or_404(trajet_id)
     
     if request.method == 'GET':
-        return jsonify({'trajet': trajet_schema.dump(trajet)}), 200
+        etag = make_etag('trajet', trajet.id, trajet.updated_at)
+        cached = not_modified(etag, trajet.updated_at)
+        if cached is not None:
+            return cached
+        return add_validators(jsonify({'trajet': trajet_schema.dump(trajet)}), etag, trajet.updated_at), 200
     
     # Vérification des permissions
     if trajet.user_id != current_user_id:
@@ -518,6 +540,7 @@ def messages():
 
 @bp.route('/api/users/<int:user_id>')
 @jwt_required()
+@cached_response(tags=lambda user_id: (f'user:{user_id}',))
 def get_user_api(user_id):
     """API pour récupérer les informations d'un utilisateur"""
     try:
@@ -0,0 +1,249 @@
+# backend/scoring.py
+"""
+Moteur de scoring vectorisé pour le matching.
+
+Les trajets actifs sont stockés en colonnes (heure, places, date de création,
+lieu de départ) et le score pondéré est calculé pour tous les candidats en
+une seule passe NumPy. Les composantes textuelles (lieu, préférences
+horaires) sont évaluées une seule fois par valeur distincte par
+backend.matching, puis diffusées sur les colonnes.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import logging
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # NumPy est optionnel: repli sur le scoring ligne à ligne
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Pondération du score de matching
+GEO_WEIGHT = 0.4
+TIME_WEIGHT = 0.3
+PLACES_WEIGHT = 0.1
+RECENCY_WEIGHT = 0.1
+ROLE_BONUS = 0.1
+
+# Seuil de pertinence d'un match
+MATCH_THRESHOLD = 0.3
+
+# Normalisation des composantes places et récence
+MAX_PLACES = 4
+RECENCY_DAYS = 30
+
+# Codes de la colonne heure: horaire absent / horaire non interprétable
+NO_HOUR = -2
+UNKNOWN_HOUR = -1
+
+# Heures extraites par le motif (\d{1,2}): 0 à 99
+HOUR_TABLE_SIZE = 100
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECONDS_PER_DAY = 86400 * 10**6
+
+
+def is_available():
+    """Indique si le moteur vectorisé peut être utilisé (NumPy installé)"""
+    return np is not None
+
+
+def to_epoch_us(value):
+    """Convertit une datetime naïve (UTC) en microsecondes depuis l'epoch"""
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 10**6 + delta.microseconds
+
+
+class TrajetColumns:
+    """
+    Instantané en colonnes des trajets disponibles.
+
+    Les lignes sont triées par id de trajet afin que les égalités de score
+    soient départagées dans le même ordre que le scoring ligne à ligne.
+    Les lieux de départ sont internés: location_ids référence locations,
+    dont chaque élément est une clé (point_depart, latitude, longitude).
+    """
+
+    def __init__(self, rows):
+        """
+        rows: itérable de tuples
+        (trajet_id, conducteur_id, location_key, hour, places, created_at)
+        """
+        rows = sorted(rows, key=lambda row: row[0])
+
+        location_ids = {}
+        self.locations = []
+        loc_column = []
+        for row in rows:
+            location = row[2]
+            loc_id = location_ids.get(location)
+            if loc_id is None:
+                loc_id = location_ids[location] = len(self.locations)
+                self.locations.append(location)
+            loc_column.append(loc_id)
+
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.conducteur_ids = np.array([row[1] for row in rows], dtype=np.int64)
+        self.location_ids = np.array(loc_column, dtype=np.int64)
+        self.hours = np.array([row[3] for row in rows], dtype=np.int64)
+        self.places = np.array([row[4] for row in rows], dtype=np.int64)
+        self.has_created = np.array([row[5] is not None for row in rows], dtype=bool)
+        self.created_us = np.array(
+            [to_epoch_us(row[5]) if row[5] is not None else 0 for row in rows],
+            dtype=np.int64
+        )
+        self._positions = {trajet_id: position for position, trajet_id in enumerate(self.ids.tolist())}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def rows_for(self, trajet_ids=None, exclude_conducteur_id=None):
+        """Positions (triées) des trajets demandés, tous les trajets si None"""
+        if trajet_ids is None:
+            rows = np.arange(len(self.ids))
+        else:
+            positions = [self._positions[t] for t in trajet_ids if t in self._positions]
+            rows = np.array(sorted(positions), dtype=np.int64)
+
+        if exclude_conducteur_id is not None and rows.size:
+            rows = rows[self.conducteur_ids[rows] != exclude_conducteur_id]
+        return rows
+
+
+class ScoredRows:
+    """Résultat d'une passe de scoring sur un ensemble de lignes"""
+
+    def __init__(self, rows, scores, geo_scores, time_scores):
+        self.rows = rows
+        self.scores = scores
+        self.geo_scores = geo_scores
+        self.time_scores = time_scores
+
+
+def build_location_table(columns, rows, similarity):
+    """
+    Évalue similarity(clé de lieu) une seule fois par lieu distinct des
+    lignes demandées. Retourne un tableau indexé par location_id (0 ailleurs).
+    """
+    table = np.zeros(len(columns.locations), dtype=np.float64)
+    for loc_id in np.unique(columns.location_ids[rows]).tolist():
+        table[loc_id] = similarity(columns.locations[loc_id])
+    return table
+
+
+def score_rows(columns, rows, geo_table, time_table, role_bonus, now=None):
+    """
+    Calcule le score pondéré des lignes demandées.
+
+    geo_table: score géographique par location_id (0 si non applicable)
+    time_table: score horaire indexé par heure + 2 (NO_HOUR, UNKNOWN_HOUR,
+                puis 0..99), ou None si l'utilisateur n'a pas d'horaires
+    """
+    now_us = to_epoch_us(now or datetime.utcnow())
+
+    geo_scores = np.asarray(geo_table, dtype=np.float64)[columns.location_ids[rows]]
+    scores = np.zeros(rows.size, dtype=np.float64)
+    scores += geo_scores * GEO_WEIGHT
+
+    if time_table is not None:
+        time_scores = np.asarray(time_table, dtype=np.float64)[columns.hours[rows] - NO_HOUR]
+        scores += time_scores * TIME_WEIGHT
+    else:
+        time_scores = np.zeros(rows.size, dtype=np.float64)
+
+    places_scores = np.minimum(columns.places[rows] / MAX_PLACES, 1.0)
+    scores += places_scores * PLACES_WEIGHT
+
+    days_ago = (now_us - columns.created_us[rows]) // MICROSECONDS_PER_DAY
+    recency_scores = np.maximum(0, 1 - (days_ago / RECENCY_DAYS))
+    scores += np.where(columns.has_created[rows], recency_scores * RECENCY_WEIGHT, 0.0)
+
+    if role_bonus:
+        scores += ROLE_BONUS
+
+    return ScoredRows(rows, scores, geo_scores, time_scores)
+
+
+def select_top(scores, limit, slack=0.0, positions=None):
+    """
+    Indices (dans scores) des meilleurs scores au-dessus du seuil, triés par
+    score décroissant puis par position (positions[i] si fourni, sinon i).
+
+    La sélection utilise argpartition. Les ex aequo du k-ième score (et tous
+    les scores à moins de `slack` de celui-ci) sont conservés afin que
+    l'appelant puisse re-trier sur un score arrondi: c'est à lui de
+    tronquer le résultat à `limit`.
+    """
+    passing = np.flatnonzero(scores > MATCH_THRESHOLD)
+    if limit is not None and passing.size > limit:
+        if limit <= 0:
+            return passing[:0]
+        passing_scores = scores[passing]
+        top = np.argpartition(-passing_scores, limit - 1)[:limit]
+        kth_score = passing_scores[top].min()
+        passing = passing[passing_scores >= kth_score - slack]
+
+    tiebreak = passing if positions is None else positions[passing]
+    order = np.lexsort((tiebreak, -scores[passing]))
+    return passing[order]
+
+
+def select_scored(scored, limit, slack=0.0):
+    """
+    Restreint un ScoredRows à ses meilleures lignes (voir select_top),
+    triées par score décroissant puis par ligne.
+    """
+    selected = select_top(scored.scores, limit, slack=slack, positions=scored.rows)
+    return ScoredRows(
+        scored.rows[selected], scored.scores[selected],
+        scored.geo_scores[selected], scored.time_scores[selected]
+    )
+
+
+def score_top(columns, rows, geo_table, time_table, role_bonus, limit, slack=0.0, now=None):
+    """Score les lignes demandées et n'en garde que les meilleures"""
+    scored = score_rows(columns, rows, geo_table, time_table, role_bonus, now=now)
+    return select_scored(scored, limit, slack=slack)
+
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def parallel_executor(workers):
+    """Pool de threads partagé du scoring parallèle (NumPy libère le GIL)"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scoring')
+            _executor_workers = workers
+        return _executor
+
+
+def score_top_parallel(columns, rows, geo_table, time_table, role_bonus, limit, slack=0.0,
+                       now=None, workers=2):
+    """
+    Variante de score_top répartissant les lignes en `workers` tranches
+    scorées en parallèle. Chaque tranche garde ses meilleures lignes (ex
+    aequo et écart `slack` compris), puis la sélection finale est refaite
+    sur leur réunion: le résultat est identique à score_top.
+    """
+    now = now or datetime.utcnow()
+
+    def score_shard(shard_rows):
+        return score_top(columns, shard_rows, geo_table, time_table, role_bonus, limit, slack=slack, now=now)
+
+    shards = [shard for shard in np.array_split(rows, workers) if shard.size]
+    parts = list(parallel_executor(workers).map(score_shard, shards))
+    merged = ScoredRows(
+        np.concatenate([part.rows for part in parts]),
+        np.concatenate([part.scores for part in parts]),
+        np.concatenate([part.geo_scores for part in parts]),
+        np.concatenate([part.time_scores for part in parts])
+    )
+    return select_scored(merged, limit, slack=slack)
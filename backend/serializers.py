@@ -0,0 +1,168 @@
+# backend/serializers.py
+"""
+Sérialisation groupée des listes de modèles.
+
+Les fonctions serialize_* prennent une liste d'objets ou d'ids, chargent
+les lignes manquantes et les relations demandées (conducteur, trajet,
+passager, expéditeur) par requêtes IN groupées, puis produisent des dicts
+simples: le nombre de requêtes ne dépend pas de la taille de la liste.
+Les agrégats (places réservées, notes, trajets complétés) sont des
+colonnes maintenues (voir backend.counters) et ne coûtent aucune requête.
+Les dates restent des objets date / datetime: le fournisseur JSON de
+l'application (voir backend.json_provider) les encode en ISO 8601. dumps
+encode le résultat en JSON une fois pour toutes.
+"""
+from backend.json_provider import dumps_bytes
+from backend.models import Message, Reservation, Trajet, User
+
+# Taille des lots d'ids par requête IN
+ID_CHUNK_SIZE = 500
+
+# Champs des listes de l'API (GET /api/trajets, /api/match, /api/messages).
+# GET /api/trajets expose en plus date_trajet, prix_par_place et statut,
+# les champs sur lesquels portent ses filtres et tris (backend.trajet_filters)
+TRAJET_LIST_FIELDS = (
+    'id', 'conducteur_id', 'point_depart', 'destination', 'horaire_depart',
+    'date_trajet', 'places_disponibles', 'prix_par_place', 'statut', 'created_at'
+)
+MATCH_FIELDS = (
+    'id', 'conducteur_id', 'point_depart', 'destination', 'horaire_depart',
+    'places_disponibles', 'created_at'
+)
+MESSAGE_LIST_FIELDS = ('id', 'sender_id', 'content', 'room', 'timestamp')
+
+# Champs complets, ceux des méthodes to_dict
+TRAJET_FIELDS = (
+    'id', 'conducteur_id', 'point_depart', 'destination', 'depart_latitude',
+    'depart_longitude', 'horaire_depart', 'date_trajet', 'places_disponibles',
+    'places_libres', 'prix_par_place', 'description', 'statut', 'type_trajet',
+    'jours_semaine', 'created_at', 'is_available'
+)
+RESERVATION_FIELDS = (
+    'id', 'trajet_id', 'passager_id', 'nombre_places', 'statut', 'message', 'created_at'
+)
+MESSAGE_FIELDS = (
+    'id', 'sender_id', 'recipient_id', 'content', 'room', 'message_type',
+    'is_read', 'trajet_id', 'timestamp'
+)
+SENDER_FIELDS = ('id', 'nom', 'prenom', 'photo')
+
+# Champs calculés: nom -> fonction de l'objet
+COMPUTED_FIELDS = {
+    Trajet: {
+        'places_libres': lambda trajet: trajet.places_libres,
+        'is_available': lambda trajet: trajet.is_available(),
+    },
+}
+
+
+def _row(obj, fields):
+    computed = COMPUTED_FIELDS.get(type(obj), {})
+    return {
+        field: computed[field](obj) if field in computed else getattr(obj, field)
+        for field in fields
+    }
+
+
+def load_by_ids(model, ids):
+    """
+    Charge par requêtes IN (lots de ID_CHUNK_SIZE) les lignes de model dont
+    l'id est donné; retourne un dict id -> objet (les ids absents manquent).
+    """
+    ids = sorted({row_id for row_id in ids if row_id is not None})
+    objects = {}
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        for obj in model.query.filter(model.id.in_(chunk)).all():
+            objects[obj.id] = obj
+    return objects
+
+
+def resolve(model, items):
+    """
+    Objets de items (objets ou ids, éventuellement mêlés) dans le même
+    ordre; les ids sont chargés en une passe, les ids inconnus et les
+    autres valeurs (booléens compris: True n'est pas l'id 1) ignorés.
+    """
+    items = list(items)
+    loaded = load_by_ids(model, (item for item in items if type(item) is int))
+    resolved = []
+    for item in items:
+        obj = loaded.get(item) if type(item) is int else item if isinstance(item, model) else None
+        if obj is not None:
+            resolved.append(obj)
+    return resolved
+
+
+def serialize_users(users, include_sensitive=False):
+    """Utilisateurs (objets ou ids) sérialisés comme User.to_dict"""
+    return [user.to_dict(include_sensitive=include_sensitive) for user in resolve(User, users)]
+
+
+def serialize_trajets(trajets, fields=TRAJET_FIELDS, include_conducteur=False, extra=None):
+    """
+    Trajets (objets ou ids) sérialisés avec les champs donnés; avec
+    include_conducteur, le conducteur de chaque trajet est ajouté (une
+    requête pour tous). extra(trajet) retourne des champs supplémentaires.
+    """
+    trajets = resolve(Trajet, trajets)
+    conducteurs = load_by_ids(User, (trajet.conducteur_id for trajet in trajets)) if include_conducteur else {}
+
+    rows = []
+    for trajet in trajets:
+        data = _row(trajet, fields)
+        if include_conducteur and trajet.conducteur_id in conducteurs:
+            data['conducteur'] = conducteurs[trajet.conducteur_id].to_dict()
+        if extra is not None:
+            data.update(extra(trajet))
+        rows.append(data)
+    return rows
+
+
+def serialize_reservations(reservations, fields=RESERVATION_FIELDS, include_relations=False):
+    """
+    Réservations (objets ou ids) sérialisées avec les champs donnés; avec
+    include_relations, le trajet et le passager sont ajoutés comme le fait
+    Reservation.to_dict (une requête par relation pour toute la liste).
+    """
+    reservations = resolve(Reservation, reservations)
+    trajets = passagers = {}
+    if include_relations:
+        trajets = {
+            row['id']: row for row in serialize_trajets(
+                load_by_ids(Trajet, (reservation.trajet_id for reservation in reservations)).values()
+            )
+        }
+        passagers = load_by_ids(User, (reservation.passager_id for reservation in reservations))
+
+    rows = []
+    for reservation in reservations:
+        data = _row(reservation, fields)
+        if reservation.trajet_id in trajets:
+            data['trajet'] = trajets[reservation.trajet_id]
+        if reservation.passager_id in passagers:
+            data['passager'] = passagers[reservation.passager_id].to_dict()
+        rows.append(data)
+    return rows
+
+
+def serialize_messages(messages, fields=MESSAGE_FIELDS, include_sender=False):
+    """
+    Messages (objets ou ids) sérialisés avec les champs donnés; avec
+    include_sender, l'expéditeur (id, nom, prénom, photo) est ajouté.
+    """
+    messages = resolve(Message, messages)
+    senders = load_by_ids(User, (message.sender_id for message in messages)) if include_sender else {}
+
+    rows = []
+    for message in messages:
+        data = _row(message, fields)
+        if message.sender_id in senders:
+            data['sender'] = _row(senders[message.sender_id], SENDER_FIELDS)
+        rows.append(data)
+    return rows
+
+
+def dumps(payload):
+    """Encode un résultat sérialisé en JSON (bytes UTF-8)"""
+    return dumps_bytes(payload)
@@ -0,0 +1,146 @@
+# backend/trajet_filters.py
+"""
+Filtres et tris de la liste des trajets (GET /api/trajets).
+
+Chaque filtre correspond à un prédicat SQL sur une colonne de `trajets`;
+les combinaisons courantes (statut et période, destination ou lieu de
+départ, fenêtre horaire, prix) sont servies par les index composites
+déclarés dans Trajet.__table_args__ (voir aussi backend.migrations).
+"""
+from collections import namedtuple
+from datetime import date
+import math
+
+from sqlalchemy import or_
+
+from backend.horaires import parse_departure_minute
+from backend.models import Trajet
+
+# Statuts acceptés par le filtre statut
+STATUTS = ('active', 'complete', 'cancelled')
+
+TrajetSort = namedtuple('TrajetSort', ['name', 'column', 'descending'])
+
+# Clés de tri: nom -> (colonne, ordre par défaut); un '-' en tête inverse l'ordre
+SORT_KEYS = {
+    'created_at': (Trajet.created_at, True),
+    'date': (Trajet.date_trajet, False),
+    'heure': (Trajet.depart_minute, False),
+    'prix': (Trajet.prix_par_place, False),
+    'places': (Trajet.places_disponibles, True),
+}
+
+DEFAULT_SORT = 'created_at'
+
+# Paramètres de filtre lus par apply_trajet_filters
+FILTER_PARAMS = (
+    'destination', 'depart', 'statut', 'date_min', 'date_max', 'heure_min', 'heure_max',
+    'places_min', 'prix_max'
+)
+
+
+class InvalidFilter(ValueError):
+    """Paramètre de filtre ou de tri invalide"""
+
+
+def _parse_date(value, name):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise InvalidFilter(f"Date invalide pour {name} (format AAAA-MM-JJ attendu)")
+
+
+def _parse_minute(value, name):
+    minute = parse_departure_minute(value)
+    if minute is None:
+        raise InvalidFilter(f"Heure invalide pour {name}")
+    return minute
+
+
+def _parse_number(value, name, cast):
+    try:
+        number = cast(value)
+    except ValueError:
+        raise InvalidFilter(f"Valeur numérique invalide pour {name}")
+    if not math.isfinite(number):
+        raise InvalidFilter(f"Valeur numérique invalide pour {name}")
+    if number < 0:
+        raise InvalidFilter(f"Valeur négative pour {name}")
+    return number
+
+
+def apply_trajet_filters(query, args):
+    """
+    Applique à query les filtres présents dans args (request.args):
+    destination et depart (égalité exacte), date_min / date_max sur
+    date_trajet, heure_min / heure_max sur l'heure de départ (une fenêtre
+    inversée, 22h-6h par exemple, passe minuit), places_min sur les places
+    libres, prix_max et statut. Lève InvalidFilter si une valeur est invalide.
+    """
+    destination = args.get('destination')
+    if destination:
+        query = query.filter(Trajet.destination == destination)
+
+    point_depart = args.get('depart')
+    if point_depart:
+        query = query.filter(Trajet.point_depart == point_depart)
+
+    statut = args.get('statut')
+    if statut:
+        if statut not in STATUTS:
+            raise InvalidFilter(f"Statut inconnu: {statut}")
+        query = query.filter(Trajet.statut == statut)
+
+    if args.get('date_min'):
+        query = query.filter(Trajet.date_trajet >= _parse_date(args['date_min'], 'date_min'))
+    if args.get('date_max'):
+        query = query.filter(Trajet.date_trajet <= _parse_date(args['date_max'], 'date_max'))
+
+    heure_min = _parse_minute(args['heure_min'], 'heure_min') if args.get('heure_min') else None
+    heure_max = _parse_minute(args['heure_max'], 'heure_max') if args.get('heure_max') else None
+    if heure_min is not None and heure_max is not None and heure_min > heure_max:
+        query = query.filter(or_(Trajet.depart_minute >= heure_min, Trajet.depart_minute <= heure_max))
+    else:
+        if heure_min is not None:
+            query = query.filter(Trajet.depart_minute >= heure_min)
+        if heure_max is not None:
+            query = query.filter(Trajet.depart_minute <= heure_max)
+
+    if args.get('places_min'):
+        # Places libres (Trajet.places_libres): offertes moins réservées
+        query = query.filter(
+            Trajet.places_disponibles - Trajet.places_reservees
+            >= _parse_number(args['places_min'], 'places_min', int)
+        )
+    if args.get('prix_max'):
+        query = query.filter(
+            Trajet.prix_par_place <= _parse_number(args['prix_max'], 'prix_max', float)
+        )
+
+    return query
+
+
+def has_filters(args):
+    """Indique si args (request.args) contient au moins un filtre"""
+    return any(args.get(name) for name in FILTER_PARAMS)
+
+
+def parse_sort(value):
+    """
+    Interprète le paramètre sort ('prix', '-prix', ...), DEFAULT_SORT s'il
+    est absent. Lève InvalidFilter si la clé est inconnue.
+    """
+    value = value or DEFAULT_SORT
+    reverse = value.startswith('-')
+    name = value[1:] if reverse else value
+    if name not in SORT_KEYS:
+        raise InvalidFilter(f"Clé de tri inconnue: {name}")
+    column, descending = SORT_KEYS[name]
+    return TrajetSort(value, column, descending != reverse)
+
+
+def apply_sort(query, sort):
+    """Trie query selon sort (TrajetSort), l'id départageant les ex aequo"""
+    if sort.descending:
+        return query.order_by(sort.column.desc(), Trajet.id.desc())
+    return query.order_by(sort.column.asc(), Trajet.id.asc())
@@ -0,0 +1,145 @@
+# benchmarks/common.py
+"""
+Outils partagés des benchmarks: application minimale (SQLite en mémoire,
+sans routes HTML ni SocketIO), jeu de données synthétique et percentiles.
+
+Les benchmarks se lancent depuis la racine du dépôt, par exemple:
+    python -m benchmarks.matching_latency
+"""
+from datetime import datetime, timedelta
+import csv
+import random
+import statistics
+import time
+
+from flask import Flask
+
+from backend.extensions import db
+from backend.geo import DEFAULT_GAZETTEER_PATH
+from backend.horaires import parse_departure_minute, parse_preference_mask
+from backend.json_provider import FastJSONProvider
+from backend.match_store import match_store
+from backend.matching import match_result_cache
+from backend.matching_index import matching_index
+from backend.models import Trajet, User
+from backend.passenger_index import passenger_index
+
+HORAIRES = ['matin', 'soir', '8h-10h', '14h', 'midi', '7h30', '', 'nuit', '18h', 'flexible']
+DEPARTS = ['7h', '8h30', '14:00', '18h', '6h45', 'vers midi', '21h', '10h', '5h30', '20h']
+
+# Localités synthétiques réparties sur le Bénin, en plus de celles du gazetteer
+SYNTHETIC_PLACES = 300
+
+# Syllabes des noms des localités synthétiques: des noms distincts, sans
+# token commun, comme ceux du gazetteer
+SYLLABLES = ['ko', 'to', 'nou', 'ca', 'la', 'vi', 'go', 'do', 'mey', 'ak', 'pa', 'kpo', 'ta', 'zo', 'gbe',
+             'dji', 'sse', 'ho', 'ue', 'bo', 'ri', 'nan', 'wa', 'ke', 'tou']
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SECRET_KEY='bench',
+        JWT_SECRET_KEY='bench',
+        SQLALCHEMY_DATABASE_URI='sqlite:///:memory:',
+        CACHE_BACKEND='none',
+        MATCHING_INDEX_REFRESH_SECONDS=3600,
+    )
+    app.config.update(config)
+    app.json = FastJSONProvider(app)
+    db.init_app(app)
+    return app
+
+
+def places(rnd):
+    """
+    (nom, latitude, longitude) des lieux du jeu de données. Comme avec le
+    géocodage hors ligne, tous les trajets d'un même lieu partagent ses
+    coordonnées.
+    """
+    with open(DEFAULT_GAZETTEER_PATH, encoding='utf-8') as f:
+        rows = csv.DictReader(line for line in f if not line.startswith('#'))
+        result = [(row['nom'], float(row['latitude']), float(row['longitude'])) for row in rows]
+    names = {name for name, _, _ in result}
+    target = len(names) + SYNTHETIC_PLACES
+    while len(names) < target:
+        name = ''.join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))).capitalize()
+        if name not in names:
+            names.add(name)
+            result.append((name, rnd.uniform(6.2, 11.5), rnd.uniform(1.5, 3.8)))
+    return result
+
+
+def seed(n_users, n_trips, seed=1):
+    """Insère n_users utilisateurs et n_trips trajets; retourne les ids des utilisateurs"""
+    rnd = random.Random(seed)
+    all_places = places(rnd)
+    now = datetime.utcnow()
+
+    users = []
+    for i in range(n_users):
+        name, lat, lon = rnd.choice(all_places)
+        horaires = rnd.choice(HORAIRES)
+        users.append({
+            'nom': f"N{i}", 'prenom': f"P{i}", 'telephone': f"+229{i:08d}",
+            'email': f"u{i}@bench.bj", 'mot_de_passe': 'x',
+            'role': rnd.choice(['passager', 'conducteur']),
+            'point_depart': name, 'latitude': lat, 'longitude': lon,
+            'horaires': horaires, 'horaires_mask': parse_preference_mask(horaires),
+            'rating_sum': 0, 'rating_count': 0,
+            'completed_trajets_count': 0, 'completed_reservations_count': 0,
+            'created_at': now,
+        })
+    db.session.execute(User.__table__.insert(), users)
+
+    trajets = []
+    for j in range(n_trips):
+        name, lat, lon = rnd.choice(all_places)
+        horaire = rnd.choice(DEPARTS)
+        trajets.append({
+            'conducteur_id': rnd.randint(1, n_users),
+            'point_depart': name, 'destination': rnd.choice(all_places)[0],
+            'depart_latitude': lat, 'depart_longitude': lon,
+            'horaire_depart': horaire, 'depart_minute': parse_departure_minute(horaire),
+            'places_disponibles': rnd.randint(0, 4), 'places_reservees': 0,
+            'created_at': now - timedelta(hours=rnd.randint(0, 24 * 40)),
+        })
+        if len(trajets) == 10000:
+            db.session.execute(Trajet.__table__.insert(), trajets)
+            trajets = []
+    if trajets:
+        db.session.execute(Trajet.__table__.insert(), trajets)
+    db.session.commit()
+    reset_indexes()
+    return list(range(1, n_users + 1))
+
+
+def reset_indexes():
+    matching_index.clear()
+    passenger_index.clear()
+    match_store.invalidate()
+    match_result_cache.invalidate()
+
+
+def measure(fn, args_list, repeat=1):
+    """Durées (ms) de fn(*args) pour chaque args de args_list"""
+    samples = []
+    for _ in range(repeat):
+        for args in args_list:
+            start = time.perf_counter()
+            fn(*args)
+            samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def percentiles(samples):
+    """(p50, p99) en millisecondes"""
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return statistics.median(ordered), p99
+
+
+def report(label, samples):
+    p50, p99 = percentiles(samples)
+    print(f"{label:<40} p50 {p50:8.2f} ms   p99 {p99:8.2f} ms   ({len(samples)} mesures)")
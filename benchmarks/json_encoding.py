@@ -0,0 +1,61 @@
+# benchmarks/json_encoding.py
+"""
+Durée d'encodage JSON d'une liste de trajets (champs de
+serializers.TRAJET_LIST_FIELDS, dates en objets date / datetime) de 100,
+1k et 10k éléments: json_provider.dumps_bytes avec orjson, puis avec le
+module json de la bibliothèque standard (repli sans orjson).
+
+    python -m benchmarks.json_encoding [taille ...]
+"""
+from datetime import date, datetime, timedelta
+import random
+import sys
+
+from backend import json_provider
+from backend.json_provider import dumps_bytes
+
+from benchmarks.common import measure, places, report
+
+SIZES = (100, 1000, 10000)
+REPEAT = {100: 200, 1000: 50, 10000: 10}
+
+
+def trajet_items(rnd, count):
+    """Dicts de trajets tels que produits par serializers.serialize_trajets"""
+    all_places = [name for name, _, _ in places(rnd)]
+    now = datetime(2026, 1, 5, 8, 30)
+    return [
+        {
+            'id': i + 1,
+            'conducteur_id': rnd.randint(1, 2000),
+            'point_depart': rnd.choice(all_places),
+            'destination': rnd.choice(all_places),
+            'horaire_depart': rnd.choice(['7h', '8h30', '14:00', 'vers midi']),
+            'date_trajet': date(2026, 1, 6) + timedelta(days=rnd.randint(0, 60)),
+            'places_disponibles': rnd.randint(0, 4),
+            'prix_par_place': float(rnd.randint(5, 40) * 100),
+            'statut': 'active',
+            'created_at': now - timedelta(minutes=rnd.randint(0, 60 * 24 * 40)),
+        }
+        for i in range(count)
+    ]
+
+
+def run(count):
+    items = {'trajets': trajet_items(random.Random(1), count)}
+    args = [(items,)] * REPEAT.get(count, 10)
+
+    print(f"--- {count} trajets ---")
+    if json_provider.orjson is not None:
+        measure(dumps_bytes, args[:5])
+        report("orjson", measure(dumps_bytes, args))
+    else:
+        print("orjson non installé")
+    stdlib = lambda obj: dumps_bytes(obj, use_orjson=False)
+    measure(stdlib, args[:5])
+    report("json (bibliothèque standard)", measure(stdlib, args))
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or SIZES:
+        run(size)
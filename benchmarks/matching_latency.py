@@ -0,0 +1,54 @@
+# benchmarks/matching_latency.py
+"""
+Latence du matching (p50/p99 de compute_match_result) à 1k, 10k et 100k
+trajets, avec le moteur vectorisé et avec le scoring ligne à ligne (sans
+NumPy). Le moteur vectorisé score tous les trajets disponibles; le
+scoring ligne à ligne score d'abord les candidats de l'index et ne charge
+les autres que si l'un d'eux pourrait entrer dans les meilleurs matches
+(voir matching.score_row_candidates).
+
+    python -m benchmarks.matching_latency [taille ...]
+"""
+import sys
+from unittest import mock
+
+from backend import matching, scoring
+from backend.extensions import db
+from backend.matching_index import matching_index
+from backend.models import User
+
+from benchmarks.common import make_app, measure, report, reset_indexes, seed
+
+SIZES = (1000, 10000, 100000)
+USERS = 2000
+SAMPLED_USERS = 100
+
+# Le scoring ligne à ligne charge les trajets candidats: moins de mesures
+ROW_SAMPLED_USERS = 20
+
+
+def run(n_trips):
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        seed(USERS, n_trips)
+        users = User.query.order_by(User.id).limit(SAMPLED_USERS).all()
+        matching_index.columns()
+
+        print(f"--- {n_trips} trajets ---")
+        for role in ('conducteur', 'passager'):
+            args = [(user, 10) for user in users if user.role == role]
+            measure(matching.compute_match_result, args[:10])
+            report(f"{role}s, vectorisé", measure(matching.compute_match_result, args, repeat=2))
+
+            args = args[:ROW_SAMPLED_USERS]
+            with mock.patch.object(scoring, 'is_available', lambda: False):
+                report(f"{role}s, ligne à ligne", measure(matching.compute_match_result, args))
+        db.session.remove()
+        db.drop_all()
+        reset_indexes()
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or SIZES:
+        run(size)
@@ -0,0 +1,85 @@
+# benchmarks/parallel_scoring.py
+"""
+Passage à l'échelle du scoring vectorisé sur plusieurs cœurs: durée de
+scoring.score_top (1 thread) puis de scoring.score_top_parallel de 2
+threads jusqu'au nombre de cœurs, sur tous les trajets de l'index, à 100k
+et 400k trajets. Seule la sélection des meilleurs est mesurée: les tables
+de lieux et d'horaires sont construites une fois par utilisateur, comme
+dans matching.score_user_candidates.
+
+    python -m benchmarks.parallel_scoring [taille ...]
+
+Avec un seul cœur, la répartition en 2 tranches est mesurée seule: elle
+n'est nettement plus rapide qu'à partir d'environ 80 000 lignes scorées
+(tranches plus petites, mieux servies par le cache), d'où la valeur par
+défaut de MATCHING_PARALLEL_THRESHOLD. Sur une machine de production, ce
+benchmark fixe MATCHING_PARALLEL_WORKERS et MATCHING_PARALLEL_THRESHOLD.
+"""
+import os
+import sys
+
+from backend import matching, scoring
+from backend.extensions import db
+from backend.matching_index import matching_index
+from backend.models import User
+
+from benchmarks.common import make_app, measure, report, reset_indexes, seed
+
+SIZES = (100000, 400000)
+USERS = 2000
+SAMPLED_USERS = 20
+LIMIT = 10 + 1
+
+
+def worker_counts():
+    counts, workers = [1], 2
+    while workers <= (os.cpu_count() or 1):
+        counts.append(workers)
+        workers *= 2
+    return counts
+
+
+def run(n_trips):
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        seed(USERS, n_trips)
+        columns = matching_index.columns()
+        users = User.query.order_by(User.id).limit(SAMPLED_USERS).all()
+
+        args = []
+        for user in users:
+            rows = columns.rows_for(exclude_conducteur_id=user.id)
+            geo_table = scoring.build_location_table(
+                columns, rows, lambda location, user=user: matching.calculate_geo_score(user, *location)
+            )
+            args.append((rows, geo_table, matching.build_time_table(user), user.role == 'passager'))
+
+        def sequential(rows, geo_table, time_table, role_bonus):
+            scoring.score_top(columns, rows, geo_table, time_table, role_bonus, LIMIT,
+                              slack=matching.ROUNDING_SLACK)
+
+        print(f"--- {n_trips} trajets ({args[0][0].size} lignes scorées), {os.cpu_count()} cœur(s) ---")
+        measure(sequential, args[:5])
+        report("1 thread (score_top)", measure(sequential, args, repeat=3))
+        for workers in worker_counts()[1:]:
+            def parallel(rows, geo_table, time_table, role_bonus, workers=workers):
+                scoring.score_top_parallel(columns, rows, geo_table, time_table, role_bonus, LIMIT,
+                                           slack=matching.ROUNDING_SLACK, workers=workers)
+            measure(parallel, args[:5])
+            report(f"{workers} threads (score_top_parallel)", measure(parallel, args, repeat=3))
+        # 2 threads même sur un seul cœur: coût de la répartition et de la fusion
+        if os.cpu_count() == 1:
+            def split(rows, geo_table, time_table, role_bonus):
+                scoring.score_top_parallel(columns, rows, geo_table, time_table, role_bonus, LIMIT,
+                                           slack=matching.ROUNDING_SLACK, workers=2)
+            measure(split, args[:5])
+            report("2 threads sur 1 cœur", measure(split, args, repeat=3))
+        db.session.remove()
+        db.drop_all()
+        reset_indexes()
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or SIZES:
+        run(size)
@@ -0,0 +1,104 @@
+# benchmarks/password_hashing.py
+"""
+Connexions par seconde et par cœur (POST /api/auth/login réussi) selon
+l'algorithme de hachage, à son coût par défaut (DEFAULT_COSTS): chaque
+connexion vérifie le mot de passe, dont le coût domine la requête. Les
+connexions sont d'abord envoyées une à une, puis par 2 threads par cœur
+avec un pool de PASSWORD_HASH_WORKERS = nombre de cœurs.
+
+    python -m benchmarks.password_hashing [algorithme ...]
+
+Le débit par cœur fixe la capacité de connexion d'un worker; pour un coût
+donné, il se mesure sur la machine de production avant de relever
+PASSWORD_HASH_COST.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from flask_jwt_extended import JWTManager
+
+from backend import passwords
+from backend.extensions import db
+from backend.models import User
+from backend.passwords import DEFAULT_COSTS, init_passwords
+
+from benchmarks.common import make_app, measure, report
+
+ALGORITHMS = ('scrypt', 'pbkdf2', 'bcrypt')
+LOGINS = 20
+EMAIL = 'bench@bench.bj'
+PASSWORD = 'mot-de-passe-de-test'
+
+
+def logins_per_second_per_core(samples):
+    """Débit d'un cœur qui enchaîne des connexions de durée médiane"""
+    return 1000 / sorted(samples)[len(samples) // 2]
+
+
+def concurrent_throughput(app, threads, logins_per_thread):
+    """Connexions par seconde et par cœur avec `threads` clients simultanés"""
+    def worker():
+        client = app.test_client()
+        for _ in range(logins_per_thread):
+            response = client.post('/api/auth/login', json={'email': EMAIL, 'password': PASSWORD})
+            assert response.status_code == 200
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    start = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return threads * logins_per_thread / elapsed / (os.cpu_count() or 1)
+
+
+def run(algorithm, database_path):
+    if algorithm == 'bcrypt' and passwords.bcrypt is None:
+        print(f"--- {algorithm}: paquet bcrypt non installé ---")
+        return
+    cores = os.cpu_count() or 1
+    app = make_app(
+        # Base fichier: les threads du test concurrent ouvrent chacun leur connexion
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{database_path}",
+        JWT_SECRET_KEY='bench-jwt-secret-key-of-at-least-32-bytes',
+        PASSWORD_HASH_ALGORITHM=algorithm,
+        PASSWORD_HASH_WORKERS=cores,
+        PASSWORD_HASH_MAX_PENDING=cores * 4,
+    )
+    init_passwords(app)
+    JWTManager(app)
+    from backend.api import bp as api_bp
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+        user = User(nom='Bench', prenom='Bench', email=EMAIL, telephone='+22900000000', role='passager')
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        client = app.test_client()
+
+        def login():
+            response = client.post('/api/auth/login', json={'email': EMAIL, 'password': PASSWORD})
+            assert response.status_code == 200
+
+        print(f"--- {algorithm} (coût {DEFAULT_COSTS[algorithm]}), {cores} cœur(s) ---")
+        measure(login, [()] * 2)
+        samples = measure(login, [()] * LOGINS)
+        report("connexion", samples)
+        print(f"{'connexions/s par cœur, une à une':<40} {logins_per_second_per_core(samples):8.1f}")
+        throughput = concurrent_throughput(app, 2 * cores, max(1, LOGINS // (2 * cores)))
+        print(f"{'connexions/s par cœur, 2 threads/cœur':<40} {throughput:8.1f}")
+        passwords.password_service.shutdown()
+        db.session.remove()
+        db.drop_all()
+
+
+if __name__ == '__main__':
+    with tempfile.TemporaryDirectory() as directory:
+        for name in sys.argv[1:] or ALGORITHMS:
+            run(name, os.path.join(directory, f"{name}.db"))
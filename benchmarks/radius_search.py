@@ -0,0 +1,72 @@
+# benchmarks/radius_search.py
+"""
+Latence de la recherche géographique de GET /api/trajets (lat, lon,
+radius_km) à 1k, 10k et 100k trajets: index spatial puis filtres par lots
+d'ids, comparé au parcours complet des trajets disponibles avec calcul de
+la distance de chacun.
+
+    python -m benchmarks.radius_search [taille ...]
+"""
+import random
+import sys
+
+from backend.cache import init_cache
+from backend.extensions import db
+from backend.geo import haversine_km
+from backend.matching_index import GEO_MATCH_RADIUS_KM, matching_index
+from backend.models import Trajet
+
+from benchmarks.common import make_app, measure, places, report, reset_indexes, seed
+
+SIZES = (1000, 10000, 100000)
+USERS = 2000
+SAMPLED_POINTS = 100
+PER_PAGE = 10
+
+
+def full_scan(latitude, longitude, radius_km):
+    """Page des trajets dans le rayon, sans index: distance de chaque trajet disponible"""
+    rows = Trajet.query.filter(
+        Trajet.places_disponibles > 0,
+        Trajet.depart_latitude.isnot(None)
+    ).with_entities(Trajet.id, Trajet.depart_latitude, Trajet.depart_longitude).all()
+    ids = sorted(
+        trajet_id for trajet_id, lat, lon in rows
+        if haversine_km(latitude, longitude, lat, lon) <= radius_km
+    )
+    return Trajet.query.filter(Trajet.id.in_(ids[:PER_PAGE])).all(), len(ids)
+
+
+def run(n_trips):
+    app = make_app()
+    init_cache(app)
+    from backend.api import bp as api_bp
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+        seed(USERS, n_trips)
+        matching_index.ensure_fresh()
+        points = [(lat, lon) for _, lat, lon in random.Random(2).sample(places(random.Random(1)), SAMPLED_POINTS)]
+        client = app.test_client()
+
+        def route(latitude, longitude, radius_km):
+            response = client.get(
+                f"/api/trajets?lat={latitude}&lon={longitude}&radius_km={radius_km}&per_page={PER_PAGE}"
+            )
+            assert response.status_code == 200
+
+        print(f"--- {n_trips} trajets ---")
+        for radius_km in (GEO_MATCH_RADIUS_KM, 50.0):
+            args = [(lat, lon, radius_km) for lat, lon in points]
+            measure(route, args[:10])
+            report(f"{radius_km:g} km, index spatial", measure(route, args))
+            report(f"{radius_km:g} km, parcours complet", measure(full_scan, args))
+        db.session.remove()
+        db.drop_all()
+        reset_indexes()
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or SIZES:
+        run(size)
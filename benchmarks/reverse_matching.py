@@ -0,0 +1,102 @@
+# benchmarks/reverse_matching.py
+"""
+Latence du matching inversé (p50/p99 de find_reverse_matches) avec
+50 000 passagers: sondage de l'index des passagers (reverse_candidates)
+comparé au scoring de tous les passagers pour chaque trajet du
+conducteur. Le rappel des candidats est mesuré sur les mêmes trajets:
+seuls les passagers proches par simple inclusion du nom de lieu, sans
+token commun ni trigrammes proches, peuvent manquer. Les noms synthétiques
+de benchmarks.common, faits de syllabes courtes, s'incluent souvent les
+uns les autres: ce rappel est plus bas qu'avec de vrais noms de lieux.
+
+    python -m benchmarks.reverse_matching [passagers ...]
+"""
+import sys
+from unittest import mock
+
+from backend import matching
+from backend.extensions import db
+from backend.models import Trajet, User
+from backend.passenger_index import passenger_index
+
+from benchmarks.common import make_app, measure, report, reset_indexes, seed
+
+SIZES = (50000,)
+TRIPS = 20000
+SAMPLED_DRIVERS = 50
+
+
+def all_passengers():
+    """Ids de tous les passagers éligibles au matching inversé"""
+    return {
+        user_id for (user_id,) in db.session.query(User.id).filter(
+            User.role == 'passager', User.horaires.isnot(None), User.horaires != ''
+        )
+    }
+
+
+def recall(trajets, passenger_ids):
+    """
+    Part des passagers au-dessus du seuil retenus par reverse_candidates,
+    et nombre de passagers manqués dont le lieu n'est pas inclus dans
+    celui du trajet (ou l'inverse): il doit être nul.
+    """
+    found = expected = other_misses = 0
+    for trajet in trajets:
+        candidates = matching.reverse_candidates(trajet)
+        for passenger_id in passenger_ids:
+            passenger = passenger_index.get(passenger_id)
+            geo_score = matching.calculate_geo_score(
+                passenger, trajet.point_depart, trajet.depart_latitude, trajet.depart_longitude
+            )
+            time_score = matching.calculate_time_compatibility(passenger.horaires, trajet.horaire_depart)
+            score = geo_score * matching.REVERSE_GEO_WEIGHT + time_score * matching.REVERSE_TIME_WEIGHT
+            if score <= matching.REVERSE_MATCH_THRESHOLD:
+                continue
+            expected += 1
+            if passenger_id in candidates:
+                found += 1
+            elif not is_substring_pair(passenger.point_depart, trajet.point_depart):
+                other_misses += 1
+    return (found / expected if expected else 1.0), other_misses
+
+
+def is_substring_pair(location, other):
+    if not location or not other:
+        return False
+    location, other = location.lower(), other.lower()
+    return location in other or other in location
+
+
+def run(n_passengers):
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        # Rôles tirés au hasard, horaires vides pour un utilisateur sur dix
+        seed(n_passengers * 20 // 9, TRIPS)
+        passenger_ids = all_passengers()
+        passenger_index.ensure_fresh()
+        drivers = [
+            conducteur_id for (conducteur_id,) in db.session.query(Trajet.conducteur_id)
+            .join(User, User.id == Trajet.conducteur_id)
+            .filter(User.role == 'conducteur').distinct().order_by(Trajet.conducteur_id).limit(SAMPLED_DRIVERS)
+        ]
+        args = [(driver_id, 10) for driver_id in drivers]
+
+        print(f"--- {len(passenger_ids)} passagers indexés, {TRIPS} trajets ---")
+        measure(matching.find_reverse_matches, args[:5])
+        report("index des passagers", measure(matching.find_reverse_matches, args, repeat=2))
+        with mock.patch.object(matching, 'reverse_candidates', lambda trajet: passenger_ids):
+            report("tous les passagers", measure(matching.find_reverse_matches, args[:10]))
+
+        trajets = Trajet.query.filter(Trajet.conducteur_id.in_(drivers[:10])).all()
+        ratio, other_misses = recall(trajets, passenger_ids)
+        print(f"rappel des candidats: {ratio:.4f} (manqués hors inclusion de nom: {other_misses})")
+        db.session.remove()
+        db.drop_all()
+        reset_indexes()
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or SIZES:
+        run(size)
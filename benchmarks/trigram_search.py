@@ -0,0 +1,71 @@
+# benchmarks/trigram_search.py
+"""
+Latence de la recherche des lieux proches par trigrammes (similarité au
+moins TRIGRAM_THRESHOLD, 10 meilleurs) à 1k, 10k et 100k lieux distincts:
+TrigramIndex (listes de postings) comparé au parcours de tous les lieux
+avec trigram_similarity.
+
+    python -m benchmarks.trigram_search [taille ...]
+"""
+import heapq
+import random
+import sys
+
+from backend.locations import TRIGRAM_THRESHOLD, TrigramIndex, location_trigrams, trigram_similarity
+
+from benchmarks.common import measure, places, report
+
+SIZES = (1000, 10000, 100000)
+SAMPLED_QUERIES = 200
+TOP_K = 10
+
+SYLLABES = ['ko', 'to', 'nou', 'ca', 'la', 'vi', 'go', 'do', 'mey', 'ak', 'pa', 'kpo', 'ta', 'zo', 'gbe',
+            'dji', 'sse', 'ho', 'ue', 'bo', 'ri', 'nan', 'wa', 'ke', 'tou']
+QUARTIERS = ['Quartier', 'Carrefour', 'Marché', 'Gare', 'Zone', 'Cité', '']
+
+
+def location_names(rnd, count):
+    """Noms de lieux: localités du gazetteer suivies d'un quartier synthétique"""
+    towns = [name for name, _, _ in places(rnd)]
+    names = set()
+    while len(names) < count:
+        word = ''.join(rnd.choice(SYLLABES) for _ in range(rnd.randint(2, 4))).capitalize()
+        names.add(f"{rnd.choice(towns)} {rnd.choice(QUARTIERS)} {word}".replace('  ', ' '))
+    return sorted(names)
+
+
+def linear_scan(locations, text):
+    """Lieux proches de text, sans index: similarité avec chacun"""
+    results = []
+    for location in locations:
+        similarity = trigram_similarity(text, location)
+        if similarity >= TRIGRAM_THRESHOLD:
+            results.append((location, similarity))
+    return heapq.nlargest(TOP_K, results, key=lambda item: item[1])
+
+
+def run(count):
+    rnd = random.Random(1)
+    locations = location_names(rnd, count)
+    index = TrigramIndex()
+    for location in locations:
+        index.add(location)
+
+    # Requêtes: lieux indexés, tronqués ou en minuscules, comme saisis par les utilisateurs
+    queries = []
+    for location in rnd.sample(locations, SAMPLED_QUERIES):
+        words = location.split()
+        queries.append(rnd.choice([location, location.lower(), ' '.join(words[:2]), words[-1]]))
+
+    print(f"--- {count} lieux ---")
+    args = [(query,) for query in queries]
+    measure(lambda text: index.search(text, limit=TOP_K), args[:10])
+    report("index trigrammes", measure(lambda text: index.search(text, limit=TOP_K), args))
+    # Cache des trigrammes vidé: le parcours le remplit pour tous les lieux
+    location_trigrams.cache_clear()
+    report("parcours complet", measure(lambda text: linear_scan(locations, text), args[:50]))
+
+
+if __name__ == '__main__':
+    for size in [int(arg) for arg in sys.argv[1:]] or SIZES:
+        run(size)
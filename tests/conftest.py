@@ -0,0 +1,117 @@
+# tests/conftest.py
+"""
+Application minimale pour les tests: base SQLite en mémoire et blueprint de
+l'API, sans les routes HTML ni SocketIO. La configuration reprend celle de
+TestingConfig: backend.config exige à l'import les variables d'environnement
+de production.
+"""
+from datetime import datetime
+
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+from backend.cache import init_cache
+from backend.extensions import db
+from backend.identity import init_identity
+from backend.json_provider import FastJSONProvider
+from backend.match_store import match_store
+from backend.matching import match_result_cache
+from backend.matching_index import matching_index
+from backend.models import Trajet, User
+from backend.passenger_index import passenger_index
+from backend.passwords import init_passwords
+from backend.revocation import init_revocation
+
+
+def _reset_indexes():
+    matching_index.clear()
+    passenger_index.clear()
+    match_store.invalidate()
+    match_result_cache.invalidate()
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SECRET_KEY='test_secret_key',
+        JWT_SECRET_KEY='test_jwt_secret_key_of_at_least_32_bytes',
+        SQLALCHEMY_DATABASE_URI='sqlite:///:memory:',
+        CACHE_BACKEND='none',
+        REVOCATION_BACKEND='memory',
+        PASSWORD_HASH_ALGORITHM='pbkdf2',
+        PASSWORD_HASH_COST=1000,
+        PASSWORD_HASH_WORKERS=0,
+    )
+    app.json = FastJSONProvider(app)
+
+    db.init_app(app)
+    init_passwords(app)
+    jwt = JWTManager(app)
+    init_identity(jwt)
+    init_revocation(app, jwt)
+    init_cache(app)
+
+    from backend.api import bp as api_bp
+    app.register_blueprint(api_bp, url_prefix='/api')
+
+    with app.app_context():
+        db.create_all()
+        _reset_indexes()
+        yield app
+        db.session.remove()
+        db.drop_all()
+        _reset_indexes()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    counter = iter(range(1, 10**6))
+
+    def make_user(**fields):
+        number = next(counter)
+        fields.setdefault('nom', f"Nom{number}")
+        fields.setdefault('prenom', f"Prenom{number}")
+        fields.setdefault('telephone', f"+22990{number:06d}")
+        fields.setdefault('email', f"user{number}@example.bj")
+        fields.setdefault('role', 'passager')
+        user = User(**fields)
+        user.mot_de_passe = 'x'
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+def make_trajet(app):
+    def make_trajet(conducteur, **fields):
+        fields.setdefault('point_depart', 'Cotonou')
+        fields.setdefault('destination', 'Abomey-Calavi')
+        fields.setdefault('horaire_depart', '8h')
+        fields.setdefault('places_disponibles', 4)
+        fields.setdefault('created_at', datetime.utcnow())
+        trajet = Trajet(conducteur_id=conducteur.id, **fields)
+        db.session.add(trajet)
+        db.session.commit()
+        return trajet
+
+    return make_trajet
+
+
+@pytest.fixture
+def auth_headers(app):
+    def auth_headers(user):
+        with app.test_request_context():
+            token = create_access_token(identity=str(user.id))
+        return {'Authorization': f"Bearer {token}"}
+
+    return auth_headers
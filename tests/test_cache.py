@@ -0,0 +1,143 @@
+# tests/test_cache.py
+import fnmatch
+
+import pytest
+
+from backend import cache
+from backend.cache import CacheStats, LocalCache, RedisCache, response_cache
+from backend.extensions import db
+from backend.models import Trajet
+
+
+class FakeRedis:
+    """Client Redis en mémoire: les commandes utilisées par RedisCache, TTL enregistrés"""
+
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value.encode('utf-8') if isinstance(value, str) else value
+        self.ttls[key] = ex
+        return True
+
+    def scan_iter(self, match):
+        return [key for key in self.data if fnmatch.fnmatch(key, match)]
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+
+@pytest.fixture
+def use_backend(app, monkeypatch):
+    """Active le cache des réponses (désactivé par la configuration de test) sur un backend"""
+    previous_backend, previous_enabled = response_cache.backend, response_cache.enabled
+    monkeypatch.setattr(response_cache, 'stats', CacheStats())
+
+    def use_backend(backend):
+        response_cache.configure(backend)
+        return backend
+
+    yield use_backend
+    response_cache.configure(previous_backend, enabled=previous_enabled)
+
+
+def _trajet_ids(client):
+    response = client.get('/api/trajets')
+    assert response.status_code == 200
+    return [trajet['id'] for trajet in response.get_json()['trajets']]
+
+
+def _counts(endpoint='api.get_trajets'):
+    return response_cache.stats.snapshot()['endpoints'][endpoint]
+
+
+@pytest.mark.parametrize('backend', [LocalCache, lambda: RedisCache(FakeRedis())], ids=['local', 'redis'])
+def test_trajets_are_served_from_cache_until_a_commit(client, make_user, make_trajet, use_backend, backend):
+    use_backend(backend())
+    conducteur = make_user(role='conducteur')
+    first = make_trajet(conducteur)
+
+    assert _trajet_ids(client) == [first.id]
+    assert _trajet_ids(client) == [first.id]
+    counts = _counts()
+    assert (counts['misses'], counts['stores'], counts['hits']) == (1, 1, 1)
+
+    # Écriture annulée: aucun tag n'est invalidé, l'entrée reste servie
+    db.session.add(Trajet(conducteur_id=conducteur.id, point_depart='Parakou', destination='Cotonou',
+                          horaire_depart='9h'))
+    db.session.flush()
+    db.session.rollback()
+    assert _trajet_ids(client) == [first.id]
+    assert _counts()['hits'] == 2
+
+    second = make_trajet(conducteur)
+    assert sorted(_trajet_ids(client)) == [first.id, second.id]
+    assert _counts()['misses'] == 2
+    assert response_cache.stats.snapshot()['tag_invalidations'] > 0
+
+
+def test_local_cache_evicts_least_recently_used_entries():
+    evicted = []
+    backend = LocalCache(max_entries=2, on_evict=evicted.append)
+    backend.set('resp:a', b'a')
+    backend.set('resp:b', b'b')
+    assert backend.get_many(['resp:a']) == [b'a']
+
+    backend.set('resp:c', b'c')
+    assert evicted == ['resp:b']
+    assert backend.get_many(['resp:a', 'resp:b', 'resp:c']) == [b'a', None, b'c']
+
+    # Les jetons de tags ont leur propre LRU: les réponses ne les expulsent pas
+    backend.add('tag:trajets', 'jeton')
+    for key in ('resp:d', 'resp:e', 'resp:f'):
+        backend.set(key, b'x')
+    assert backend.get_many(['tag:trajets']) == ['jeton']
+
+
+def test_local_cache_entries_expire_after_their_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, 'monotonic', lambda: now[0])
+    backend = LocalCache()
+    backend.set('resp:a', b'a', ttl=30)
+    backend.set('resp:b', b'b')
+
+    now[0] += 29
+    assert backend.get_many(['resp:a', 'resp:b']) == [b'a', b'b']
+    now[0] += 2
+    assert backend.get_many(['resp:a', 'resp:b']) == [None, b'b']
+    assert len(backend) == 1
+
+
+def test_local_cache_evictions_are_counted_per_endpoint(client, make_user, make_trajet, use_backend):
+    use_backend(LocalCache(max_entries=1, on_evict=response_cache._evicted))
+    make_trajet(make_user(role='conducteur'))
+    for page in (1, 2):
+        assert client.get(f'/api/trajets?page={page}').status_code == 200
+    assert _counts()['evictions'] == 1
+
+
+def test_redis_cache_stores_with_ttl_and_reports_evictions_as_unavailable(client, make_user, make_trajet,
+                                                                          use_backend):
+    fake = FakeRedis()
+    use_backend(RedisCache(fake, prefix='test:'))
+    make_trajet(make_user(role='conducteur'))
+    _trajet_ids(client)
+
+    entries = [key for key in fake.data if key.startswith('test:resp:')]
+    assert len(entries) == 1
+    assert fake.ttls[entries[0]] == cache.DEFAULT_TTL_SECONDS
+    assert fake.ttls['test:tag:trajets'] is None
+    assert _counts()['evictions'] is None
+
+    response_cache.backend.clear()
+    assert fake.data == {}
@@ -0,0 +1,81 @@
+# tests/test_conditional.py
+import pytest
+
+from backend.conditional import collection_version
+from backend.counters import reconcile_counters
+from backend.extensions import db
+from backend.models import Reservation, Trajet
+
+
+def _get(client, url, etag=None, headers=None):
+    headers = dict(headers or {})
+    if etag is not None:
+        headers['If-None-Match'] = etag
+    return client.get(url, headers=headers)
+
+
+def _etag(response):
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    return response.headers['ETag']
+
+
+@pytest.fixture
+def trajet(make_user, make_trajet):
+    return make_trajet(make_user(role='conducteur'), places_disponibles=3)
+
+
+def test_trajets_list_is_not_modified_until_a_write(client, make_trajet, trajet):
+    etag = _etag(_get(client, '/api/trajets'))
+
+    cached = _get(client, '/api/trajets', etag)
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag and cached.get_data() == b''
+    # L'ETag dépend des paramètres
+    assert _get(client, '/api/trajets?page=2', etag).status_code == 200
+
+    make_trajet(trajet.conducteur)
+    assert _etag(_get(client, '/api/trajets', etag)) != etag
+
+
+def test_counter_updates_bump_the_trajets_version(client, make_user, trajet):
+    passager = make_user(role='passager')
+    etag = _etag(_get(client, '/api/trajets'))
+    version, _ = collection_version('trajets')
+
+    # Réservation en attente: places_reservees ne change pas
+    reservation = Reservation(trajet_id=trajet.id, passager_id=passager.id)
+    db.session.add(reservation)
+    db.session.commit()
+    assert collection_version('trajets')[0] == version
+    assert _get(client, '/api/trajets', etag).status_code == 304
+
+    # Confirmation: places_reservees (une mise à jour SQL) change la liste
+    reservation.statut = 'confirmee'
+    db.session.commit()
+    assert collection_version('trajets')[0] == version + 1
+    response = _get(client, '/api/trajets', etag)
+    assert _etag(response) != etag
+    assert response.get_json()['trajets'][0]['id'] == trajet.id
+
+
+def test_counter_reconciliation_bumps_the_trajets_version(trajet):
+    version, _ = collection_version('trajets')
+    reconcile_counters()
+    assert collection_version('trajets')[0] == version
+
+    db.session.execute(Trajet.__table__.update().values(places_reservees=2))
+    db.session.commit()
+    reconcile_counters()
+    assert collection_version('trajets')[0] == version + 1
+
+
+def test_profile_is_not_modified_until_the_user_changes(client, make_user, auth_headers):
+    user = make_user(role='passager')
+    headers = auth_headers(user)
+    etag = _etag(_get(client, '/api/user/profile', headers=headers))
+    assert _get(client, '/api/user/profile', etag, headers).status_code == 304
+
+    user.horaires = '7h-9h'
+    db.session.commit()
+    assert _etag(_get(client, '/api/user/profile', etag, headers)) != etag
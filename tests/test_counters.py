@@ -0,0 +1,195 @@
+# tests/test_counters.py
+import pytest
+from sqlalchemy import func, text
+
+from backend.commands import init_commands
+from backend.counters import reconcile_counters
+from backend.extensions import db
+from backend.models import Evaluation, Reservation, Trajet, User
+
+USER_AGGREGATES = ('rating_sum', 'rating_count', 'completed_trajets_count', 'completed_reservations_count')
+
+
+@pytest.fixture
+def make_reservation(app):
+    def make_reservation(trajet, passager, **fields):
+        reservation = Reservation(trajet_id=trajet.id, passager_id=passager.id, **fields)
+        db.session.add(reservation)
+        db.session.commit()
+        return reservation
+
+    return make_reservation
+
+
+def _confirmed_count(trajet):
+    return trajet.reservations.filter_by(statut='confirmee').count()
+
+
+def _aggregates(user):
+    db.session.refresh(user)
+    return {name: getattr(user, name) for name in USER_AGGREGATES}
+
+
+def _recount(user):
+    """Agrégats d'un utilisateur recomptés depuis les tables sources"""
+    rating_sum, rating_count = db.session.query(
+        func.coalesce(func.sum(Evaluation.note), 0), func.count(Evaluation.id)
+    ).filter(Evaluation.evalue_id == user.id).one()
+    return {
+        'rating_sum': rating_sum,
+        'rating_count': rating_count,
+        'completed_trajets_count': Trajet.query.filter_by(conducteur_id=user.id, statut='complete').count(),
+        'completed_reservations_count': Reservation.query.filter_by(passager_id=user.id, statut='complete').count(),
+    }
+
+
+def _assert_aggregates_match(*users):
+    for user in users:
+        assert _aggregates(user) == _recount(user)
+
+
+def test_places_reservees_counts_confirmed_reservations(make_user, make_trajet, make_reservation):
+    trajet = make_trajet(make_user(role='conducteur'), places_disponibles=6)
+    passager = make_user(role='passager')
+
+    # Insertion: seules les réservations confirmées comptent, une par ligne
+    make_reservation(trajet, passager, statut='confirmee', nombre_places=3)
+    pending = make_reservation(trajet, passager, statut='en_attente', nombre_places=2)
+    assert trajet.places_reservees == _confirmed_count(trajet) == 1
+    assert trajet.places_libres == 5
+
+    # Changement de statut dans les deux sens
+    pending.statut = 'confirmee'
+    db.session.commit()
+    assert trajet.places_reservees == _confirmed_count(trajet) == 2
+
+    pending.statut = 'annulee'
+    db.session.commit()
+    assert trajet.places_reservees == _confirmed_count(trajet) == 1
+
+    # Modification d'un champ non compté
+    pending.message = 'Finalement non'
+    db.session.commit()
+    assert trajet.places_reservees == 1
+
+    # Suppression
+    confirmed = trajet.reservations.filter_by(statut='confirmee').one()
+    db.session.delete(confirmed)
+    db.session.commit()
+    assert trajet.places_reservees == _confirmed_count(trajet) == 0
+
+
+def test_places_reservees_is_not_changed_by_a_rollback(make_user, make_trajet, make_reservation):
+    trajet = make_trajet(make_user(role='conducteur'))
+    make_reservation(trajet, make_user(role='passager'), statut='confirmee')
+
+    db.session.add(Reservation(trajet_id=trajet.id, passager_id=make_user().id, statut='confirmee'))
+    db.session.flush()
+    db.session.rollback()
+    assert trajet.places_reservees == 1
+
+
+def test_reconcile_counters_command_repairs_drift(app, make_user, make_trajet, make_reservation):
+    init_commands(app)
+    trajet = make_trajet(make_user(role='conducteur'))
+    make_reservation(trajet, make_user(role='passager'), statut='confirmee')
+    trajet_id = trajet.id
+
+    # Écriture hors de l'ORM: les listeners ne la voient pas
+    db.session.execute(text('UPDATE trajets SET places_reservees = 7 WHERE id = :id'), {'id': trajet_id})
+    db.session.commit()
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['reconcile-counters', '--dry-run'])
+    assert result.exit_code == 0
+    assert "trajets.places_reservees: 1 lignes en écart" in result.output
+    db.session.expire_all()
+    assert trajet.places_reservees == 7
+
+    result = runner.invoke(args=['reconcile-counters'])
+    assert result.exit_code == 0
+    assert "trajets.places_reservees: 1 lignes corrigées" in result.output
+    db.session.expire_all()
+    assert trajet.places_reservees == 1
+
+    result = runner.invoke(args=['reconcile-counters', '--dry-run'])
+    assert "trajets.places_reservees: 0 lignes en écart" in result.output
+
+
+def test_user_aggregates_match_a_recount(make_user, make_trajet, make_reservation):
+    conducteur = make_user(role='conducteur')
+    autre = make_user(role='conducteur')
+    passager = make_user(role='passager')
+    trajet = make_trajet(conducteur)
+    vide = make_trajet(conducteur)
+    reservation = make_reservation(trajet, passager, statut='confirmee')
+
+    # Trajets et réservations complétés, puis rouverts
+    trajet.statut = 'complete'
+    vide.statut = 'complete'
+    reservation.statut = 'complete'
+    db.session.commit()
+    _assert_aggregates_match(conducteur, passager)
+    assert conducteur.get_completed_trips_count() == 2 and passager.get_completed_trips_count() == 1
+
+    vide.statut = 'active'
+    db.session.commit()
+    _assert_aggregates_match(conducteur)
+
+    # Trajet complété supprimé
+    vide.statut = 'complete'
+    db.session.commit()
+    db.session.delete(vide)
+    db.session.commit()
+    _assert_aggregates_match(conducteur)
+    assert conducteur.completed_trajets_count == 1
+
+    # Évaluations: insertion, note modifiée, évalué changé, suppression
+    first = Evaluation(evaluateur_id=passager.id, evalue_id=conducteur.id, trajet_id=trajet.id, note=4)
+    second = Evaluation(evaluateur_id=passager.id, evalue_id=conducteur.id, trajet_id=trajet.id, note=2)
+    db.session.add_all([first, second])
+    db.session.commit()
+    _assert_aggregates_match(conducteur)
+    assert conducteur.get_average_rating() == 3
+
+    first.note = 5
+    db.session.commit()
+    _assert_aggregates_match(conducteur)
+
+    second.evalue_id = autre.id
+    db.session.commit()
+    _assert_aggregates_match(conducteur, autre)
+    assert (conducteur.rating_count, autre.rating_count) == (1, 1)
+
+    db.session.delete(first)
+    db.session.commit()
+    _assert_aggregates_match(conducteur, autre, passager)
+    assert conducteur.get_average_rating() is None
+
+
+def test_reconcile_counters_repairs_user_aggregate_drift(make_user, make_trajet, make_reservation):
+    conducteur = make_user(role='conducteur')
+    passager = make_user(role='passager')
+    trajet = make_trajet(conducteur, statut='complete')
+    make_reservation(trajet, passager, statut='complete')
+    db.session.add(Evaluation(evaluateur_id=passager.id, evalue_id=conducteur.id, trajet_id=trajet.id, note=4))
+    db.session.commit()
+
+    # Écriture hors de l'ORM, sur les deux utilisateurs
+    db.session.execute(text(
+        'UPDATE users SET rating_sum = 40, rating_count = 0, completed_trajets_count = 0, '
+        'completed_reservations_count = 3'
+    ))
+    db.session.commit()
+    assert _aggregates(conducteur) != _recount(conducteur)
+
+    drift = reconcile_counters(dry_run=True)
+    assert drift['users.rating_sum'] == 2
+    assert drift['users.rating_count'] == 1
+    assert drift['users.completed_trajets_count'] == 1
+    assert drift['users.completed_reservations_count'] == 2
+    assert _aggregates(passager)['completed_reservations_count'] == 3
+
+    assert reconcile_counters() == drift
+    _assert_aggregates_match(conducteur, passager)
+    assert set(reconcile_counters(dry_run=True).values()) == {0}
@@ -0,0 +1,38 @@
+# tests/test_identity.py
+import pytest
+from sqlalchemy import event
+
+from backend.extensions import db
+
+
+def _user_selects(client, path, headers):
+    """Réponse et requêtes SQL sur la table users exécutées pendant la requête"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM users' in statement:
+            statements.append(statement)
+
+    db.session.expunge_all()
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(path, headers=headers)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response, statements
+
+
+@pytest.mark.parametrize('path', ['/api/user/profile', '/api/match', '/api/metrics/jobs'])
+def test_current_user_is_loaded_once_per_request(client, make_user, make_trajet, auth_headers, path):
+    # jwt_required (ou admin_required) charge l'utilisateur, puis la route et le matching le relisent
+    user = make_user(role='admin' if path.startswith('/api/metrics') else 'passager', point_depart='Cotonou')
+    make_trajet(make_user(role='conducteur'), point_depart='Cotonou')
+    headers = auth_headers(user)
+
+    response, statements = _user_selects(client, path, headers)
+    assert response.status_code == 200
+    assert len(statements) == 1
+
+    # Le cache est propre à la requête: la suivante recharge l'utilisateur
+    response, statements = _user_selects(client, path, headers)
+    assert len(statements) == 1
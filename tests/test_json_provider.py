@@ -0,0 +1,70 @@
+# tests/test_json_provider.py
+from datetime import date, datetime, timezone
+import decimal
+import json
+import uuid
+
+import pytest
+from flask import Flask
+
+from backend import json_provider
+from backend.json_provider import FastJSONProvider
+
+PAYLOAD = {
+    'created_at': datetime(2026, 1, 5, 8, 30, 15, 250000),
+    'updated_at': datetime(2026, 1, 5, 8, 30, tzinfo=timezone.utc),
+    'date_trajet': date(2026, 1, 6),
+    'prix': decimal.Decimal('1500.50'),
+    'token': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'lieu': 'Fidjrossè',
+    'counts': {1: 'un', 2: 'deux'},
+}
+
+EXPECTED = {
+    'created_at': '2026-01-05T08:30:15.250000',
+    'updated_at': '2026-01-05T08:30:00+00:00',
+    'date_trajet': '2026-01-06',
+    'prix': '1500.50',
+    'token': '12345678-1234-5678-1234-567812345678',
+    'lieu': 'Fidjrossè',
+    'counts': {'1': 'un', '2': 'deux'},
+}
+
+
+def _provider(use_orjson=True):
+    app = Flask(__name__)
+    app.config['JSON_USE_ORJSON'] = use_orjson
+    return app, FastJSONProvider(app)
+
+
+@pytest.mark.parametrize('use_orjson', [
+    pytest.param(True, marks=pytest.mark.skipif(json_provider.orjson is None, reason="orjson non installé")),
+    False,
+])
+def test_dates_and_non_str_keys_encode_like_stdlib(use_orjson):
+    app, provider = _provider(use_orjson)
+    assert provider.use_orjson is use_orjson
+
+    assert json.loads(provider.dumps(PAYLOAD)) == EXPECTED
+    with app.app_context():
+        response = provider.response(PAYLOAD)
+    assert response.mimetype == 'application/json'
+    assert json.loads(response.get_data()) == EXPECTED
+    # Sortie compacte, non échappée
+    assert b', ' not in response.get_data() and 'Fidjrossè'.encode('utf-8') in response.get_data()
+
+
+def test_falls_back_to_stdlib_without_orjson(monkeypatch):
+    monkeypatch.setattr(json_provider, 'orjson', None)
+    app, provider = _provider(use_orjson=True)
+    assert not provider.use_orjson
+
+    assert json.loads(provider.dumps(PAYLOAD)) == EXPECTED
+    with app.app_context():
+        assert json.loads(provider.response(PAYLOAD).get_data()) == EXPECTED
+
+
+def test_unsupported_type_raises_type_error():
+    _, provider = _provider()
+    with pytest.raises(TypeError):
+        provider.dumps({'value': object()})
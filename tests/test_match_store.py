@@ -0,0 +1,58 @@
+# tests/test_match_store.py
+from backend.extensions import db
+from backend.jobs import compute_batch
+from backend.match_store import match_store, snapshot_user
+from backend.matching import compute_match_result, rescore_trajet
+from backend.matching_index import matching_index
+from backend.models import User
+
+
+def test_worker_batch_sees_trips_committed_after_last_index_build(make_user, make_trajet):
+    passager = make_user(role='passager', point_depart='Cotonou', horaires='matin')
+    conducteur = make_user(role='conducteur')
+    make_trajet(conducteur, point_depart='Cotonou', horaire_depart='7h')
+    matching_index.ensure_fresh()
+
+    # Validé après la dernière reconstruction, avant la capture de seq
+    nouveau_id = make_trajet(conducteur, point_depart='Cotonou', horaire_depart='7h').id
+    seq = match_store.seq
+
+    [(profile, result)] = compute_batch([passager.id], match_store.capacity)
+    assert nouveau_id in [trajet_id for trajet_id, _, _, _ in result.top()]
+    assert match_store.put(profile, result, seq, rescore_trajet)
+
+
+def test_put_keeps_a_result_computed_later(make_user, make_trajet):
+    passager = make_user(role='passager', point_depart='Cotonou', horaires='matin')
+    conducteur = make_user(role='conducteur')
+    make_trajet(conducteur)
+    profile = snapshot_user(passager)
+
+    old_seq = match_store.seq
+    stale = compute_match_result(passager, match_store.capacity)
+    make_trajet(conducteur)
+    matching_index.ensure_fresh(force=True)
+    fresh = compute_match_result(passager, match_store.capacity)
+
+    assert match_store.put(profile, fresh, match_store.seq, rescore_trajet)
+    assert not match_store.put(profile, stale, old_seq, rescore_trajet)
+
+    user = db.session.get(User, passager.id)
+    assert match_store.get(user, compute_match_result, rescore_trajet) is fresh
+
+
+def test_catch_up_does_not_mutate_results_held_by_readers(make_user, make_trajet):
+    passager = make_user(role='passager', point_depart='Cotonou', horaires='matin')
+    conducteur = make_user(role='conducteur')
+    make_trajet(conducteur, point_depart='Cotonou', horaire_depart='7h')
+
+    user = db.session.get(User, passager.id)
+    held = match_store.get(user, compute_match_result, rescore_trajet)
+    rows = list(held.scored)
+
+    nouveau_id = make_trajet(conducteur, point_depart='Cotonou', horaire_depart='7h').id
+    user = db.session.get(User, passager.id)
+    updated = match_store.get(user, compute_match_result, rescore_trajet)
+
+    assert held.scored == rows
+    assert nouveau_id in [trajet_id for trajet_id, _, _, _ in updated.scored]
@@ -0,0 +1,214 @@
+# tests/test_matching_index.py
+from datetime import datetime, timedelta
+import random
+from unittest import mock
+
+from sqlalchemy import event
+
+from backend import matching, scoring
+from backend.extensions import db
+from backend.matching import compute_match_result, score_trajets
+from backend.matching_index import PRUNED_GEO_SCORE, matching_index, max_pruned_score
+from backend.models import Trajet
+
+PLACES = ['Cotonou', 'Abomey-Calavi', 'Calavi Kpota', 'Godomey', 'Akpakpa', 'Porto-Novo', 'Parakou', 'Fidjrossè']
+HORAIRES = ['matin', 'soir', '8h-10h', '14h', '', 'flexible']
+DEPARTS = ['7h', '8h30', '14:00', '18h', '20h', 'vers midi']
+
+
+def _full_scan_top(user, limit):
+    trajets = Trajet.query.filter(Trajet.conducteur_id != user.id, Trajet.places_disponibles > 0).all()
+    scored = sorted(
+        ((trajet.id, score) for trajet, score, _, _ in score_trajets(user, trajets)),
+        key=lambda x: (-x[1], x[0])
+    )
+    return scored[:limit]
+
+
+def _row_engine_top(user, limit):
+    """Meilleurs matches du moteur ligne à ligne et nombre de trajets scorés"""
+    scored_trajets = []
+
+    def counting_score_trajets(user, trajets):
+        scored_trajets.extend(trajets)
+        return score_trajets(user, trajets)
+
+    with mock.patch.object(scoring, 'is_available', lambda: False), \
+            mock.patch.object(matching, 'score_trajets', counting_score_trajets):
+        result = compute_match_result(user, limit)
+    return [(trajet_id, score) for trajet_id, score, _, _ in result.top()], len(scored_trajets)
+
+
+def _row_engine_top_statements(user, limit):
+    """Comme _row_engine_top, avec les requêtes SQL exécutées"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        top, scored = _row_engine_top(user, limit)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return top, scored, statements
+
+
+def test_pruning_bound_is_reachable():
+    # Un candidat au lieu identique et à l'heure préférée dépasse la borne
+    bound = max_pruned_score(PRUNED_GEO_SCORE, True, [8], True)
+    best = 1.0 * scoring.GEO_WEIGHT + 1.0 * scoring.TIME_WEIGHT + scoring.PLACES_WEIGHT \
+        + scoring.RECENCY_WEIGHT + scoring.ROLE_BONUS
+    assert scoring.MATCH_THRESHOLD < bound < best - matching.ROUNDING_SLACK
+
+
+def test_pruned_top_matches_full_scan_with_substring_only_location(make_user, make_trajet):
+    # "Tori" est contenu dans "Toribossitozoun" (score géographique 0,8) sans
+    # token commun ni trigrammes au-dessus du seuil: le trajet n'est pas candidat
+    passager = make_user(role='passager', point_depart='Tori', horaires='matin')
+    conducteur = make_user(role='conducteur')
+    exact = make_trajet(conducteur, point_depart='Tori', horaire_depart='20h')
+    substring = make_trajet(conducteur, point_depart='Toribossitozoun', horaire_depart='20h')
+
+    top, scored = _row_engine_top(passager, 1)
+    assert top == _full_scan_top(passager, 1) == [(exact.id, top[0][1])]
+    assert scored == 1
+
+    top, scored = _row_engine_top(passager, 2)
+    assert [trajet_id for trajet_id, _ in top] == [exact.id, substring.id]
+    assert top == _full_scan_top(passager, 2)
+    assert scored == 2
+
+
+def test_pruned_top_matches_full_scan_on_seeded_data(make_user, make_trajet):
+    rnd = random.Random(5)
+    users = [
+        make_user(role=rnd.choice(['passager', 'conducteur']), point_depart=rnd.choice(PLACES + [None]),
+                  horaires=rnd.choice(HORAIRES))
+        for _ in range(20)
+    ]
+    now = datetime.utcnow()
+    for _ in range(300):
+        make_trajet(rnd.choice(users), point_depart=rnd.choice(PLACES), horaire_depart=rnd.choice(DEPARTS),
+                    places_disponibles=rnd.randint(0, 4), created_at=now - timedelta(days=rnd.randint(0, 40)))
+    available = Trajet.query.filter(Trajet.places_disponibles > 0).count()
+
+    pruned = 0
+    for user in users:
+        for limit in (1, 5, 10):
+            top, scored = _row_engine_top(user, limit)
+            assert top == _full_scan_top(user, limit)
+            pruned += scored < available - Trajet.query.filter_by(conducteur_id=user.id).count()
+    assert pruned > 0
+
+
+def test_far_trip_outside_hour_window_still_matches_passenger(make_user, make_trajet):
+    passager = make_user(role='passager', point_depart='Cotonou', horaires='matin')
+    conducteur = make_user(role='conducteur', point_depart='Parakou')
+    trajet = make_trajet(conducteur, point_depart='Parakou', horaire_depart='20h',
+                         depart_latitude=9.337, depart_longitude=2.630)
+
+    baseline = score_trajets(passager, [trajet])
+    assert len(baseline) == 1
+
+    for vectorized in (True, False):
+        with mock.patch.object(scoring, 'is_available', lambda: vectorized):
+            result = compute_match_result(passager, 10)
+        assert [(trajet_id, score) for trajet_id, score, _, _ in result.top()] == [(trajet.id, baseline[0][1])]
+
+
+def test_row_scoring_keeps_every_match_of_a_full_scan(make_user, make_trajet):
+    rnd = random.Random(3)
+    users = [
+        make_user(role=rnd.choice(['passager', 'conducteur']), point_depart=rnd.choice(PLACES),
+                  horaires=rnd.choice(HORAIRES))
+        for _ in range(12)
+    ]
+    now = datetime.utcnow()
+    for _ in range(120):
+        make_trajet(rnd.choice(users), point_depart=rnd.choice(PLACES), horaire_depart=rnd.choice(DEPARTS),
+                    places_disponibles=rnd.randint(0, 4), created_at=now - timedelta(days=rnd.randint(0, 40)))
+
+    for user in users:
+        trajets = Trajet.query.filter(Trajet.conducteur_id != user.id, Trajet.places_disponibles > 0).all()
+        expected = sorted(trajet.id for trajet, _, _, _ in score_trajets(user, trajets))
+        with mock.patch.object(scoring, 'is_available', lambda: False):
+            result = compute_match_result(user, len(trajets) + 1)
+        assert sorted(trajet_id for trajet_id, _, _, _ in result.top()) == expected
+
+
+def test_index_follows_committed_trajet_changes_without_rebuild(make_user, make_trajet):
+    conducteur = make_user(role='conducteur')
+    make_trajet(conducteur, point_depart='Parakou')
+    matching_index.ensure_fresh(force=True)
+
+    # Les listeners suffisent: toute reconstruction fait échouer le test
+    with mock.patch.object(matching_index, 'rebuild', side_effect=AssertionError("reconstruction")):
+        trajet = make_trajet(conducteur, point_depart='Cotonou')
+        assert trajet.id in matching_index.candidates('Cotonou', [])
+
+        trajet.point_depart = 'Godomey'
+        db.session.commit()
+        assert trajet.id not in matching_index.candidates('Cotonou', [])
+        assert trajet.id in matching_index.candidates('Godomey', [])
+
+        # Champ non indexé: l'instantané en colonnes reste valide
+        columns = matching_index.columns()
+        trajet.description = 'Climatisé'
+        db.session.commit()
+        assert matching_index.columns() is columns
+
+        trajet.places_disponibles = 0
+        db.session.commit()
+        assert trajet.id not in matching_index.candidates('Godomey', [])
+
+        trajet.places_disponibles = 2
+        db.session.commit()
+        trajet_id = trajet.id
+        db.session.delete(trajet)
+        db.session.commit()
+        assert trajet_id not in matching_index.candidates('Godomey', [])
+
+
+def test_index_ignores_rolled_back_trajet_changes(make_user, make_trajet):
+    conducteur = make_user(role='conducteur')
+    trajet = make_trajet(conducteur, point_depart='Cotonou')
+    matching_index.ensure_fresh(force=True)
+
+    db.session.add(Trajet(conducteur_id=conducteur.id, point_depart='Cotonou', destination='Parakou',
+                          horaire_depart='8h', places_disponibles=1))
+    trajet.point_depart = 'Godomey'
+    db.session.flush()
+    db.session.rollback()
+
+    assert matching_index.candidates('Cotonou', []) == {trajet.id}
+
+
+def test_user_without_departure_is_pruned_by_the_sql_hour_window(make_user, make_trajet):
+    # Sans point de départ, les candidats sont les trajets de la fenêtre
+    # horaire (depart_minute) évaluée en SQL
+    passager = make_user(role='passager', point_depart=None, horaires='matin')
+    conducteur = make_user(role='conducteur')
+    for horaire in ('7h', '8h30', '9h', '18h', '20h', '21h30'):
+        make_trajet(conducteur, point_depart='Parakou', horaire_depart=horaire)
+
+    top, scored, statements = _row_engine_top_statements(passager, 2)
+    assert top == _full_scan_top(passager, 2)
+    assert scored == 3
+    assert any('depart_minute BETWEEN' in statement for statement in statements)
+
+
+def test_user_without_departure_is_pruned_by_the_sql_bounding_box(make_user, make_trajet):
+    # Coordonnées sans point de départ: les candidats sont les trajets du
+    # rectangle englobant le rayon, évalué en SQL
+    passager = make_user(role='passager', point_depart=None, latitude=6.3654, longitude=2.4183)
+    conducteur = make_user(role='conducteur')
+    for offset in (0.0, 0.01, 0.03):
+        make_trajet(conducteur, point_depart='Cotonou', depart_latitude=6.3654 + offset, depart_longitude=2.4183)
+    for latitude, longitude in ((9.3372, 2.6303), (6.4969, 2.6289), (7.1833, 1.9911)):
+        make_trajet(conducteur, point_depart='Ailleurs', depart_latitude=latitude, depart_longitude=longitude)
+
+    top, scored, statements = _row_engine_top_statements(passager, 2)
+    assert top == _full_scan_top(passager, 2)
+    assert scored == 3
+    assert any('depart_latitude BETWEEN' in statement for statement in statements)
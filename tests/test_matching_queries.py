@@ -0,0 +1,54 @@
+# tests/test_matching_queries.py
+from unittest import mock
+
+import pytest
+from sqlalchemy import event
+
+from backend import scoring
+from backend.extensions import db
+from backend.match_store import match_store
+from backend.matching import find_detailed_matches, find_matches, match_result_cache
+from backend.matching_index import matching_index
+
+
+def _count_statements(fn, *args):
+    """Résultat de fn(*args) et nombre de requêtes SQL exécutées, index et caches vides"""
+    matching_index.clear()
+    match_store.invalidate()
+    match_result_cache.invalidate()
+    db.session.expunge_all()
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        result = fn(*args)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return result, len(statements)
+
+
+@pytest.mark.parametrize('vectorized', [True, False])
+@pytest.mark.parametrize('find', [find_matches, find_detailed_matches])
+def test_matching_statement_count_does_not_grow_with_results(make_user, make_trajet, vectorized, find):
+    if vectorized and not scoring.is_available():
+        pytest.skip("NumPy non installé")
+    passager = make_user(role='passager', point_depart='Cotonou', horaires='matin')
+    passager_id = passager.id
+
+    def add_matches(count):
+        for _ in range(count):
+            make_trajet(make_user(role='conducteur'), point_depart='Cotonou', horaire_depart='8h')
+
+    counts = []
+    with mock.patch.object(scoring, 'is_available', lambda: vectorized):
+        for count, total in ((2, 2), (28, 30)):
+            add_matches(count)
+            matches, statements = _count_statements(find, passager_id, 50)
+            assert len(matches) == total
+            counts.append(statements)
+
+    assert counts[0] == counts[1]
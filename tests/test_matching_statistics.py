@@ -0,0 +1,67 @@
+# tests/test_matching_statistics.py
+from unittest import mock
+
+import pytest
+
+from backend import matching, scoring
+from backend.matching import DEFAULT_STATS_CACHE_SECONDS, QUALITY_BUCKETS, get_matching_statistics, match_result_cache
+
+# Lieux et heures de départ variés: les scores couvrent plusieurs tranches
+PLACES = ('Cotonou', 'Cotonou Akpakpa', 'Abomey-Calavi', 'Porto-Novo')
+HOURS = ('6h30', '7h', '8h', '10h', '13h', '18h')
+STATS_MATCH_LIMIT = matching.STATS_MATCH_LIMIT
+
+
+@pytest.fixture
+def passager(make_user, make_trajet):
+    passager = make_user(role='passager', point_depart='Cotonou', latitude=6.37, longitude=2.39,
+                         horaires='matin')
+    for place in PLACES:
+        conducteur = make_user(role='conducteur')
+        for hour in HOURS:
+            make_trajet(conducteur, point_depart=place, horaire_depart=hour)
+    return passager
+
+
+@pytest.mark.parametrize('vectorized', [True, False])
+@pytest.mark.parametrize('limit', [STATS_MATCH_LIMIT, 5])
+def test_quality_histogram_adds_up_to_the_match_count(passager, monkeypatch, vectorized, limit):
+    if vectorized and not scoring.is_available():
+        pytest.skip("NumPy non installé")
+    monkeypatch.setattr(matching, 'STATS_MATCH_LIMIT', limit)
+
+    with mock.patch.object(scoring, 'is_available', lambda: vectorized):
+        stats = get_matching_statistics(passager.id)
+
+    histogram = stats['quality_histogram']
+    assert list(histogram) == [bucket for bucket, _ in QUALITY_BUCKETS]
+    assert 0 < stats['total_matches'] <= limit
+    assert sum(histogram.values()) == stats['total_matches']
+    assert histogram['excellent'] == stats['high_quality_matches']
+    if limit == STATS_MATCH_LIMIT:
+        assert len([count for count in histogram.values() if count]) > 1
+
+
+def test_statistics_cache_expires_after_a_trip_write(passager, make_user, make_trajet, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(matching.time, 'monotonic', lambda: now[0])
+    before = get_matching_statistics(passager.id)
+
+    make_trajet(make_user(role='conducteur'), point_depart='Cotonou', horaire_depart='7h')
+    now[0] += DEFAULT_STATS_CACHE_SECONDS - 1
+    assert get_matching_statistics(passager.id) == before
+
+    now[0] += 2
+    after = get_matching_statistics(passager.id)
+    assert after['total_trajets_all'] == before['total_trajets_all'] + 1
+    assert after['total_matches'] == before['total_matches'] + 1
+
+
+def test_statistics_cache_is_invalidated_by_a_profile_update(client, passager, auth_headers):
+    before = get_matching_statistics(passager.id)
+    assert len(match_result_cache) == 1
+
+    response = client.put('/api/user/profile', json={'horaires': 'soir'}, headers=auth_headers(passager))
+    assert response.status_code == 200
+    assert len(match_result_cache) == 0
+    assert get_matching_statistics(passager.id)['quality_histogram'] != before['quality_histogram']
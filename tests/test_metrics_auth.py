@@ -0,0 +1,25 @@
+import pytest
+
+METRICS_PATHS = [
+    '/api/metrics/jobs',
+    '/api/metrics/cache',
+    '/api/metrics/revocation',
+    '/api/metrics/passwords',
+]
+
+
+@pytest.mark.parametrize('path', METRICS_PATHS)
+def test_metrics_require_token(client, path):
+    assert client.get(path).status_code == 401
+
+
+@pytest.mark.parametrize('path', METRICS_PATHS)
+def test_metrics_refused_to_non_admin(client, make_user, auth_headers, path):
+    user = make_user(role='passager')
+    assert client.get(path, headers=auth_headers(user)).status_code == 403
+
+
+@pytest.mark.parametrize('path', METRICS_PATHS)
+def test_metrics_allowed_to_admin(client, make_user, auth_headers, path):
+    admin = make_user(role='admin', email='admin@example.com', telephone='+22900000001')
+    assert client.get(path, headers=auth_headers(admin)).status_code == 200
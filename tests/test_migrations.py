@@ -0,0 +1,55 @@
+# tests/test_migrations.py
+from unittest import mock
+
+from sqlalchemy import inspect, text
+
+from backend import migrations
+from backend.extensions import db
+from backend.horaires import parse_departure_minute, parse_preference_mask
+from backend.migrations import migrate_normalized_horaires
+
+HORAIRES_DEPART = ['8h30', '14:00', 'vers midi', 'à convenir']
+HORAIRES_USERS = ['matin', '8h-10h', 'flexible', None]
+
+
+def _drop_normalized_horaires():
+    """Base antérieure aux colonnes normalisées: index et colonnes supprimés"""
+    with db.engine.begin() as connection:
+        for index in ('ix_trajets_depart_minute', 'ix_trajets_statut_depart_minute', 'ix_users_horaires_mask'):
+            connection.execute(text(f'DROP INDEX IF EXISTS {index}'))
+        connection.execute(text('ALTER TABLE trajets DROP COLUMN depart_minute'))
+        connection.execute(text('ALTER TABLE users DROP COLUMN horaires_mask'))
+
+
+def test_migrate_normalized_horaires_adds_and_backfills_columns(make_user, make_trajet):
+    conducteur = make_user(role='conducteur')
+    for horaire in HORAIRES_DEPART:
+        make_trajet(conducteur, horaire_depart=horaire)
+    for horaires in HORAIRES_USERS:
+        make_user(horaires=horaires)
+    db.session.remove()
+    _drop_normalized_horaires()
+
+    migrate_normalized_horaires()
+
+    inspector = inspect(db.engine)
+    assert 'ix_trajets_depart_minute' in {index['name'] for index in inspector.get_indexes('trajets')}
+    assert 'ix_users_horaires_mask' in {index['name'] for index in inspector.get_indexes('users')}
+    with db.engine.connect() as connection:
+        trajets = connection.execute(text('SELECT horaire_depart, depart_minute FROM trajets')).fetchall()
+        users = connection.execute(text('SELECT horaires, horaires_mask FROM users')).fetchall()
+    assert sorted(trajets, key=str) == sorted(
+        ((horaire, parse_departure_minute(horaire)) for horaire in HORAIRES_DEPART), key=str
+    )
+    assert parse_departure_minute('à convenir') is None
+    assert all(mask == parse_preference_mask(horaires) for horaires, mask in users)
+
+
+def test_migrate_normalized_horaires_does_not_rescan_existing_columns(make_user, make_trajet):
+    # Un horaire non interprétable reste NULL: il n'est pas relu au démarrage suivant
+    make_trajet(make_user(role='conducteur'), horaire_depart='à convenir')
+
+    with mock.patch.object(migrations, 'backfill', wraps=migrations.backfill) as backfill:
+        migrate_normalized_horaires()
+        migrate_normalized_horaires()
+    backfill.assert_not_called()
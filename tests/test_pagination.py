@@ -0,0 +1,56 @@
+# tests/test_pagination.py
+from datetime import date, datetime, timedelta
+
+import pytest
+
+COTONOU = (6.3654, 2.4183)
+
+
+@pytest.fixture
+def dated_trips(make_user, make_trajet):
+    """Trajets dont deux sans date_trajet; ids dans l'ordre de création"""
+    conducteur = make_user(role='conducteur')
+    start = datetime(2026, 1, 1)
+    dates = [date(2026, 2, 3), None, date(2026, 2, 1), date(2026, 2, 3), None, date(2026, 2, 2)]
+    return [
+        make_trajet(conducteur, date_trajet=day, depart_latitude=COTONOU[0], depart_longitude=COTONOU[1],
+                    created_at=start + timedelta(minutes=i)).id
+        for i, day in enumerate(dates)
+    ]
+
+
+def _walk(client, url):
+    """Ids de toutes les pages d'une liste paginée par curseur"""
+    ids, cursor = [], None
+    for _ in range(20):
+        response = client.get(url + (f"&cursor={cursor}" if cursor else ''))
+        assert response.status_code == 200
+        body = response.get_json()
+        ids += [trajet['id'] for trajet in body['trajets']]
+        cursor = body['pagination']['next_cursor']
+        if cursor is None:
+            return ids
+    raise AssertionError("pagination sans fin")
+
+
+@pytest.mark.parametrize('radius', ['', f'&lat={COTONOU[0]}&lon={COTONOU[1]}'], ids=['sql', 'rayon'])
+def test_cursor_pages_include_trips_without_sort_value(client, dated_trips, radius):
+    a, none_1, b, c, none_2, d = dated_trips
+
+    # Les trajets sans date viennent en dernier, par id dans le sens du tri
+    ascending = _walk(client, f'/api/trajets?pagination=cursor&sort=date&per_page=2{radius}')
+    assert ascending == [b, d, a, c, none_1, none_2]
+
+    descending = _walk(client, f'/api/trajets?pagination=cursor&sort=-date&per_page=2{radius}')
+    assert descending == [c, a, d, b, none_2, none_1]
+
+    # Page qui commence dans le segment sans date
+    assert _walk(client, f'/api/trajets?pagination=cursor&sort=date&per_page=5{radius}') == ascending
+
+
+def test_cursor_estimate_is_omitted_for_filtered_listings(client, dated_trips):
+    body = client.get('/api/trajets?pagination=cursor&estimate=1').get_json()
+    assert body['pagination']['total_estimate'] == len(dated_trips)
+
+    body = client.get('/api/trajets?pagination=cursor&estimate=1&date_min=2026-02-02').get_json()
+    assert 'total_estimate' not in body['pagination']
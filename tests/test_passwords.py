@@ -0,0 +1,30 @@
+# tests/test_passwords.py
+import threading
+
+from backend.passwords import PasswordHasher, PasswordService
+
+THREADS = 8
+CALLS = 500
+
+
+def test_counters_are_exact_under_concurrent_calls():
+    service = PasswordService()
+    service.configure(PasswordHasher('pbkdf2', 1), workers=2, max_pending=THREADS)
+
+    def verify_many():
+        for _ in range(CALLS):
+            service.verify('', 'x')
+
+    threads = [threading.Thread(target=verify_many) for _ in range(THREADS)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        service.shutdown()
+
+    stats = service.stats()
+    assert stats['verified'] == THREADS * CALLS
+    assert stats['pending'] == 0
+    assert stats['rejected'] == 0
@@ -0,0 +1,33 @@
+# tests/test_rate_limit.py
+from limits import parse
+from limits.storage import MemoryStorage
+from limits.strategies import FixedWindowRateLimiter
+
+from backend.extensions import limiter
+from backend.rate_limit import LocalBucketStorage, init_rate_limit
+
+
+def test_unlimited_routes_are_not_rate_limited(app, client):
+    app.config['RATELIMIT_STORAGE_URI'] = 'memory://'
+    app.add_url_rule('/limited', 'limited', limiter.limit("5 per minute")(lambda: "ok"))
+    init_rate_limit(app, limiter)
+
+    assert [client.get('/api/health').status_code for _ in range(60)] == [200] * 60
+    assert [client.get('/limited').status_code for _ in range(6)] == [200] * 5 + [429]
+
+
+def test_leases_strand_at_most_the_lease_fraction_across_workers():
+    shared = MemoryStorage()
+    workers = []
+    for _ in range(4):
+        storage = LocalBucketStorage('bucket+memory://', lease_fraction=0.1, workers=4)
+        storage.shared = shared
+        workers.append(FixedWindowRateLimiter(storage))
+
+    limit = parse("100 per minute")
+    # Chaque worker réserve un bloc, puis le trafic ne passe plus que par le premier
+    allowed = sum(worker.hit(limit, 'client') for worker in workers)
+    allowed += sum(workers[0].hit(limit, 'client') for _ in range(200))
+
+    # Blocs de 2 jetons (10 % de 100 répartis sur 4 workers): 3 jetons perdus au plus
+    assert 97 <= allowed <= 100
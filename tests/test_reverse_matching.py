@@ -0,0 +1,61 @@
+# tests/test_reverse_matching.py
+import random
+
+from backend.matching import (
+    REVERSE_GEO_WEIGHT, REVERSE_MATCH_THRESHOLD, REVERSE_TIME_WEIGHT,
+    calculate_geo_score, calculate_time_compatibility, find_reverse_matches, reverse_candidates
+)
+from backend.models import User
+
+PLACES = [
+    ('Cotonou', 6.3654, 2.4183), ('Abomey-Calavi', 6.4485, 2.3557), ('Godomey', None, None),
+    ('Akpakpa', 6.3703, 2.4522), ('Porto-Novo', 6.4969, 2.6289), ('Parakou', 9.3372, 2.6303),
+    ('Calavi Kpota', None, None), ('Fidjrossè', 6.3536, 2.3728),
+]
+HORAIRES = ['matin', 'soir', '8h-10h', '14h', 'flexible', 'vers 7h30', 'nuit']
+DEPARTS = ['7h', '8h30', '14:00', '18h', '20h', 'vers midi']
+
+
+def _full_scan(trajet):
+    """Passagers au-dessus du seuil du matching inversé, sans index"""
+    passengers = User.query.filter(User.role == 'passager', User.horaires.isnot(None), User.horaires != '').all()
+    result = set()
+    for passenger in passengers:
+        geo_score = calculate_geo_score(passenger, trajet.point_depart, trajet.depart_latitude, trajet.depart_longitude)
+        time_score = calculate_time_compatibility(passenger.horaires, trajet.horaire_depart)
+        if geo_score * REVERSE_GEO_WEIGHT + time_score * REVERSE_TIME_WEIGHT > REVERSE_MATCH_THRESHOLD:
+            result.add(passenger.id)
+    return result
+
+
+def test_reverse_candidates_keep_every_match_of_a_full_scan(make_user, make_trajet):
+    rnd = random.Random(3)
+    for _ in range(60):
+        name, lat, lon = rnd.choice(PLACES)
+        make_user(role='passager', point_depart=name, latitude=lat, longitude=lon, horaires=rnd.choice(HORAIRES))
+    conducteur = make_user(role='conducteur')
+    trajets = []
+    for _ in range(25):
+        name, lat, lon = rnd.choice(PLACES)
+        trajets.append(make_trajet(conducteur, point_depart=name, depart_latitude=lat, depart_longitude=lon,
+                                   horaire_depart=rnd.choice(DEPARTS)))
+
+    matched = 0
+    for trajet in trajets:
+        expected = _full_scan(trajet)
+        assert expected <= reverse_candidates(trajet)
+        matched += len(expected)
+    assert matched
+
+
+def test_reverse_candidates_miss_substring_only_locations(make_user, make_trajet):
+    # Perte de rappel documentée (voir PassengerIndex.near_location): "Tori"
+    # est contenu dans "Toribossitozoun" (score géographique 0,8) sans token
+    # commun ni trigrammes assez proches, le passager n'est pas candidat
+    passager = make_user(role='passager', point_depart='Tori', horaires='matin')
+    conducteur = make_user(role='conducteur')
+    trajet = make_trajet(conducteur, point_depart='Toribossitozoun', horaire_depart='8h')
+
+    assert _full_scan(trajet) == {passager.id}
+    assert passager.id not in reverse_candidates(trajet)
+    assert find_reverse_matches(conducteur.id) == []
@@ -0,0 +1,85 @@
+# tests/test_revocation.py
+import threading
+import time
+
+from flask_jwt_extended import decode_token
+from sqlalchemy import inspect
+
+from backend.extensions import db
+from backend.migrations import migrate_revoked_tokens
+from backend.models import RevokedToken
+from backend.revocation import MemoryRevocationBackend, revocation_store
+
+THREADS = 8
+CALLS = 500
+
+
+class UnreachableBackend(MemoryRevocationBackend):
+    """Backend mémoire dont les lectures échouent comme une base injoignable"""
+
+    name = 'unreachable'
+
+    def changes(self, cursor, now):
+        raise ConnectionError("backend injoignable")
+
+    def contains(self, jti, now):
+        raise ConnectionError("backend injoignable")
+
+
+def test_backend_errors_keep_serving_from_the_bloom_filter(app, client, make_user, auth_headers):
+    user = make_user()
+    headers = auth_headers(user)
+    revoked_headers = auth_headers(user)
+    with app.test_request_context():
+        revoked = decode_token(revoked_headers['Authorization'].split()[1])
+    revocation_store.revoke(revoked['jti'], revoked['exp'])
+
+    revocation_store.backend = UnreachableBackend()
+    revocation_store._synced_at = 0.0
+
+    assert client.get('/api/user/profile', headers=headers).status_code == 200
+    assert client.get('/api/user/profile', headers=revoked_headers).status_code == 401
+    assert revocation_store.stats()['backend_errors'] == 2
+
+
+def test_sync_is_retried_after_a_backend_error(app):
+    backend = UnreachableBackend()
+    revocation_store.configure(backend, sync_seconds=60)
+    now = time.time()
+
+    assert not revocation_store.is_revoked('inconnu', now + 3600)
+    assert revocation_store.backend_errors == 1
+    # Pas de nouvel essai avant l'échéance suivante
+    assert not revocation_store.is_revoked('inconnu', now + 3600)
+    assert revocation_store.backend_errors == 1
+
+
+def test_migration_creates_revoked_tokens_table(app):
+    RevokedToken.__table__.drop(db.engine)
+    assert not inspect(db.engine).has_table('revoked_tokens')
+
+    migrate_revoked_tokens()
+    migrate_revoked_tokens()
+    assert inspect(db.engine).has_table('revoked_tokens')
+
+
+def test_counters_are_exact_under_concurrent_checks(app):
+    revocation_store.configure(MemoryRevocationBackend(), sync_seconds=3600)
+    expires_at = time.time() + 3600
+    revocation_store.revoke('revoque', expires_at)
+
+    def check_many():
+        for _ in range(CALLS):
+            assert revocation_store.is_revoked('revoque', expires_at)
+            assert not revocation_store.is_revoked('valide', expires_at)
+
+    threads = [threading.Thread(target=check_many) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = revocation_store.stats()
+    assert stats['checks'] == 2 * THREADS * CALLS
+    assert stats['backend_checks'] == THREADS * CALLS + stats['false_positives']
+    assert stats['backend_errors'] == 0
@@ -0,0 +1,58 @@
+# tests/test_serializers.py
+import json
+
+import pytest
+
+from backend.extensions import db
+from backend.json_provider import dumps_bytes
+from backend.models import Message, Reservation, Trajet
+from backend.serializers import (
+    TRAJET_LIST_FIELDS, resolve, serialize_messages, serialize_reservations, serialize_trajets, serialize_users,
+)
+
+
+def _json(payload):
+    """Résultat tel que reçu par le client: les dates deviennent des chaînes ISO 8601"""
+    return json.loads(dumps_bytes(payload))
+
+
+@pytest.fixture
+def rows(make_user, make_trajet):
+    """Trajets, réservation et message liés, dont des champs optionnels vides"""
+    conducteur = make_user(role='conducteur', point_depart='Cotonou', horaires='7h')
+    passager = make_user(role='passager')
+    trajet = make_trajet(conducteur, depart_latitude=6.37, depart_longitude=2.39, prix_par_place=1500.0,
+                         description='Climatisé', jours_semaine='lun,mar')
+    bare = make_trajet(conducteur, date_trajet=None)
+    reservation = Reservation(trajet_id=trajet.id, passager_id=passager.id, nombre_places=2, message='Merci')
+    message = Message(sender_id=passager.id, recipient_id=conducteur.id, content='Bonjour', room='trajet_1',
+                      trajet_id=trajet.id)
+    db.session.add_all([reservation, message])
+    db.session.commit()
+    return conducteur, passager, [trajet, bare], reservation, message
+
+
+def test_serializers_match_to_dict(rows):
+    conducteur, passager, trajets, reservation, message = rows
+    ids = [trajet.id for trajet in trajets]
+
+    assert _json(serialize_trajets(ids, include_conducteur=True)) == \
+        [trajet.to_dict(include_conducteur=True) for trajet in trajets]
+    assert _json(serialize_reservations([reservation.id], include_relations=True)) == \
+        [reservation.to_dict(include_relations=True)]
+    assert _json(serialize_messages([message], include_sender=True)) == [message.to_dict(include_sender=True)]
+    assert serialize_users([conducteur.id, passager], include_sensitive=True) == \
+        [conducteur.to_dict(include_sensitive=True), passager.to_dict(include_sensitive=True)]
+
+
+def test_list_fields_are_a_subset_of_to_dict(rows):
+    _, _, trajets, _, _ = rows
+    for row, trajet in zip(_json(serialize_trajets(trajets, fields=TRAJET_LIST_FIELDS)), trajets):
+        full = trajet.to_dict()
+        assert row == {field: full[field] for field in TRAJET_LIST_FIELDS}
+
+
+def test_resolve_keeps_order_and_ignores_unknown_ids_and_booleans(rows):
+    _, _, (trajet, bare), _, _ = rows
+    assert trajet.id == 1
+    assert resolve(Trajet, [bare.id, True, 999, trajet, False, 'x']) == [bare, trajet]
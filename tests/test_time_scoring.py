@@ -0,0 +1,80 @@
+# tests/test_time_scoring.py
+import re
+
+from backend.matching import build_time_table, calculate_time_compatibility
+from backend.scoring import UNKNOWN_HOUR
+
+PREFERENCES = [
+    'matin', 'midi', 'soir', 'nuit', '8h-10h', '14h', '7h30', '7h 15h', '15h 7h',
+    '0h 8h 9h', '9h 8h 0h', 'matin 18h', 'soir ou 8h', 'flexible', '', '23h', '25h',
+]
+DEPARTURES = ['0h', '5h30', '6h45', '7h', '8h', '8h30', '9h', '10h', '11h', '12h', '14:00',
+              '16h', '17h', '18h', '20h', '21h', '22h', '23h', '25h', 'vers midi', '']
+
+
+def reference_time_compatibility(user_horaires, trajet_horaire):
+    """Score horaire du matching d'origine, recopié pour comparaison"""
+    if not user_horaires or not trajet_horaire:
+        return 0.5
+
+    horaires_lower = user_horaires.lower()
+    preferences = []
+    if 'matin' in horaires_lower:
+        preferences.extend([6, 7, 8, 9, 10])
+    elif 'midi' in horaires_lower:
+        preferences.extend([11, 12, 13, 14])
+    elif 'soir' in horaires_lower:
+        preferences.extend([17, 18, 19, 20, 21])
+    elif 'nuit' in horaires_lower:
+        preferences.extend([22, 23, 0, 1, 2])
+    for match in re.findall(r'(\d{1,2})h?(\d{0,2})?', horaires_lower):
+        hour = int(match[0])
+        if 0 <= hour <= 23:
+            preferences.append(hour)
+    user_preferences = list(set(preferences))
+
+    time_match = re.search(r'(\d{1,2})[h:]?(\d{0,2})?', trajet_horaire.lower())
+    if not time_match:
+        return 0.5
+    trajet_hour = int(time_match.group(1))
+    if not user_preferences:
+        return 0.5
+    for pref_hour in user_preferences:
+        if abs(trajet_hour - pref_hour) <= 1:
+            return 1.0
+        elif abs(trajet_hour - pref_hour) <= 2:
+            return 0.7
+    return 0.3
+
+
+def test_time_compatibility_matches_original_scoring():
+    for horaires in PREFERENCES:
+        for depart in DEPARTURES:
+            expected = reference_time_compatibility(horaires, depart)
+            assert calculate_time_compatibility(horaires, depart) == expected, (horaires, depart)
+
+
+def test_first_preferred_hour_within_two_hours_wins():
+    # "matin" commence à 6h: un départ à 8h obtient la tolérance de 2h
+    assert calculate_time_compatibility('matin', '8h') == 0.7
+    assert calculate_time_compatibility('matin', '7h') == 1.0
+
+
+def test_vectorized_time_table_matches_row_scoring():
+    class Profile:
+        pass
+
+    for horaires in PREFERENCES:
+        profile = Profile()
+        profile.horaires = horaires
+        table = build_time_table(profile)
+        if not horaires:
+            assert table is None
+            continue
+        for depart in DEPARTURES:
+            if not depart:
+                continue
+            match = re.search(r'(\d{1,2})[h:]?(\d{0,2})?', depart)
+            code = int(match.group(1)) if match else UNKNOWN_HOUR
+            # Codes décalés de 2: NO_HOUR (-2) puis UNKNOWN_HOUR (-1)
+            assert table[code + 2] == calculate_time_compatibility(horaires, depart), (horaires, depart)
@@ -0,0 +1,88 @@
+# tests/test_trajet_filters.py
+from datetime import date, timedelta
+import re
+
+import pytest
+from sqlalchemy import event, text
+
+from backend.extensions import db
+from backend.migrations import TRAJETS_FILTER_INDEXES, migrate_trajets_filter_indexes
+
+# Paramètres de GET /api/trajets -> index composites admis dans le plan.
+# Sans filtre, SQLite peut lire created_at seul: ses entrées finissent par
+# le rowid (id), c'est donc aussi un index (created_at, id)
+FILTER_SHAPES = [
+    ('statut=active&date_min=2026-01-01&date_max=2026-02-01', {'ix_trajets_statut_date_places'}),
+    ('statut=active&date_min=2026-01-01&places_min=2', {'ix_trajets_statut_date_places'}),
+    ('destination=Parakou&statut=active&date_min=2026-01-01', {'ix_trajets_destination_statut_date'}),
+    ('depart=Cotonou&statut=active&date_max=2026-02-01', {'ix_trajets_depart_statut_date'}),
+    ('statut=active&heure_min=7h&heure_max=9h', {'ix_trajets_statut_depart_minute'}),
+    ('statut=active&prix_max=2000&sort=prix', {'ix_trajets_statut_prix'}),
+    ('statut=active&pagination=cursor', {'ix_trajets_statut_created_at_id'}),
+    ('pagination=cursor', {'ix_trajets_created_at', 'ix_trajets_created_at_id'}),
+]
+
+PLAN_INDEX = re.compile(r'USING (?:COVERING )?INDEX (\w+)')
+
+
+@pytest.fixture
+def migrated_indexes(app, make_user, make_trajet):
+    """Index composites recréés par la migration, sur quelques trajets"""
+    with db.engine.begin() as connection:
+        for name, _ in TRAJETS_FILTER_INDEXES:
+            connection.execute(text(f'DROP INDEX {name}'))
+    migrate_trajets_filter_indexes()
+
+    conducteur = make_user(role='conducteur')
+    for day in range(5):
+        make_trajet(conducteur, destination='Parakou', date_trajet=date(2026, 1, 1) + timedelta(days=day),
+                    depart_minute=420 + day * 30, prix_par_place=1000.0 + day * 500, statut='active')
+
+
+def _trajets_plans(client, url):
+    """Plans (EXPLAIN QUERY PLAN) des requêtes sur trajets exécutées par url"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if 'FROM trajets' in statement:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        assert client.get(url).status_code == 200
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    with db.engine.connect() as connection:
+        return [
+            ' / '.join(row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters))
+            for statement, parameters in statements
+        ]
+
+
+@pytest.mark.parametrize('params, indexes', FILTER_SHAPES)
+def test_trajet_filters_use_composite_indexes(client, migrated_indexes, params, indexes):
+    plans = _trajets_plans(client, f'/api/trajets?{params}')
+    assert plans
+    for plan in plans:
+        used = set(PLAN_INDEX.findall(plan))
+        assert used and used <= indexes, plan
+        assert 'SCAN trajets' not in plan
+        assert 'TEMP B-TREE' not in plan
+
+
+def test_places_min_counts_free_seats(client, make_user, make_trajet):
+    conducteur = make_user(role='conducteur')
+    full = make_trajet(conducteur, places_disponibles=3)
+    free = make_trajet(conducteur, places_disponibles=3)
+    full.places_reservees = 2
+    db.session.commit()
+
+    response = client.get('/api/trajets?places_min=2')
+    assert response.status_code == 200
+    assert [trajet['id'] for trajet in response.get_json()['trajets']] == [free.id]
+
+
+@pytest.mark.parametrize('params', ['prix_max=nan', 'prix_max=inf', 'prix_max=-1', 'places_min=deux'])
+def test_invalid_numeric_filters_are_rejected(client, params):
+    assert client.get(f'/api/trajets?{params}').status_code == 400
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend import api
+from backend.extensions import db
+
+COTONOU = (6.3654, 2.4183)
+
+
+@pytest.fixture
+def nearby_trips(monkeypatch, make_user, make_trajet):
+    """Sept trajets autour de Cotonou et un à Parakou, lots de 3 ids"""
+    monkeypatch.setattr(api, 'CANDIDATE_CHUNK_SIZE', 3)
+    conducteur = make_user(role='conducteur')
+    start = datetime(2026, 1, 1)
+    ids = [
+        make_trajet(
+            conducteur,
+            depart_latitude=COTONOU[0] + i * 0.001, depart_longitude=COTONOU[1],
+            prix_par_place=float(1000 + (i * 300) % 700),
+            created_at=start + timedelta(minutes=i)
+        ).id
+        for i in range(7)
+    ]
+    make_trajet(conducteur, point_depart='Parakou', depart_latitude=9.3372, depart_longitude=2.6303)
+    return ids
+
+
+def _radius_url(**params):
+    params = {'lat': COTONOU[0], 'lon': COTONOU[1], 'radius_km': 5, **params}
+    return '/api/trajets?' + '&'.join(f"{key}={value}" for key, value in params.items())
+
+
+def test_radius_search_pages_by_id(client, nearby_trips):
+    seen = []
+    for page in (1, 2, 3):
+        body = client.get(_radius_url(page=page, per_page=3)).get_json()
+        seen += [trajet['id'] for trajet in body['trajets']]
+        assert body['pagination']['total'] == 7
+        assert body['pagination']['pages'] == 3
+    assert seen == sorted(nearby_trips)
+
+
+def test_radius_search_sorts_and_paginates_by_cursor(client, nearby_trips):
+    seen, cursor = [], None
+    while True:
+        url = _radius_url(sort='prix', pagination='cursor', per_page=2)
+        body = client.get(url + (f"&cursor={cursor}" if cursor else '')).get_json()
+        seen += [(trajet['prix_par_place'], trajet['id']) for trajet in body['trajets']]
+        cursor = body['pagination']['next_cursor']
+        if cursor is None:
+            break
+    assert seen == sorted(seen)
+    assert sorted(trajet_id for _, trajet_id in seen) == sorted(nearby_trips)
+
+
+def test_radius_search_bounds_in_lists(app, client, nearby_trips):
+    parameter_counts = []
+
+    def count_parameters(conn, cursor, statement, parameters, context, executemany):
+        parameter_counts.append(len(parameters or ()))
+
+    event.listen(db.engine, 'before_cursor_execute', count_parameters)
+    try:
+        response = client.get(_radius_url(per_page=3))
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_parameters)
+
+    assert response.get_json()['pagination']['total'] == 7
+    assert max(parameter_counts) <= 3